@@ -0,0 +1,50 @@
+from AnyAngle import lazy_theta_star, theta_star
+from BucketSearch import bucket_astar, bucket_dijkstra
+from FlowField import flow_field
+from HierarchicalPathfinder import ClusterGraph, hpa_star
+from IncrementalPlanner import lpa_star
+from JumpPointSearch import JumpTable, jps, jps_plus
+from SearchEngine import astar, astar_steps
+
+# every engine takes (passable, start, goal, diagonal=..., heuristic=..., cancel=...) and returns a SearchResult
+ALGORITHMS = {
+    "A*": astar,
+    "JPS": jps,
+    "JPS+": jps_plus,
+    "LPA*": lpa_star,
+    "HPA*": hpa_star,
+    "Flow Field": flow_field,
+    "Bucket A*": bucket_astar,
+    "Bucket Dijkstra": bucket_dijkstra,
+    "Theta*": theta_star,
+    "Lazy Theta*": lazy_theta_star,
+}
+
+# engines that trade path length for speed, their paths may be longer than the optimal ones
+APPROXIMATE = {"HPA*"}
+
+# engines whose paths are waypoints joined by straight segments of any angle, with Euclidean costs; they are
+# usually shorter than the grid optimum, so their lengths don't compare to the grid engines'
+ANY_ANGLE = {"Theta*", "Lazy Theta*"}
+
+# engines that also take cost=, a terrain plane of 1-255 per cell multiplying the move lengths; the others
+# assume plain ground and are swapped for TERRAIN_FALLBACK on weighted maps
+WEIGHTED = {"A*", "Flow Field", "Bucket A*", "Bucket Dijkstra"}
+TERRAIN_FALLBACK = "Bucket A*"
+
+
+def engine_for(algorithm: str, weighted: bool):
+    # engines that take every move at its length hand weighted maps over to one that reads the costs
+    return algorithm if not weighted or algorithm in WEIGHTED else TERRAIN_FALLBACK
+
+
+# optional per-map precomputation, takes (passable, diagonal) and returns extra keyword arguments for the engine
+PREPARE = {
+    "JPS+": lambda passable, diagonal: {"table": JumpTable(passable)},
+    "HPA*": lambda passable, diagonal: {"graph": ClusterGraph(passable, diagonal)},
+}
+
+# generator versions used to animate a search, same arguments as above
+STEPPERS = {
+    "A*": astar_steps,
+}
@@ -0,0 +1,350 @@
+import heapq
+import math
+import time
+
+import numpy as np
+
+from SearchEngine import CANCEL_MASK, CancelToken, FlatGrid, SearchResult, get_heuristic
+
+# the smoother tests this many path points ahead of its anchor in one line of sight batch
+SMOOTH_WINDOW = 64
+# segments no longer than this along either axis are looked up in a table of traced footprints, not traced again
+SIGHT_RADIUS = 32
+# the first query from a point works out what it sees this close in one gather, the queries that follow from the
+# same point (a search asks from each parent a few times) are lookups
+SIGHT_WINDOW = 8
+
+# footprint tables by radius, traced once per process
+_footprints = {}
+
+
+def trace_segments(x0, y0, x1, y1):
+    # Every cell the straight segments between the centers of (x0, y0) and (x1, y1) pass through, for a whole batch
+    # of segments in one go. Returns (segment, xs, ys) with one entry per touched cell. A segment running exactly
+    # through a grid corner touches all four cells there, which is the no corner cutting rule of the grid moves.
+    # Each segment is walked one column of its longer axis at a time; a column spans at most one cell of the other
+    # axis, so it touches two rows at most, three when it passes a corner. Positions are kept in integers, the
+    # other axis scaled by twice the segment's length
+    x0, y0, x1, y1 = (np.asarray(a, dtype=np.int64).ravel() for a in (x0, y0, x1, y1))
+    dx, dy = x1 - x0, y1 - y0
+    steep = np.abs(dy) > np.abs(dx)
+    u0, v0 = np.where(steep, y0, x0), np.where(steep, x0, y0)
+    du, dv = np.where(steep, dy, dx), np.where(steep, dx, dy)
+    length = np.abs(du)
+    counts = length + 1
+    segment = np.repeat(np.arange(len(x0)), counts)
+    k = np.arange(len(segment)) - np.repeat(np.cumsum(counts) - counts, counts)
+    # column k is entered and left half a cell either side of its center, clamped to the end points
+    n, dv = np.maximum(length, 1)[segment], dv[segment]
+    base = 2 * n * v0[segment] + n
+    enter = base + np.maximum(2 * k - 1, 0) * dv
+    leave = base + np.minimum(2 * k + 1, 2 * length[segment]) * dv
+    # a low end exactly on a cell border is a corner, the cell across it counts as touched
+    low = (np.minimum(enter, leave) - 1) // (2 * n)
+    high = np.maximum(enter, leave) // (2 * n)
+    u = u0[segment] + np.sign(du)[segment] * k
+    extra = high - low
+    segments, us, vs = [segment], [u], [low]
+    for offset in (1, 2):
+        more = np.flatnonzero(extra >= offset)
+        segments.append(segment[more])
+        us.append(u[more])
+        vs.append(low[more] + offset)
+    segment, u, v = np.concatenate(segments), np.concatenate(us), np.concatenate(vs)
+    steep = steep[segment]
+    return segment, np.where(steep, v, u), np.where(steep, u, v)
+
+
+def line_of_sight(passable: np.ndarray, x0, y0, x1, y1):
+    # one bool per segment, True when every cell it touches is passable
+    segment, xs, ys = trace_segments(x0, y0, x1, y1)
+    blocked = passable[ys, xs] == 0
+    return np.bincount(segment[blocked], minlength=np.size(x0)) == 0
+
+
+def footprints(r: int):
+    # (dx, dy) of the cells touched by the segment from (0, 0) to every point within r along either axis, one row
+    # per end point at (dy + r) * (2r + 1) + dx + r, padded out with the start cell
+    if r not in _footprints:
+        dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+        zeros = np.zeros(dx.size, dtype=np.int64)
+        segment, xs, ys = trace_segments(zeros, zeros, dx.ravel(), dy.ravel())
+        order = np.argsort(segment, kind="stable")
+        segment, xs, ys = segment[order], xs[order], ys[order]
+        count = np.bincount(segment, minlength=dx.size)
+        slot = np.arange(len(segment)) - np.repeat(np.cumsum(count) - count, count)
+        table_x = np.zeros((dx.size, count.max()), dtype=np.int64)
+        table_y = np.zeros_like(table_x)
+        table_x[segment, slot] = xs
+        table_y[segment, slot] = ys
+        _footprints[r] = table_x, table_y
+    return _footprints[r]
+
+
+class SightMap:
+    # Line of sight against one plane for a search's worth of queries. Targets within SIGHT_WINDOW of the point
+    # looked from are read off that point's window. The rest go through visible_batch, where a segment whose
+    # bounding box holds no blocked cell is answered from a summed-area table of the walls and the segments that
+    # pass near walls are read off their footprints when short and traced when long
+    def __init__(self, plane: np.ndarray):
+        self.plane = plane
+        self.flat = plane.ravel()
+        self.width = plane.shape[1]
+        self.table = np.zeros((plane.shape[0] + 1, plane.shape[1] + 1), dtype=np.int32)
+        np.cumsum(np.cumsum(plane == 0, axis=0, dtype=np.int32), axis=1, out=self.table[1:, 1:])
+        table_x, table_y = footprints(SIGHT_RADIUS)
+        self.near = table_y * self.width + table_x
+        table_x, table_y = footprints(SIGHT_WINDOW)
+        self.around = table_y * self.width + table_x
+        # window bytes by flat id of the point looked from
+        self.windows = {}
+
+    def window(self, x0: int, y0: int):
+        # one byte per point within SIGHT_WINDOW, in footprint row order. Footprints running off the plane read
+        # clipped ids, but no query ever ends off the plane
+        key = y0 * self.width + x0
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = self.flat.take(key + self.around, mode="clip").all(axis=1).tobytes()
+        return window
+
+    def visible(self, x0: int, y0: int, xs, ys):
+        # from (x0, y0) to every (xs[i], ys[i]), a list of bools
+        r = SIGHT_WINDOW
+        span = 2 * r + 1
+        window = None
+        seen = []
+        far = []
+        for i, (x, y) in enumerate(zip(xs, ys)):
+            dx, dy = x - x0, y - y0
+            if -r <= dx <= r and -r <= dy <= r:
+                if window is None:
+                    window = self.window(x0, y0)
+                seen.append(window[(dy + r) * span + dx + r] == 1)
+            else:
+                seen.append(False)
+                far.append(i)
+        if far:
+            clear = self.visible_batch(x0, y0, [xs[i] for i in far], [ys[i] for i in far])
+            for i, value in zip(far, clear.tolist()):
+                seen[i] = value
+        return seen
+
+    def visible_batch(self, x0: int, y0: int, xs, ys):
+        # from (x0, y0) to every (xs[i], ys[i]) as one batch, a bool array
+        xs, ys = np.asarray(xs, dtype=np.intp), np.asarray(ys, dtype=np.intp)
+        low_x, high_x = np.minimum(xs, x0), np.maximum(xs, x0) + 1
+        low_y, high_y = np.minimum(ys, y0), np.maximum(ys, y0) + 1
+        table = self.table
+        seen = table[high_y, high_x] - table[low_y, high_x] - table[high_y, low_x] + table[low_y, low_x] == 0
+        walled = np.flatnonzero(~seen)
+        if not len(walled):
+            return seen
+        r = SIGHT_RADIUS
+        dx, dy = xs[walled] - x0, ys[walled] - y0
+        near = (np.abs(dx) <= r) & (np.abs(dy) <= r)
+        if near.any():
+            rows = (dy[near] + r) * (2 * r + 1) + dx[near] + r
+            seen[walled[near]] = self.flat[y0 * self.width + x0 + self.near[rows]].all(axis=1)
+        if not near.all():
+            far = walled[~near]
+            seen[far] = line_of_sight(self.plane, np.full(len(far), x0), np.full(len(far), y0), xs[far], ys[far])
+        return seen
+
+
+def segment_lengths(path):
+    xy = np.asarray(path, dtype=np.float64)
+    return np.hypot(*np.diff(xy, axis=0).T)
+
+
+def theta_star(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+               cancel: CancelToken = None):
+    # A* where a cell may take its parent's parent as its own whenever it can see it, so paths are waypoints joined
+    # by straight segments of any angle and costs are Euclidean. The neighbours of every expanded cell are checked
+    # against its parent in one line of sight batch
+    t0 = time.perf_counter()
+    grid = FlatGrid(passable)
+    cells = grid.cells
+    width = grid.width
+    # line of sight runs on the padded plane itself, in padded coordinates
+    sight = SightMap(np.frombuffer(cells, dtype=np.uint8).reshape(grid.rows + 2, width))
+    h = get_heuristic(heuristic or "euclidean", diagonal)
+    moves = grid.neighbours(diagonal)
+
+    s = grid.node_id(*start)
+    t = grid.node_id(*goal)
+    if not cells[s] or not cells[t]:
+        return SearchResult(elapsed=time.perf_counter() - t0)
+
+    gy, gx = divmod(t, width)
+    g_score = [math.inf] * grid.size
+    parent = [-1] * grid.size
+    closed = bytearray(grid.size)
+
+    g_score[s] = 0.0
+    parent[s] = s
+    sy, sx = divmod(s, width)
+    open_heap = [(h(abs(sx - gx), abs(sy - gy)), -0.0, s)]
+    expanded = 0
+    peak_open = 1
+
+    while open_heap:
+        node = heapq.heappop(open_heap)[2]
+        if closed[node]:
+            continue
+        closed[node] = 1
+        g = g_score[node]
+        expanded += 1
+        if node == t:
+            return SearchResult(build_any_angle_path(grid, parent, t), g, expanded, peak_open,
+                                time.perf_counter() - t0)
+        if cancel is not None and not expanded & CANCEL_MASK:
+            cancel.check()
+
+        p = parent[node]
+        py, px = divmod(p, width)
+        g_parent = g_score[p]
+        updates = []
+        for offset, step, side_a, side_b in moves:
+            nb = node + offset
+            if not cells[nb] or closed[nb]:
+                continue
+            if side_a and not (cells[node + side_a] and cells[node + side_b]):
+                continue
+            ny, nx = divmod(nb, width)
+            # straight from the parent is never longer than through this cell, it only needs line of sight
+            via = g_parent + math.hypot(nx - px, ny - py)
+            if via < g_score[nb]:
+                updates.append((nb, nx, ny, via, g + step))
+        if not updates:
+            continue
+        if p != node:
+            visible = sight.visible(px, py, [u[1] for u in updates], [u[2] for u in updates])
+        else:
+            visible = [False] * len(updates)
+        for (nb, nx, ny, via, direct), seen in zip(updates, visible):
+            new_g, new_parent = (via, p) if seen else (direct, node)
+            if new_g < g_score[nb]:
+                g_score[nb] = new_g
+                parent[nb] = new_parent
+                heapq.heappush(open_heap, (new_g + h(abs(nx - gx), abs(ny - gy)), -new_g, nb))
+        if len(open_heap) > peak_open:
+            peak_open = len(open_heap)
+
+    return SearchResult(None, math.inf, expanded, peak_open, time.perf_counter() - t0)
+
+
+def lazy_theta_star(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+                    cancel: CancelToken = None):
+    # Theta* that hands every neighbour its parent's parent without looking and only checks line of sight once
+    # per expanded cell; a cell that turns out not to see its parent takes the best closed neighbour instead
+    t0 = time.perf_counter()
+    grid = FlatGrid(passable)
+    cells = grid.cells
+    width = grid.width
+    sight = SightMap(np.frombuffer(cells, dtype=np.uint8).reshape(grid.rows + 2, width))
+    h = get_heuristic(heuristic or "euclidean", diagonal)
+    moves = grid.neighbours(diagonal)
+
+    s = grid.node_id(*start)
+    t = grid.node_id(*goal)
+    if not cells[s] or not cells[t]:
+        return SearchResult(elapsed=time.perf_counter() - t0)
+
+    gy, gx = divmod(t, width)
+    g_score = [math.inf] * grid.size
+    parent = [-1] * grid.size
+    closed = bytearray(grid.size)
+
+    g_score[s] = 0.0
+    parent[s] = s
+    sy, sx = divmod(s, width)
+    open_heap = [(h(abs(sx - gx), abs(sy - gy)), -0.0, s)]
+    expanded = 0
+    peak_open = 1
+
+    while open_heap:
+        node = heapq.heappop(open_heap)[2]
+        if closed[node]:
+            continue
+        ny, nx = divmod(node, width)
+        p = parent[node]
+        py, px = divmod(p, width)
+        if p != node and not sight.visible(px, py, [nx], [ny])[0]:
+            best, best_parent = math.inf, -1
+            for offset, step, side_a, side_b in moves:
+                nb = node + offset
+                if not closed[nb] or (side_a and not (cells[node + side_a] and cells[node + side_b])):
+                    continue
+                if g_score[nb] + step < best:
+                    best, best_parent = g_score[nb] + step, nb
+            g_score[node], parent[node] = best, best_parent
+        closed[node] = 1
+        g = g_score[node]
+        expanded += 1
+        if node == t:
+            return SearchResult(build_any_angle_path(grid, parent, t), g, expanded, peak_open,
+                                time.perf_counter() - t0)
+        if cancel is not None and not expanded & CANCEL_MASK:
+            cancel.check()
+
+        p = parent[node]
+        py, px = divmod(p, width)
+        g_parent = g_score[p]
+        for offset, step, side_a, side_b in moves:
+            nb = node + offset
+            if not cells[nb] or closed[nb]:
+                continue
+            if side_a and not (cells[node + side_a] and cells[node + side_b]):
+                continue
+            ny, nx = divmod(nb, width)
+            new_g = g_parent + math.hypot(nx - px, ny - py)
+            if new_g < g_score[nb]:
+                g_score[nb] = new_g
+                parent[nb] = p
+                heapq.heappush(open_heap, (new_g + h(abs(nx - gx), abs(ny - gy)), -new_g, nb))
+        if len(open_heap) > peak_open:
+            peak_open = len(open_heap)
+
+    return SearchResult(None, math.inf, expanded, peak_open, time.perf_counter() - t0)
+
+
+def build_any_angle_path(grid: FlatGrid, parent, goal: int):
+    # the start is its own parent
+    path = [grid.node_xy(goal)]
+    node = goal
+    while parent[node] != node:
+        node = parent[node]
+        path.append(grid.node_xy(node))
+    path.reverse()
+    return path
+
+
+def smooth_path(passable: np.ndarray, path):
+    # String pulling: from each kept point, jump to the furthest later point it can see. The points ahead are
+    # tested SMOOTH_WINDOW at a time in one line of sight batch, the next window is only tried while the last
+    # point of the current one is still in sight
+    if not path or len(path) < 3:
+        return list(path) if path else path
+    xy = np.asarray(path, dtype=np.int64)
+    kept = [0]
+    anchor = 0
+    last = len(xy) - 1
+    while anchor < last:
+        reach = anchor + 1
+        lo = anchor + 2
+        while lo <= last:
+            hi = min(lo + SMOOTH_WINDOW, last + 1)
+            ahead = xy[lo:hi]
+            count = len(ahead)
+            seen = np.flatnonzero(line_of_sight(passable, np.full(count, xy[anchor, 0]),
+                                                np.full(count, xy[anchor, 1]), ahead[:, 0], ahead[:, 1]))
+            if not len(seen):
+                break
+            reach = lo + int(seen[-1])
+            if seen[-1] != count - 1:
+                break
+            lo = hi
+        kept.append(reach)
+        anchor = reach
+    return [tuple(map(int, xy[i])) for i in kept]
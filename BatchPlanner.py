@@ -0,0 +1,255 @@
+import math
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from Algorithms import ALGORITHMS, PREPARE, engine_for
+from FlowField import FlowField
+from RegionIndex import label_components
+from SearchEngine import SearchResult
+
+# each worker keeps this many flow fields around, crowds usually share a handful of goals
+FLOW_FIELD_LIMIT = 8
+# pairs per task when none is given: enough tasks for every worker to get several, but never so few pairs per task
+# that the round trip outweighs the searches
+MIN_CHUNK, MAX_CHUNK = 4, 64
+
+# worker side state, per process: the attached shared blocks by name and what was prepared for them
+_attached = {}
+_prepared = OrderedDict()
+
+
+class SharedPlane:
+    # One grid plane copied once into a shared memory block. Workers map the block instead of getting the plane
+    # pickled into every task, so a task only carries the block names and its start/goal pairs
+    def __init__(self, array: np.ndarray):
+        self.block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self.block.buf)
+        self.array[...] = array
+        self.name = self.block.name
+        self.shape = array.shape
+
+    def release(self):
+        self.array = None
+        self.block.close()
+        self.block.unlink()
+
+
+def attach(name: str, shape):
+    # the workers share the planner's resource tracker, so attaching doesn't hand them ownership of the block
+    if name not in _attached:
+        block = shared_memory.SharedMemory(name=name)
+        _attached[name] = (block, np.ndarray(shape, dtype=np.uint8, buffer=block.buf))
+    return _attached[name][1]
+
+
+def detach_except(names):
+    # a new map version arrived, everything prepared for the old blocks goes before their mappings are closed
+    stale = [name for name in _attached if name not in names]
+    if not stale:
+        return
+    for key in [key for key in _prepared if key[0] in stale]:
+        del _prepared[key]
+    for name in stale:
+        block, _ = _attached.pop(name)
+        try:
+            block.close()
+        except BufferError:
+            # something still holds a view of it, the mapping goes with the process then
+            pass
+
+
+def prepared(key, build, limit: int = None):
+    if key in _prepared:
+        _prepared.move_to_end(key)
+        return _prepared[key]
+    value = _prepared[key] = build()
+    if limit is not None:
+        kind = key[1]
+        same = [k for k in _prepared if k[1] == kind]
+        for k in same[:max(len(same) - limit, 0)]:
+            del _prepared[k]
+    return value
+
+
+def plan_chunk(planes, algorithm: str, diagonal: bool, heuristic, chunk):
+    # runs in a worker: planes is ((passable name, cost name or None), shape), chunk a list of (index, start, goal).
+    # Returns (index, SearchResult) for every pair
+    (passable_name, cost_name), shape = planes
+    detach_except((passable_name, cost_name))
+    passable = attach(passable_name, shape)
+    cost = attach(cost_name, shape) if cost_name is not None else None
+    algorithm = engine_for(algorithm, cost is not None)
+    engine = ALGORITHMS[algorithm]
+    labels = prepared((passable_name, "regions"), lambda: label_components(passable))
+    options = {"cost": cost} if cost is not None else {}
+    if algorithm in PREPARE:
+        options.update(prepared((passable_name, algorithm, diagonal), lambda: PREPARE[algorithm](passable, diagonal)))
+
+    results = []
+    cols = shape[1]
+    for index, start, goal in chunk:
+        t0 = time.perf_counter()
+        a, b = labels[start[1] * cols + start[0]], labels[goal[1] * cols + goal[0]]
+        if a < 0 or a != b:
+            # walled off (or on a wall), the region labels answer that without searching
+            result = SearchResult(elapsed=time.perf_counter() - t0)
+        elif algorithm == "Flow Field":
+            # the field is walked straight, it was built for exactly these planes
+            field = prepared((passable_name, algorithm, diagonal, tuple(goal)),
+                             lambda: FlowField(passable, goal, diagonal, cost=cost), FLOW_FIELD_LIMIT)
+            result = field.path_from(start)
+            result.elapsed = time.perf_counter() - t0
+        else:
+            result = engine(passable, start, goal, diagonal=diagonal, heuristic=heuristic, **options)
+        results.append((index, result))
+    return results
+
+
+class BatchRun:
+    # The tasks of one submitted batch. Results come back per finished task in completion order, either
+    # blocking through results() or without waiting through poll(), which the GUI calls once per frame
+    def __init__(self, futures, total: int, planes):
+        self.futures = futures
+        self.pending = set(futures)
+        self.planes = planes
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def finished(self):
+        return not self.pending
+
+    @property
+    def throughput(self):
+        # paths per second of wall time so far
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    def collect(self, future):
+        self.pending.discard(future)
+        results = future.result()
+        self.done += len(results)
+        self.elapsed = time.perf_counter() - self.started
+        return results
+
+    def poll(self):
+        finished = [future for future in self.pending if future.done() and not future.cancelled()]
+        results = []
+        for future in finished:
+            results.extend(self.collect(future))
+        self.pending = {future for future in self.pending if not future.cancelled()}
+        return results
+
+    def results(self):
+        # yields (index, SearchResult) as the tasks finish
+        for future in as_completed(list(self.pending)):
+            yield from self.collect(future)
+
+    def cancel(self):
+        # tasks already running finish, the queued ones are dropped
+        for future in self.pending:
+            future.cancel()
+        self.pending = {future for future in self.pending if not future.cancelled()}
+
+
+class BatchPlanner:
+    # Plans many start/goal pairs on one map across a pool of worker processes. The map's planes live in shared
+    # memory and are only copied again when the map changes; workers attach to them once and keep their region
+    # labels, jump tables, cluster graphs and flow fields until the next map version shows up
+    def __init__(self, workers: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.planes = None
+        self.version = None
+        # planes of older map versions, released once no run is using them anymore
+        self.retired = []
+        self.runs = []
+
+    def sync(self, passable: np.ndarray, version=None, cost: np.ndarray = None):
+        # version None compares the planes themselves
+        if self.planes is not None:
+            passable_plane, cost_plane = self.planes
+            if version is not None and version == self.version:
+                return
+            if (version is None and passable.shape == passable_plane.shape
+                    and np.array_equal(passable, passable_plane.array) and (cost is None) == (cost_plane is None)
+                    and (cost is None or np.array_equal(cost, cost_plane.array))):
+                return
+            self.retired.append(self.planes)
+        self.planes = (SharedPlane(passable), SharedPlane(cost) if cost is not None else None)
+        self.version = version
+        self.release_retired()
+
+    def release_retired(self):
+        self.runs = [run for run in self.runs if not all(future.done() for future in run.futures)]
+        in_use = {id(run.planes) for run in self.runs}
+        for planes in [planes for planes in self.retired if id(planes) not in in_use]:
+            self.retired.remove(planes)
+            for plane in planes:
+                if plane is not None:
+                    plane.release()
+
+    def get_executor(self):
+        if self.executor is None:
+            # never fork the editor itself, its GUI threads don't survive that. A fork server starts clean and
+            # forks the workers with this module already imported; without one they are spawned. The planes
+            # reach them through shared memory either way
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["BatchPlanner"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self.executor
+
+    def submit(self, pairs, algorithm: str = "A*", diagonal: bool = True, heuristic: str = None,
+               chunk_size: int = None):
+        # pairs is a list of (start, goal); results are indexed by position in it
+        if self.planes is None:
+            raise ValueError("sync the planner with a map before submitting pairs")
+        self.release_retired()
+        jobs = [(index, tuple(start), tuple(goal)) for index, (start, goal) in enumerate(pairs)]
+        if algorithm == "Flow Field":
+            # pairs sharing a goal go to the same task, so each field is built once per worker
+            jobs.sort(key=lambda job: job[2])
+        chunk_size = chunk_size or min(max(math.ceil(len(jobs) / (self.workers * 4)), MIN_CHUNK), MAX_CHUNK)
+        passable_plane, cost_plane = self.planes
+        planes = ((passable_plane.name, cost_plane.name if cost_plane is not None else None), passable_plane.shape)
+        executor = self.get_executor()
+        futures = [executor.submit(plan_chunk, planes, algorithm, diagonal, heuristic, jobs[i:i + chunk_size])
+                   for i in range(0, len(jobs), chunk_size)]
+        run = BatchRun(futures, len(jobs), self.planes)
+        self.runs.append(run)
+        return run
+
+    def plan(self, passable: np.ndarray, pairs, algorithm: str = "A*", diagonal: bool = True,
+             heuristic: str = None, cost: np.ndarray = None, chunk_size: int = None):
+        # one-shot version for scripts: yields (index, SearchResult) in completion order
+        self.sync(passable, cost=cost)
+        yield from self.submit(pairs, algorithm, diagonal, heuristic, chunk_size).results()
+
+    def close(self):
+        for run in self.runs:
+            run.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.runs = []
+        if self.planes is not None:
+            self.retired.append(self.planes)
+            self.planes = None
+            self.version = None
+        self.release_retired()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
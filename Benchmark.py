@@ -0,0 +1,232 @@
+import argparse
+import json
+import math
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from Algorithms import ALGORITHMS, ANY_ANGLE, APPROXIMATE, PREPARE, WEIGHTED
+from BatchPlanner import BatchPlanner
+from GridData import GridData
+from MapGenerators import GENERATORS
+from MapIO import load_any_map, load_moving_ai_scenarios
+
+
+# Headless benchmark for the pathfinding engines, never touches dearpygui:
+#   python Benchmark.py --size 512 --density 0.25 --queries 20 --json results.json
+#   python Benchmark.py --map arena.map --scen arena.map.scen --queries 100
+#   python Benchmark.py --size 512 --max-cost 8   (random terrain costs, only the engines that read them)
+#   python Benchmark.py --size 1024 --queries 500 --workers 8   (all queries at once across worker processes)
+#   python Benchmark.py --size 2001 --generator Maze   (a seeded procedural map instead of random walls)
+
+
+def random_map(rows: int, cols: int, density: float, seed: int, max_cost: int = 1, generator: str = None):
+    data = GridData(rows, cols)
+    rng = np.random.default_rng(seed)
+    if generator:
+        passable = GENERATORS[generator](rows, cols, seed)
+    else:
+        passable = rng.random((rows, cols)) >= density
+    cost = rng.integers(1, max_cost + 1, size=(rows, cols)) if max_cost > 1 else None
+    # assign keeps the weighted cell count in step with the cost plane
+    data.assign(passable, cost=cost)
+    return data
+
+
+def random_queries(data: GridData, count: int, seed: int):
+    # start/goal pairs drawn from passable cells with their own seed, so every algorithm gets the same queries
+    rng = np.random.default_rng(seed)
+    ys, xs = np.nonzero(data.passable)
+    if len(xs) < 2:
+        return []
+    picks = rng.integers(0, len(xs), size=(count, 2))
+    return [((int(xs[a]), int(ys[a])), (int(xs[b]), int(ys[b]))) for a, b in picks]
+
+
+def run_algorithm(name: str, data: GridData, queries, diagonal: bool, measure_memory: bool):
+    engine = ALGORITHMS[name]
+    t0 = time.perf_counter()
+    options = PREPARE[name](data.passable, diagonal) if name in PREPARE else {}
+    setup = time.perf_counter() - t0
+    if data.weighted and name in WEIGHTED:
+        options["cost"] = data.cost
+
+    runs = []
+    for start, goal in queries:
+        t0 = time.perf_counter()
+        result = engine(data.passable, start, goal, diagonal=diagonal, **options)
+        wall = time.perf_counter() - t0
+        runs.append({"start": start, "goal": goal, "wall_time": wall, "found": result.found,
+                     "cost": result.cost if result.found else None, "nodes_expanded": result.nodes_expanded,
+                     "peak_open": result.peak_open})
+
+    # tracing allocations slows the engines down a lot, so memory gets its own pass after the timed one
+    if measure_memory:
+        for run, (start, goal) in zip(runs, queries):
+            tracemalloc.start()
+            engine(data.passable, start, goal, diagonal=diagonal, **options)
+            run["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return {"algorithm": name, "setup_time": setup, "runs": runs}
+
+
+def run_batch(name: str, data: GridData, queries, diagonal: bool, planner: BatchPlanner):
+    # the whole query list goes to the worker pool at once; per query times are the workers' own, the batch time
+    # is the wall clock from submitting to the last result, which is what more cores bring down
+    t0 = time.perf_counter()
+    results = [None] * len(queries)
+    for index, result in planner.plan(data.passable, queries, name, diagonal,
+                                      cost=data.cost if data.weighted else None):
+        results[index] = result
+    batch_time = time.perf_counter() - t0
+    runs = [{"start": start, "goal": goal, "wall_time": result.elapsed, "found": result.found,
+             "cost": result.cost if result.found else None, "nodes_expanded": result.nodes_expanded,
+             "peak_open": result.peak_open} for (start, goal), result in zip(queries, results)]
+    return {"algorithm": name, "setup_time": 0.0, "runs": runs, "batch_time": batch_time,
+            "workers": planner.workers}
+
+
+def summarize(report):
+    runs = report["runs"]
+    found = [r for r in runs if r["found"]]
+    return {
+        "algorithm": report["algorithm"],
+        "queries": len(runs),
+        "found": len(found),
+        "setup_ms": report["setup_time"] * 1000,
+        "total_ms": sum(r["wall_time"] for r in runs) * 1000,
+        "mean_ms": sum(r["wall_time"] for r in runs) * 1000 / max(len(runs), 1),
+        "mean_expanded": sum(r["nodes_expanded"] for r in runs) / max(len(runs), 1),
+        "mean_length": sum(r["cost"] for r in found) / len(found) if found else math.nan,
+        "peak_memory_kb": max((r.get("peak_memory", 0) for r in runs), default=0) / 1024,
+        "batch_ms": report.get("batch_time", math.nan) * 1000,
+        "paths_per_s": len(runs) / report["batch_time"] if report.get("batch_time") else math.nan,
+    }
+
+
+def find_scenario_mismatches(reports, scenarios):
+    # Moving AI optimal lengths use the same octile costs and no corner cutting as the grid engines here
+    mismatches = []
+    for report in reports:
+        exact = report["algorithm"] not in APPROXIMATE | ANY_ANGLE
+        for run, scenario in zip(report["runs"], scenarios):
+            if not run["found"] or (exact and abs(run["cost"] - scenario.optimal_length) > 1e-4):
+                mismatches.append({"algorithm": report["algorithm"], "start": run["start"], "goal": run["goal"],
+                                   "cost": run["cost"], "expected": scenario.optimal_length})
+    return mismatches
+
+
+def find_mismatches(reports, reference: str):
+    # the optimal grid engines must agree on every path length, the approximate and any-angle ones only on whether
+    # a path exists
+    by_name = {report["algorithm"]: report for report in reports}
+    if reference not in by_name:
+        return []
+    inexact = APPROXIMATE | ANY_ANGLE
+    mismatches = []
+    for report in reports:
+        exact = report["algorithm"] not in inexact and reference not in inexact
+        for run, ref in zip(report["runs"], by_name[reference]["runs"]):
+            if run["found"] != ref["found"] or (exact and run["found"] and abs(run["cost"] - ref["cost"]) > 1e-6):
+                mismatches.append({"algorithm": report["algorithm"], "start": run["start"], "goal": run["goal"],
+                                   "cost": run["cost"], "expected": ref["cost"]})
+    return mismatches
+
+
+def format_table(summaries):
+    columns = [("algorithm", "Algorithm", "{}"), ("found", "Found", "{}"), ("setup_ms", "Setup ms", "{:.2f}"),
+               ("total_ms", "Total ms", "{:.2f}"), ("mean_ms", "Mean ms", "{:.3f}"),
+               ("mean_expanded", "Expanded", "{:.1f}"), ("mean_length", "Length", "{:.2f}"),
+               ("peak_memory_kb", "Peak KiB", "{:.1f}")]
+    rows = [[header for _, header, _ in columns]]
+    for summary in summaries:
+        rows.append([fmt.format(summary[key]) for key, _, fmt in columns])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    lines = ["  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def run_benchmark(rows: int, cols: int, density: float, queries: int, seed: int, algorithms=None,
+                  diagonal: bool = True, measure_memory: bool = True, data: GridData = None, query_list=None,
+                  max_cost: int = 1, workers: int = 0, generator: str = None):
+    data = data if data is not None else random_map(rows, cols, density, seed, max_cost, generator)
+    query_list = query_list if query_list is not None else random_queries(data, queries, seed + 1)
+    # engines that ignore terrain would only show up as mismatches on a weighted map
+    algorithms = algorithms or [name for name in ALGORITHMS if name in WEIGHTED or not data.weighted]
+    if workers:
+        with BatchPlanner(workers) as planner:
+            reports = [run_batch(name, data, query_list, diagonal, planner) for name in algorithms]
+    else:
+        reports = [run_algorithm(name, data, query_list, diagonal, measure_memory) for name in algorithms]
+    return {
+        "map": {"rows": data.rows, "cols": data.cols, "density": density, "seed": seed, "generator": generator,
+                "blocked": data.count_impassable(), "max_cost": int(data.cost.max()) if data.cost.size else 1},
+        "diagonal": diagonal,
+        "summary": [summarize(report) for report in reports],
+        "mismatches": find_mismatches(reports, algorithms[0]),
+        "reports": reports,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Minotaur Engine pathfinding algorithms headlessly.")
+    parser.add_argument("--size", type=int, nargs="+", default=[256], metavar="N",
+                        help="grid size, one value for a square grid or COLS ROWS")
+    parser.add_argument("--density", type=float, default=0.2, help="fraction of blocked cells")
+    parser.add_argument("--generator", choices=list(GENERATORS), default=None,
+                        help="generate the map with this seeded generator instead (ignores --density)")
+    parser.add_argument("--max-cost", type=int, default=1, help="random terrain costs from 1 up to this (max 255)")
+    parser.add_argument("--queries", type=int, default=20, help="number of seeded start/goal pairs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--algorithms", nargs="+", choices=list(ALGORITHMS), default=None)
+    parser.add_argument("--four-connected", action="store_true", help="disable diagonal moves")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="plan all queries at once across this many worker processes (no memory pass)")
+    parser.add_argument("--map", metavar="PATH", help="benchmark a saved .mino or Moving AI .map file instead")
+    parser.add_argument("--scen", metavar="PATH", help="take the queries from a Moving AI .scen file")
+    parser.add_argument("--json", metavar="PATH", help="also write the full results as JSON ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cols, rows = (args.size[0], args.size[0]) if len(args.size) == 1 else args.size[:2]
+    data = load_any_map(args.map) if args.map else None
+    scenarios = load_moving_ai_scenarios(args.scen)[:args.queries] if args.scen else None
+    query_list = [(s.start, s.goal) for s in scenarios] if scenarios else None
+    results = run_benchmark(rows, cols, args.density, args.queries, args.seed, args.algorithms,
+                            diagonal=not args.four_connected, measure_memory=not args.no_memory,
+                            data=data, query_list=query_list, max_cost=min(max(args.max_cost, 1), 255),
+                            workers=max(args.workers, 0), generator=args.generator)
+    if scenarios and not args.four_connected:
+        results["mismatches"] += find_scenario_mismatches(results["reports"], scenarios)
+
+    if args.json != "-":
+        source = args.map or f"{cols}x{rows} grid, " + (args.generator or f"density {args.density}")
+        if args.max_cost > 1 and not args.map:
+            source += f", terrain costs 1-{args.max_cost}"
+        print(f"{source}, {len(results['reports'][0]['runs'])} queries, seed {args.seed}")
+        print(format_table(results["summary"]))
+        for summary, report in zip(results["summary"], results["reports"]):
+            if "batch_time" in report:
+                print(f"{summary['algorithm']}: batch of {summary['queries']} in {summary['batch_ms']:.1f} ms across "
+                      f"{report['workers']} workers, {summary['paths_per_s']:.0f} paths/s")
+        for mismatch in results["mismatches"]:
+            print(f"MISMATCH {mismatch}", file=sys.stderr)
+    if args.json:
+        text = json.dumps(results, indent=2)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w") as f:
+                f.write(text)
+    return 1 if results["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+from collections import deque
+
+import numpy as np
+
+from GridData import GridData
+
+BRUSH_TOOLS = ("pen", "rectangle", "fill")
+
+
+def line_cells(x0: int, y0: int, x1: int, y1: int):
+    # every cell on the straight line between two cells, so fast strokes don't leave gaps
+    n = max(abs(x1 - x0), abs(y1 - y0)) + 1
+    xs = np.rint(np.linspace(x0, x1, n)).astype(np.intp)
+    ys = np.rint(np.linspace(y0, y1, n)).astype(np.intp)
+    return xs, ys
+
+
+def rect_cells(x0: int, y0: int, x1: int, y1: int):
+    xs, ys = np.meshgrid(np.arange(min(x0, x1), max(x0, x1) + 1), np.arange(min(y0, y1), max(y0, y1) + 1))
+    return xs.ravel(), ys.ravel()
+
+
+def flood_cells(passable: np.ndarray, x: int, y: int):
+    # the 4-connected region of cells sharing the clicked cell's passability
+    rows, cols = passable.shape
+    target = passable[y, x]
+    cells = (passable.ravel() == target).view(np.uint8).tolist()
+    seed = y * cols + x
+    cells[seed] = 0
+    region = [seed]
+    queue = deque(region)
+    while queue:
+        node = queue.popleft()
+        col = node % cols
+        for nb, ok in ((node - 1, col > 0), (node + 1, col < cols - 1), (node - cols, node >= cols),
+                       (node + cols, node + cols < rows * cols)):
+            if ok and cells[nb]:
+                cells[nb] = 0
+                region.append(nb)
+                queue.append(nb)
+    ys, xs = np.divmod(np.array(region, dtype=np.intp), cols)
+    return xs, ys
+
+
+class Brush:
+    def __init__(self):
+        self.tool = "pen"
+        self.size = 1
+        # None paints walls, a cost paints terrain (left click lays it, right click puts plain ground back)
+        self.terrain = None
+        # cursor samples land here from the input callbacks and are drained once per frame by flush
+        self.samples = deque()
+        self.last_sample = None
+        self.anchor = None
+
+    def reset(self):
+        self.samples.clear()
+        self.last_sample = None
+        self.anchor = None
+
+    def add_sample(self, x: int, y: int, type_of_click: str):
+        self.samples.append((x, y, type_of_click))
+
+    def end_stroke(self):
+        self.samples.append(None)
+
+    def footprint(self, xs: np.ndarray, ys: np.ndarray, data: GridData):
+        if self.size > 1:
+            offsets = np.arange(self.size) - self.size // 2
+            ox, oy = np.meshgrid(offsets, offsets)
+            xs = (xs[:, None] + ox.ravel()).ravel()
+            ys = (ys[:, None] + oy.ravel()).ravel()
+        inside = (xs >= 0) & (xs < data.cols) & (ys >= 0) & (ys < data.rows)
+        flat = np.unique(ys[inside] * data.cols + xs[inside])
+        ys, xs = np.divmod(flat, data.cols)
+        return xs, ys
+
+    def flush(self, data: GridData):
+        # applies every sample gathered since the last frame as one batched edit, returns the changed cells
+        strokes = {"left": [], "right": []}
+        while self.samples:
+            sample = self.samples.popleft()
+            if sample is None:
+                if self.tool == "rectangle" and self.anchor is not None and self.last_sample is not None:
+                    strokes[self.anchor[2]].append(rect_cells(self.anchor[0], self.anchor[1],
+                                                              self.last_sample[0], self.last_sample[1]))
+                self.last_sample = None
+                self.anchor = None
+                continue
+
+            x, y, type_of_click = sample
+            if self.tool == "pen":
+                if self.last_sample is not None and self.last_sample[2] == type_of_click:
+                    strokes[type_of_click].append(line_cells(self.last_sample[0], self.last_sample[1], x, y))
+                else:
+                    strokes[type_of_click].append((np.array([x]), np.array([y])))
+            elif self.tool == "fill":
+                if self.last_sample is None:
+                    # terrain fills spread over walkable cells of the same cost
+                    plane = data.passable if self.terrain is None else np.where(data.passable != 0, data.cost, 0)
+                    strokes[type_of_click].append(flood_cells(plane, x, y))
+            elif self.anchor is None:
+                self.anchor = sample
+            self.last_sample = sample
+
+        changed_xs, changed_ys = [], []
+        for type_of_click, parts in strokes.items():
+            if not parts:
+                continue
+            xs = np.concatenate([p[0] for p in parts])
+            ys = np.concatenate([p[1] for p in parts])
+            if self.tool != "fill":
+                xs, ys = self.footprint(xs, ys, data)
+            if self.terrain is None:
+                xs, ys = data.set_passable_many(xs, ys, type_of_click == "right")
+            else:
+                xs, ys = data.set_cost_many(xs, ys, self.terrain if type_of_click == "left" else 1)
+            changed_xs.append(xs)
+            changed_ys.append(ys)
+        if not changed_xs:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(changed_xs), np.concatenate(changed_ys)
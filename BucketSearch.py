@@ -0,0 +1,197 @@
+import math
+import time
+
+import numpy as np
+
+from SearchEngine import CancelToken, FlatGrid, SQRT2, SearchResult, get_heuristic
+
+# buckets with fewer nodes than this are relaxed in plain Python, numpy only pays off on a wide front
+VECTOR_BUCKET_MIN = 32
+
+# array versions of the SearchEngine heuristics for the vectorized passes
+VECTOR_HEURISTICS = {
+    "octile": lambda dx, dy: np.maximum(dx, dy) + (SQRT2 - 1) * np.minimum(dx, dy),
+    "manhattan": lambda dx, dy: dx + dy,
+    "euclidean": np.hypot,
+}
+
+
+def bucket_distances(grid: FlatGrid, source: int, diagonal: bool = True, cancel: CancelToken = None,
+                     target: int = None, heuristic: str = None, reverse: bool = False, width: float = None):
+    # Shortest distances from source over a bucket queue instead of a binary heap. Returns the flat padded
+    # distance array (inf = unreachable) with the relaxation and peak open counts.
+    # Bucket b holds the open nodes whose f (distance, plus the heuristic towards target when one is given) lies
+    # in [b * width, (b + 1) * width). With width 1 and no heuristic this is Dial's algorithm: every move costs at
+    # least 1, so it always leaves its bucket and a bucket is final after one pass. Wider buckets (delta-stepping)
+    # and the heuristic can land a move in the bucket it started from, those buckets are relaxed in rounds until
+    # nothing in them improves. A round is one vectorized batch when it is wide.
+    # Stops once nothing open can beat the distance to target. reverse prices every move the other way round,
+    # into the cell it comes from, which gives the distances to source (what a flow field needs). heuristic=False
+    # searches towards target without one (Dijkstra)
+    cells = grid.cells
+    weights = grid.weights
+    grid_width = grid.width
+    walk = np.frombuffer(cells, dtype=np.uint8).view(bool)
+    weight = np.frombuffer(weights, dtype=np.uint8).astype(np.float64)
+    moves = grid.neighbours(diagonal)
+    dist = np.full(grid.size, np.inf)
+    if not cells[source]:
+        return dist, 0, 0
+    dist[source] = 0.0
+    # the distance each node was last relaxed from, it only goes again once it got cheaper
+    relaxed = np.full(grid.size, np.inf)
+
+    h = vector_h = None
+    if target is not None and heuristic is not False:
+        name = heuristic or ("octile" if diagonal else "manhattan")
+        h, vector_h = get_heuristic(name, diagonal), VECTOR_HEURISTICS[name]
+        ty, tx = divmod(target, grid_width)
+
+    # buckets about one move wide keep the batches wide whatever the terrain costs, for plain grids that is
+    # Dial's width 1. A move raises f by at most its cost plus the heuristic's change (2 for manhattan diagonals)
+    width = width or float(grid.max_weight)
+    span = int((grid.max_weight * (SQRT2 if diagonal else 1.0) + (2 if h else 0)) / width) + 2
+    # batches from a vectorized pass go in as arrays, single nodes from a Python pass into the plain lists
+    batches = [[] for _ in range(span)]
+    singles = [[] for _ in range(span)]
+    sy, sx = divmod(source, grid_width)
+    b = int(h(abs(sx - tx), abs(sy - ty)) / width) if h else 0
+    singles[b % span].append(source)
+    queued = 1
+    relaxations = 0
+    peak_open = 1
+    rounds = 0
+    while queued:
+        low, high = b * width, (b + 1) * width
+        best = dist[target] if target is not None else math.inf
+        if best <= low:
+            break
+        slot = b % span
+        parts, loose = batches[slot], singles[slot]
+        if not parts and not loose:
+            b += 1
+            continue
+        batches[slot], singles[slot] = [], []
+        count = len(loose) + sum(len(part) for part in parts)
+        queued -= count
+        rounds += 1
+        if cancel is not None and not rounds & 63:
+            cancel.check()
+
+        if count < VECTOR_BUCKET_MIN:
+            for part in parts:
+                loose.extend(part.tolist())
+            for node in loose:
+                d = float(dist[node])
+                # stale entries: the node got cheaper since and was relaxed already. f only ever goes down, so
+                # a node still here belongs to this bucket (or just below it, from rounding)
+                if d >= relaxed[node]:
+                    continue
+                if h:
+                    ny, nx = divmod(node, grid_width)
+                    if d + h(abs(nx - tx), abs(ny - ty)) >= best:
+                        continue
+                relaxed[node] = d
+                relaxations += 1
+                w = weights[node]
+                for offset, step, side_a, side_b in moves:
+                    nb = node + offset
+                    if not cells[nb] or (side_a and not (cells[node + side_a] and cells[node + side_b])):
+                        continue
+                    nd = d + step * (w if reverse else weights[nb])
+                    if nd < dist[nb]:
+                        dist[nb] = nd
+                        if h:
+                            ny, nx = divmod(nb, grid_width)
+                            nd += h(abs(nx - tx), abs(ny - ty))
+                        j = int(nd / width)
+                        singles[(j if j > b else b) % span].append(nb)
+                        queued += 1
+        else:
+            if loose:
+                parts.append(np.array(loose, dtype=np.intp))
+            nodes = np.unique(np.concatenate(parts))
+            d = dist[nodes]
+            keep = d < relaxed[nodes]
+            if h:
+                ny, nx = np.divmod(nodes, grid_width)
+                keep &= d + vector_h(np.abs(nx - tx), np.abs(ny - ty)) < best
+            nodes, d = nodes[keep], d[keep]
+            relaxed[nodes] = d
+            relaxations += len(nodes)
+            found, reached = [], []
+            for offset, step, side_a, side_b in moves:
+                nb = nodes + offset
+                ok = walk[nb]
+                if side_a:
+                    ok &= walk[nodes + side_a] & walk[nodes + side_b]
+                nb = nb[ok]
+                nd = d[ok] + step * (weight[nodes[ok]] if reverse else weight[nb])
+                better = nd < dist[nb]
+                nb, nd = nb[better], nd[better]
+                if not len(nb):
+                    continue
+                np.minimum.at(dist, nb, nd)
+                found.append(nb)
+                reached.append(nd)
+            if found:
+                # new entries handed out as one array per bucket, they only reach the next few
+                nb, f = np.concatenate(found), np.concatenate(reached)
+                if h:
+                    ny, nx = np.divmod(nb, grid_width)
+                    f += vector_h(np.abs(nx - tx), np.abs(ny - ty))
+                index = np.maximum((f / width).astype(np.intp), b)
+                for j in range(int(index.min()), int(index.max()) + 1):
+                    part = nb[index == j]
+                    if len(part):
+                        batches[j % span].append(part)
+                queued += len(nb)
+        peak_open = max(peak_open, queued)
+    return dist, relaxations, peak_open
+
+
+def descend(grid: FlatGrid, dist, node: int, diagonal: bool = True, reverse: bool = False):
+    # walks from node down to the source of a distance array, each step to the neighbour that explains the
+    # current distance; reverse arrays (distances to the source) are walked forwards, the others backwards
+    cells = grid.cells
+    weights = grid.weights
+    moves = grid.neighbours(diagonal)
+    nodes = [node]
+    while dist[node] > 0:
+        best, best_node = math.inf, -1
+        for offset, step, side_a, side_b in moves:
+            nb = node + offset
+            if not cells[nb] or (side_a and not (cells[node + side_a] and cells[node + side_b])):
+                continue
+            d = dist[nb] + step * weights[nb if reverse else node]
+            if d < best:
+                best, best_node = d, nb
+        node = best_node
+        nodes.append(node)
+    return nodes
+
+
+def bucket_search(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic=None,
+                  cancel: CancelToken = None, cost: np.ndarray = None):
+    # the path is read off the distances afterwards, so there's no parent bookkeeping in the inner loop
+    t0 = time.perf_counter()
+    grid = FlatGrid(passable, cost)
+    s = grid.node_id(*start)
+    t = grid.node_id(*goal)
+    if not grid.cells[s] or not grid.cells[t]:
+        return SearchResult(elapsed=time.perf_counter() - t0)
+    dist, relaxations, peak_open = bucket_distances(grid, s, diagonal, cancel, target=t, heuristic=heuristic)
+    if dist[t] == math.inf:
+        return SearchResult(None, math.inf, relaxations, peak_open, time.perf_counter() - t0)
+    path = [grid.node_xy(node) for node in reversed(descend(grid, dist, t, diagonal))]
+    return SearchResult(path, float(dist[t]), relaxations, peak_open, time.perf_counter() - t0)
+
+
+def bucket_astar(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+                 cancel: CancelToken = None, cost: np.ndarray = None):
+    return bucket_search(passable, start, goal, diagonal, heuristic, cancel, cost)
+
+
+def bucket_dijkstra(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+                    cancel: CancelToken = None, cost: np.ndarray = None):
+    return bucket_search(passable, start, goal, diagonal, False, cancel, cost)
@@ -0,0 +1,52 @@
+import math
+import time
+
+import numpy as np
+
+from BucketSearch import bucket_distances, descend
+from SearchEngine import CancelToken, FlatGrid, SearchResult
+
+
+class FlowField:
+    # Distance from every cell to one goal, from one bucket-queue Dijkstra over the whole grid. Built once per goal
+    # and grid state, after that the route from any cell is a walk downhill, one step per path cell
+    def __init__(self, passable: np.ndarray, goal, diagonal: bool = True, cancel: CancelToken = None,
+                 cost: np.ndarray = None):
+        t0 = time.perf_counter()
+        self.grid = FlatGrid(passable, cost)
+        self.plane = passable.copy()
+        self.cost = cost.copy() if cost is not None else None
+        self.goal = tuple(goal)
+        self.diagonal = diagonal
+        self.distance = bucket_distances(self.grid, self.grid.node_id(*goal), diagonal, cancel, reverse=True)[0]
+        self.elapsed = time.perf_counter() - t0
+
+    def matches(self, passable: np.ndarray, goal, diagonal: bool, cost: np.ndarray = None):
+        if (cost is None) != (self.cost is None) or (cost is not None and not np.array_equal(cost, self.cost)):
+            return False
+        return (tuple(goal) == self.goal and diagonal == self.diagonal and passable.shape == self.plane.shape
+                and np.array_equal(passable, self.plane))
+
+    def distances(self):
+        # (rows, cols) view without the padding, inf where the goal can't be reached
+        return self.distance.reshape(self.grid.rows + 2, self.grid.width)[1:-1, 1:-1]
+
+    def path_from(self, start):
+        t0 = time.perf_counter()
+        node = self.grid.node_id(*start)
+        cost = float(self.distance[node])
+        if cost == math.inf:
+            return SearchResult(elapsed=time.perf_counter() - t0)
+        path = [self.grid.node_xy(n) for n in descend(self.grid, self.distance, node, self.diagonal, reverse=True)]
+        return SearchResult(path, cost, len(path), 0, time.perf_counter() - t0)
+
+
+def flow_field(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+               cancel: CancelToken = None, field: FlowField = None, cost: np.ndarray = None):
+    # many-to-one routing: pass a prebuilt field to skip straight to the descent
+    t0 = time.perf_counter()
+    if field is None or not field.matches(passable, goal, diagonal, cost):
+        field = FlowField(passable, goal, diagonal, cancel, cost)
+    result = field.path_from(start)
+    result.elapsed = time.perf_counter() - t0
+    return result
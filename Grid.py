@@ -1,219 +1,543 @@
-import dearpygui.dearpygui as dpg
-import numpy as np
-
-
-class Cell:
-    def __init__(self, x, y, passable=True, is_start=False, is_goal=False):
-        self.x = x
-        self.y = y
-        self.is_start = is_start
-        self.is_goal = is_goal
-        self.passable = passable
-
-
-def get_cell_tag(x, y):
-    return f"CELL_{x}_{y}"
-
-
-class Grid:
-    def __init__(self, rows: int, cols: int, cell_size: int = 50):
-        self.rows = rows
-        self.cols = cols
-        self.cell_size = cell_size
-        self.line_thickness = 1.0
-        self.border_thickness = self.line_thickness * 2
-        self.width = self.cols * self.cell_size
-        self.height = self.rows * self.cell_size
-        self.default_cell_color = (0.0, 0.0, 0.0, 0.0)
-        self.impassable_color = (255.0, 155.0, 28.0, 255.0)
-        self.line_cell_color = (255.0, 255.0, 255.0, 125.0)
-
-        self.grid_original_pos = None
-
-        self.cells = np.empty((cols, rows), dtype=object)
-        self.grid_centered = False
-
-        self.last_painted_cell = None
-
-        for x in range(cols):
-            for y in range(rows):
-                # Create a cell object with coordinates
-                self.cells[x][y] = Cell(x, y)
-
-    def reset_grid(self, rows: int = None, cols: int = None, cell_size: int = None):
-        self.rows = rows if rows is not None else self.rows
-        self.cols = cols if cols is not None else self.cols
-
-        self.cell_size = cell_size if cell_size is not None else self.cell_size
-        self.width = self.cols * self.cell_size
-        self.height = self.rows * self.cell_size
-        self.cells = np.empty((self.cols, self.rows), dtype=object)
-
-        self.last_painted_cell = None
-
-        for x in range(self.cols):
-            for y in range(self.rows):
-                # Create a cell object with coordinates
-                self.cells[x][y] = Cell(x, y)
-
-        # 1. Delete the existing canvas if it exists
-        if dpg.does_item_exist("grid_wrapper"):
-            dpg.delete_item("grid_wrapper")
-        self.display_grid()
-
-    def get_cell_from_pos(self, x, y):
-        col = int(x // self.cell_size)
-        row = int(y // self.cell_size)
-
-        if 0 <= col < self.cols and 0 <= row < self.rows:
-            return self.cells[col][row]
-        return None
-
-    def handle_grid_click(self, type_of_click):
-        # SAFETY CHECK:
-        # If the grid doesn't exist (was deleted), stop immediately.
-        if not dpg.does_item_exist("grid_wrapper"):
-            return
-        elif not dpg.get_item_state("grid_canvas")['hovered']:
-            return
-
-        pos = dpg.get_drawing_mouse_pos()
-        cell = self.get_cell_from_pos(pos[0], pos[1])
-
-        cell_tag = get_cell_tag(cell.x, cell.y)
-        if cell and cell_tag != self.last_painted_cell:
-            # print(f"Clicked Cell: Row={row}, Col={col} (Tag: {cell_tag}")
-            if cell.is_start or cell.is_goal: return
-            if cell.passable and type_of_click == "left":
-                cell.passable = False
-                dpg.configure_item(cell_tag, fill=self.impassable_color)
-            elif type_of_click == "right":
-                cell.passable = True
-                dpg.configure_item(cell_tag, fill=self.default_cell_color)
-
-            self.last_painted_cell = cell_tag
-
-    def reset_drag_state(self):
-        self.last_painted_cell = None
-
-    def display_grid(self):
-        if self.grid_original_pos is None:
-            self.grid_original_pos = (dpg.get_value("main_window_padding"),
-                                      dpg.get_value("main_window_padding") + dpg.get_item_height("main_menu_bar"))
-
-        if dpg.does_item_exist("grid_wrapper"):
-            dpg.delete_item("grid_wrapper")
-
-        with dpg.child_window(tag="grid_wrapper", parent="main_window", horizontal_scrollbar=True, border=False,
-                              pos=self.grid_original_pos):
-            with dpg.drawlist(tag="grid_canvas", width=self.width, height=self.height):
-                with dpg.draw_node(tag="grid_node"):
-                    dpg.draw_rectangle(
-                        tag="grid_border",
-                        pmin=(0, 0),
-                        pmax=(self.width, self.height),
-                        color=self.line_cell_color,
-                        thickness=self.border_thickness,
-                        fill=self.default_cell_color
-                    )
-
-                    for x in range(self.cols):
-                        for y in range(self.rows):
-                            xp = x * self.cell_size
-                            yp = y * self.cell_size
-                            dpg.draw_rectangle(
-                                tag=get_cell_tag(x, y),
-                                pmin=(xp, yp),
-                                pmax=(xp + self.cell_size, yp + self.cell_size),
-                                color=self.line_cell_color,
-                                thickness=self.line_thickness,
-                                fill=self.default_cell_color
-                            )
-
-        # correct centering
-        self.update_grid_position()
-
-    def update_grid(self, grid_size=None, cell_size=None, line_thickness=None, default_cell_color=None,
-                    line_cell_color=None, impassable_color=None, grid_centered=None, clear=False):
-        if not dpg.does_item_exist("grid_wrapper"):
-            return
-
-        redraw_grid = ((grid_size[0], grid_size[1]) != (self.cols, self.rows)) if grid_size is not None else False
-        self.cols = grid_size[0] if grid_size is not None else self.cols
-        self.rows = grid_size[1] if grid_size is not None else self.rows
-        self.cell_size = cell_size if cell_size is not None else self.cell_size
-        self.line_thickness = line_thickness if line_thickness is not None else self.line_thickness
-        self.default_cell_color = default_cell_color if default_cell_color is not None else self.default_cell_color
-        self.line_cell_color = line_cell_color if line_cell_color is not None else self.line_cell_color
-        self.impassable_color = impassable_color if impassable_color is not None else self.impassable_color
-        self.grid_centered = grid_centered if grid_centered is not None else self.grid_centered
-        self.width = self.cols * self.cell_size
-        self.height = self.rows * self.cell_size
-        self.border_thickness = self.line_thickness * 2
-
-        dpg.set_value("grid_size", (self.cols, self.rows))
-        dpg.set_value("cell_size", self.cell_size)
-        dpg.set_value("line_thickness", self.line_thickness)
-
-        if redraw_grid:
-            self.reset_grid()
-            return
-
-        dpg.configure_item("grid_canvas", width=self.width, height=self.height)
-        dpg.configure_item("grid_border", pmax=(self.width, self.height), color=self.line_cell_color,
-                           thickness=self.border_thickness, fill=self.default_cell_color)
-
-        for row in self.cells:
-            for cell in row:
-                xp = cell.x * self.cell_size
-                yp = cell.y * self.cell_size
-                cell.passable = True if clear else cell.passable
-                dpg.configure_item(
-                    get_cell_tag(cell.x, cell.y),
-                    pmin=(xp, yp),
-                    pmax=(xp + self.cell_size, yp + self.cell_size),
-                    color=self.line_cell_color,
-                    thickness=self.line_thickness,
-                    fill=self.default_cell_color if cell.passable else self.impassable_color
-                )
-
-        self.update_grid_position()
-
-    def update_grid_position(self):
-        main_menu_bar_h = dpg.get_item_height("main_menu_bar")
-        content_w, content_h = dpg.get_item_width("main_window"), dpg.get_item_height(
-            "main_window") - main_menu_bar_h
-        if self.grid_centered:
-            center_x = (content_w - self.width) // 2
-            center_y = (content_h - self.height) // 2
-
-            if center_x >= 0 and center_y >= 0:
-                dpg.set_item_pos("grid_wrapper", (center_x, center_y + main_menu_bar_h))
-            elif center_x >= 0 and not center_y >= 0:
-                dpg.set_item_pos("grid_wrapper", (center_x, self.grid_original_pos[1]))
-            elif not center_x >= 0 and center_y >= 0:
-                dpg.set_item_pos("grid_wrapper", (self.grid_original_pos[0], center_y + main_menu_bar_h))
-            else:
-                dpg.set_item_pos("grid_wrapper", self.grid_original_pos)
-        else:
-            dpg.set_item_pos("grid_wrapper", self.grid_original_pos)
-
-    def close_advanced_window(self, canceled: bool):
-        dpg.configure_item("advanced_grid_settings", show=False)
-
-        if not canceled:
-            self.update_grid(grid_size=dpg.get_value("grid_size"),
-                             cell_size=dpg.get_value("cell_size"),
-                             line_thickness=dpg.get_value("line_thickness"),
-                             default_cell_color=dpg.get_value("cell_color"),
-                             line_cell_color=dpg.get_value("line_color"),
-                             impassable_color=dpg.get_value("impassable_color"),
-                             grid_centered=dpg.get_value("center_grid"))
-        else:
-            dpg.set_value("grid_size", (self.cols, self.rows))
-            dpg.set_value("cell_size", self.cell_size)
-            dpg.set_value("line_thickness", self.line_thickness)
-            dpg.set_value("cell_color", self.default_cell_color)
-            dpg.set_value("line_color", self.line_cell_color)
-            dpg.set_value("impassable_color", self.impassable_color)
+import dearpygui.dearpygui as dpg
+import numpy as np
+
+from Brush import Brush
+from GridData import GridData
+from GridTexture import GridTexture, terrain_ramp
+from MapGenerators import GENERATORS
+
+# grids with more cells than this are always drawn as a texture, one item per cell would be too slow
+ITEM_RENDER_LIMIT = 100 * 100
+# loaded maps shrink the cell size so the canvas stays within this many pixels per axis
+MAX_CANVAS_SIZE = 4096
+
+
+def get_cell_tag(x, y):
+    return f"CELL_{x}_{y}"
+
+
+class Grid:
+    def __init__(self, rows: int, cols: int, cell_size: int = 50):
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size
+        self.line_thickness = 1.0
+        self.border_thickness = self.line_thickness * 2
+        self.width = self.cols * self.cell_size
+        self.height = self.rows * self.cell_size
+        self.default_cell_color = (0.0, 0.0, 0.0, 0.0)
+        self.impassable_color = (255.0, 155.0, 28.0, 255.0)
+        self.line_cell_color = (255.0, 255.0, 255.0, 125.0)
+        self.path_color = (66.0, 135.0, 245.0, 255.0)
+        self.agent_path_color = (235.0, 110.0, 200.0, 150.0)
+        self.start_color = (79.0, 225.0, 46.0, 255.0)
+        self.goal_color = (255.0, 0.0, 0.0, 255.0)
+        self.open_color = (120.0, 200.0, 255.0, 120.0)
+        self.closed_color = (70.0, 90.0, 160.0, 160.0)
+        self.region_color = (150.0, 110.0, 220.0, 90.0)
+        # distance heatmap runs from the first color at the goal to the second at the farthest cell
+        self.heat_colors = ((255.0, 225.0, 80.0, 190.0), (90.0, 30.0, 150.0, 190.0))
+        # terrain runs from the first color at cost 2 to the second at cost 255
+        self.terrain_colors = ((205.0, 180.0, 110.0, 120.0), (30.0, 70.0, 190.0, 230.0))
+        self.terrain_ramp = terrain_ramp(*self.terrain_colors)
+
+        # "items" draws one rectangle per cell, "texture" draws the whole grid as a single image
+        self.render_mode = "items"
+        self.show_grid_lines = True
+        self.texture = None
+        # cell writes only touch the texture buffer, upload_texture sends it to dpg once per frame
+        self.texture_dirty = False
+
+        self.grid_original_pos = None
+
+        self.data = GridData(rows, cols)
+        self.grid_centered = False
+
+        self.last_painted_cell = None
+        self.path_points = None
+        # routes of a batch of agents, drawn under the main path
+        self.agent_paths = []
+        self.brush = Brush()
+        # generated maps come out at this (cols, rows) size, None keeps the grid's, and the next one gets this seed
+        self.generator_size = None
+        self.generator_seed = 0
+
+    def reset_grid(self, rows: int = None, cols: int = None, cell_size: int = None):
+        self.rows = rows if rows is not None else self.rows
+        self.cols = cols if cols is not None else self.cols
+
+        self.cell_size = cell_size if cell_size is not None else self.cell_size
+        self.width = self.cols * self.cell_size
+        self.height = self.rows * self.cell_size
+        self.data.reset(self.rows, self.cols)
+
+        self.last_painted_cell = None
+        self.path_points = None
+        self.agent_paths = []
+        self.brush.reset()
+
+        # 1. Delete the existing canvas if it exists
+        if dpg.does_item_exist("grid_wrapper"):
+            dpg.delete_item("grid_wrapper")
+        self.display_grid()
+
+    def load_data(self, data: GridData):
+        self.set_plane(data.passable, data.start, data.goal, data.cost)
+
+    def set_plane(self, passable, start=None, goal=None, cost=None):
+        # swaps in a whole map and redraws once, as a texture when it is too big for cell items
+        self.data.assign(passable, start, goal, cost)
+        self.rows, self.cols = self.data.rows, self.data.cols
+        if self.rows * self.cols > ITEM_RENDER_LIMIT:
+            self.render_mode = "texture"
+        self.cell_size = max(1, min(self.cell_size, MAX_CANVAS_SIZE // max(self.rows, self.cols)))
+        self.width = self.cols * self.cell_size
+        self.height = self.rows * self.cell_size
+
+        self.last_painted_cell = None
+        self.path_points = None
+        self.agent_paths = []
+        self.brush.reset()
+
+        dpg.set_value("grid_size", (self.cols, self.rows))
+        dpg.set_value("cell_size", self.cell_size)
+        self.display_grid()
+
+    def get_cell_from_pos(self, x, y):
+        col = int(x // self.cell_size)
+        row = int(y // self.cell_size)
+
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.data.cell(col, row)
+        return None
+
+    def handle_grid_click(self, type_of_click):
+        # SAFETY CHECK:
+        # If the grid doesn't exist (was deleted), stop immediately.
+        if not dpg.does_item_exist("grid_wrapper"):
+            return
+        elif not dpg.get_item_state("grid_canvas")['hovered']:
+            return
+
+        pos = dpg.get_drawing_mouse_pos()
+        cell = self.get_cell_from_pos(pos[0], pos[1])
+
+        if cell is None:
+            return
+        # only the cursor sample is recorded here, the cells are painted once per frame by flush_brush
+        sample = (cell.x, cell.y, type_of_click)
+        if sample != self.last_painted_cell:
+            self.brush.add_sample(*sample)
+            self.last_painted_cell = sample
+
+    def reset_drag_state(self):
+        if self.last_painted_cell is not None:
+            self.brush.end_stroke()
+        self.last_painted_cell = None
+
+    def set_brush(self, tool: str = None, size: int = None):
+        self.brush.tool = tool if tool is not None else self.brush.tool
+        self.brush.size = size if size is not None else self.brush.size
+
+    def set_terrain(self, cost):
+        # None goes back to painting walls
+        self.brush.terrain = cost
+
+    def flush_brush(self):
+        # called every frame, applies all cells painted since the last frame in one batch
+        if not self.brush.samples:
+            return False
+        xs, ys = self.brush.flush(self.data)
+        self.draw_brush_preview()
+        if not len(xs):
+            return False
+        self.set_cell_fills(xs, ys)
+        self.clear_path()
+        return True
+
+    def draw_brush_preview(self):
+        if not dpg.does_item_exist("brush_preview"):
+            return
+        anchor, last = self.brush.anchor, self.brush.last_sample
+        if anchor is None or last is None:
+            dpg.configure_item("brush_preview", show=False)
+            return
+        dpg.configure_item("brush_preview",
+                           pmin=(min(anchor[0], last[0]) * self.cell_size, min(anchor[1], last[1]) * self.cell_size),
+                           pmax=((max(anchor[0], last[0]) + 1) * self.cell_size,
+                                 (max(anchor[1], last[1]) + 1) * self.cell_size),
+                           color=self.get_brush_color(anchor[2]),
+                           thickness=self.border_thickness, show=True)
+
+    def get_brush_color(self, type_of_click: str):
+        if type_of_click != "left":
+            return self.line_cell_color
+        if self.brush.terrain is None:
+            return self.impassable_color
+        return tuple(self.terrain_ramp[min(max(self.brush.terrain, 2), 255)].tolist())
+
+    def set_generator_size(self, size):
+        self.generator_size = size
+
+    def generate(self, generator: str, seed: int = None, **options):
+        # writes a generated map straight into the grid data; start and goal stay if they land on an open cell of
+        # the new map. Returns the seed, the same seed and size always give the same map
+        seed = seed if seed is not None else self.generator_seed
+        self.generator_seed = seed + 1
+        cols, rows = self.generator_size or (self.cols, self.rows)
+        plane = GENERATORS[generator](rows, cols, seed, **options)
+        kept = lambda pos: pos is not None and pos[0] < cols and pos[1] < rows and bool(plane[pos[1], pos[0]])
+        start, goal = (pos if kept(pos) else None for pos in (self.data.start, self.data.goal))
+        self.set_plane(plane, start, goal)
+        return seed
+
+    def display_grid(self):
+        if self.grid_original_pos is None:
+            self.grid_original_pos = (dpg.get_value("main_window_padding"),
+                                      dpg.get_value("main_window_padding") + dpg.get_item_height("main_menu_bar"))
+
+        if dpg.does_item_exist("grid_wrapper"):
+            dpg.delete_item("grid_wrapper")
+
+        with dpg.child_window(tag="grid_wrapper", parent="main_window", horizontal_scrollbar=True, border=False,
+                              pos=self.grid_original_pos):
+            with dpg.drawlist(tag="grid_canvas", width=self.width, height=self.height):
+                with dpg.draw_node(tag="grid_node"):
+                    dpg.draw_rectangle(
+                        tag="grid_border",
+                        pmin=(0, 0),
+                        pmax=(self.width, self.height),
+                        color=self.line_cell_color,
+                        thickness=self.border_thickness,
+                        fill=self.default_cell_color
+                    )
+
+                    if self.render_mode == "texture":
+                        self.draw_texture_grid()
+                    else:
+                        for x in range(self.cols):
+                            for y in range(self.rows):
+                                self.draw_cell(x, y)
+
+                    dpg.draw_rectangle((0, 0), (self.cell_size, self.cell_size), tag="brush_preview", show=False)
+
+        self.draw_path_overlay()
+
+        # correct centering
+        self.update_grid_position()
+
+    def draw_cell(self, x: int, y: int, **kwargs):
+        xp = x * self.cell_size
+        yp = y * self.cell_size
+        dpg.draw_rectangle(
+            tag=get_cell_tag(x, y),
+            pmin=(xp, yp),
+            pmax=(xp + self.cell_size, yp + self.cell_size),
+            color=self.line_cell_color,
+            thickness=self.line_thickness,
+            fill=self.get_cell_fill(x, y),
+            **kwargs
+        )
+
+    def resize_grid(self, rows: int, cols: int):
+        # keeps the overlapping cells and only deletes or draws the items of the rows and columns that changed,
+        # so growing by one row costs one row of new items instead of a full rebuild
+        old_rows, old_cols = self.rows, self.cols
+        self.rows, self.cols = rows, cols
+        self.width = self.cols * self.cell_size
+        self.height = self.rows * self.cell_size
+        self.data.resize(rows, cols)
+
+        self.last_painted_cell = None
+        self.path_points = None
+        self.agent_paths = []
+        self.brush.reset()
+
+        if self.render_mode == "items" and rows * cols > ITEM_RENDER_LIMIT:
+            self.render_mode = "texture"
+        if self.render_mode == "texture":
+            # the texture is a single item sized to the grid, rebuilding it is one vectorized fill
+            self.display_grid()
+            return
+
+        for y in range(old_rows):
+            for x in range(cols, old_cols):
+                dpg.delete_item(get_cell_tag(x, y))
+        for y in range(rows, old_rows):
+            for x in range(min(cols, old_cols)):
+                dpg.delete_item(get_cell_tag(x, y))
+        # new cells go under the brush preview and the path like the rest
+        for y in range(rows):
+            for x in range(old_cols if y < old_rows else 0, cols):
+                self.draw_cell(x, y, parent="grid_node", before="brush_preview")
+
+    def update_grid(self, grid_size=None, cell_size=None, line_thickness=None, default_cell_color=None,
+                    line_cell_color=None, impassable_color=None, grid_centered=None, clear=False):
+        if not dpg.does_item_exist("grid_wrapper"):
+            return
+
+        resized = ((grid_size[0], grid_size[1]) != (self.cols, self.rows)) if grid_size is not None else False
+        style = lambda: (self.cell_size, self.line_thickness, tuple(self.default_cell_color),
+                         tuple(self.line_cell_color), tuple(self.impassable_color))
+        old_style = style()
+        self.cell_size = cell_size if cell_size is not None else self.cell_size
+        self.line_thickness = line_thickness if line_thickness is not None else self.line_thickness
+        self.default_cell_color = default_cell_color if default_cell_color is not None else self.default_cell_color
+        self.line_cell_color = line_cell_color if line_cell_color is not None else self.line_cell_color
+        self.impassable_color = impassable_color if impassable_color is not None else self.impassable_color
+        self.grid_centered = grid_centered if grid_centered is not None else self.grid_centered
+        self.border_thickness = self.line_thickness * 2
+        restyled = style() != old_style
+
+        if resized:
+            # texture mode rebuilds the canvas here, items mode only touches the added or removed cells
+            self.resize_grid(grid_size[1], grid_size[0])
+        self.width = self.cols * self.cell_size
+        self.height = self.rows * self.cell_size
+
+        dpg.set_value("grid_size", (self.cols, self.rows))
+        dpg.set_value("cell_size", self.cell_size)
+        dpg.set_value("line_thickness", self.line_thickness)
+
+        dpg.configure_item("grid_canvas", width=self.width, height=self.height)
+        dpg.configure_item("grid_border", pmax=(self.width, self.height), color=self.line_cell_color,
+                           thickness=self.border_thickness, fill=self.default_cell_color)
+
+        if clear:
+            self.data.clear()
+
+        if self.render_mode == "texture":
+            if not self.texture.matches(self.rows, self.cols, self.cell_size):
+                self.display_grid()
+                return
+            if restyled or clear:
+                self.refresh_texture()
+                self.draw_grid_lines()
+        elif restyled or clear:
+            for y in range(self.rows):
+                for x in range(self.cols):
+                    xp = x * self.cell_size
+                    yp = y * self.cell_size
+                    dpg.configure_item(
+                        get_cell_tag(x, y),
+                        pmin=(xp, yp),
+                        pmax=(xp + self.cell_size, yp + self.cell_size),
+                        color=self.line_cell_color,
+                        thickness=self.line_thickness,
+                        fill=self.get_cell_fill(x, y)
+                    )
+
+        if clear:
+            self.path_points = None
+            self.agent_paths = []
+        self.draw_path_overlay()
+        self.update_grid_position()
+
+    def get_cell_fill(self, x: int, y: int):
+        if self.data.start == (x, y):
+            return self.start_color
+        if self.data.goal == (x, y):
+            return self.goal_color
+        if not self.data.passable[y, x]:
+            return self.impassable_color
+        cost = self.data.cost[y, x]
+        return tuple(self.terrain_ramp[cost].tolist()) if cost > 1 else self.default_cell_color
+
+    def set_cell_fill(self, x: int, y: int, fill):
+        if self.render_mode == "texture":
+            self.texture.write_cell(x, y, fill)
+            self.texture_dirty = True
+        else:
+            dpg.configure_item(get_cell_tag(x, y), fill=fill)
+
+    def set_cell_fills(self, xs, ys):
+        # repaints a batch of cells from the grid state
+        if self.render_mode == "texture":
+            self.texture.write_cells(xs, ys, self.data.passable[ys, xs], self.data.cost[ys, xs])
+            # write_cells only knows passability and terrain, put the endpoint markers back on top
+            for pos, color in ((self.data.start, self.start_color), (self.data.goal, self.goal_color)):
+                if pos is not None and ((xs == pos[0]) & (ys == pos[1])).any():
+                    self.texture.write_cell(pos[0], pos[1], color)
+            self.texture_dirty = True
+        else:
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                dpg.configure_item(get_cell_tag(x, y), fill=self.get_cell_fill(x, y))
+
+    def paint_cells(self, xs, ys, color):
+        # temporary coloring on top of the grid state (search visualization), undone with set_cell_fills.
+        # color is one color for all cells or an (n, 4) array of per-cell colors
+        if self.render_mode == "texture":
+            self.texture.paint_cells(xs, ys, color)
+            self.texture_dirty = True
+        elif np.ndim(color) == 2:
+            for x, y, fill in zip(xs.tolist(), ys.tolist(), color.tolist()):
+                dpg.configure_item(get_cell_tag(x, y), fill=fill)
+        else:
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                dpg.configure_item(get_cell_tag(x, y), fill=color)
+
+    def upload_texture(self):
+        # called every frame, one set_value for all the cell writes since the last one
+        if not self.texture_dirty:
+            return False
+        self.texture_dirty = False
+        if self.render_mode != "texture" or not dpg.does_item_exist("grid_texture"):
+            return False
+        dpg.set_value("grid_texture", self.texture.flat())
+        return True
+
+    def set_cell_outline(self, x: int, y: int, color=None, thickness=None):
+        # no color means back to the normal grid line
+        if self.render_mode == "texture":
+            if color is None:
+                dpg.configure_item("cell_highlight", show=False)
+            else:
+                xp = x * self.cell_size
+                yp = y * self.cell_size
+                dpg.configure_item("cell_highlight", pmin=(xp, yp), pmax=(xp + self.cell_size, yp + self.cell_size),
+                                   color=color, thickness=thickness or self.border_thickness, show=True)
+        else:
+            dpg.configure_item(get_cell_tag(x, y), color=color or self.line_cell_color,
+                               thickness=thickness or self.line_thickness)
+
+    def set_render_mode(self, render_mode: str):
+        if render_mode == self.render_mode:
+            return
+        self.render_mode = render_mode
+        if dpg.does_item_exist("grid_wrapper"):
+            self.display_grid()
+
+    def set_grid_lines(self, show: bool):
+        self.show_grid_lines = show
+        if dpg.does_item_exist("grid_lines"):
+            dpg.configure_item("grid_lines", show=show)
+
+    def draw_texture_grid(self):
+        if not dpg.does_item_exist("grid_texture_registry"):
+            dpg.add_texture_registry(tag="grid_texture_registry")
+        if dpg.does_item_exist("grid_texture"):
+            dpg.delete_item("grid_texture")
+
+        self.texture = GridTexture(self.rows, self.cols, self.cell_size)
+        self.texture.set_palette(self.default_cell_color, self.impassable_color, self.start_color, self.goal_color)
+        self.texture.set_ramp(self.terrain_ramp)
+        self.texture.fill_from(self.data.passable, self.data.start, self.data.goal, self.data.cost)
+        dpg.add_raw_texture(self.texture.width, self.texture.height, self.texture.flat(),
+                            format=dpg.mvFormat_Float_rgba, tag="grid_texture", parent="grid_texture_registry")
+        self.texture_dirty = False
+
+        dpg.draw_image("grid_texture", (0, 0), (self.width, self.height), tag="grid_image", parent="grid_node")
+        self.draw_grid_lines()
+        dpg.draw_rectangle((0, 0), (self.cell_size, self.cell_size), tag="cell_highlight", parent="grid_node",
+                           show=False)
+
+    def refresh_texture(self):
+        # a full repaint is one vectorized buffer write and a single set_value, whatever the grid size
+        self.texture.set_palette(self.default_cell_color, self.impassable_color, self.start_color, self.goal_color)
+        self.texture.fill_from(self.data.passable, self.data.start, self.data.goal, self.data.cost)
+        dpg.set_value("grid_texture", self.texture.flat())
+        self.texture_dirty = False
+        dpg.configure_item("grid_image", pmax=(self.width, self.height))
+
+    def draw_grid_lines(self):
+        # rows + cols lines instead of rows * cols outlines
+        if dpg.does_item_exist("grid_lines"):
+            dpg.delete_item("grid_lines")
+        with dpg.draw_node(tag="grid_lines", parent="grid_node", before=self.get_overlay_anchor(),
+                           show=self.show_grid_lines):
+            for x in range(1, self.cols):
+                dpg.draw_line((x * self.cell_size, 0), (x * self.cell_size, self.height),
+                              color=self.line_cell_color, thickness=self.line_thickness)
+            for y in range(1, self.rows):
+                dpg.draw_line((0, y * self.cell_size), (self.width, y * self.cell_size),
+                              color=self.line_cell_color, thickness=self.line_thickness)
+
+    def get_overlay_anchor(self):
+        # grid lines go under the highlight and the path
+        return "cell_highlight" if dpg.does_item_exist("cell_highlight") else 0
+
+    def draw_path(self, path, color=None):
+        self.path_points = list(path) if path else None
+        self.path_color = color if color is not None else self.path_color
+        self.draw_path_overlay()
+
+    def clear_path(self):
+        self.path_points = None
+        self.draw_path_overlay()
+
+    def add_agent_path(self, path):
+        self.agent_paths.append(list(path))
+        if dpg.does_item_exist("agent_paths"):
+            self.draw_agent_path(self.agent_paths[-1])
+        else:
+            self.draw_path_overlay()
+
+    def clear_agent_paths(self):
+        self.agent_paths = []
+        if dpg.does_item_exist("agent_paths"):
+            dpg.delete_item("agent_paths")
+
+    def draw_agent_path(self, path):
+        half = self.cell_size / 2
+        dpg.draw_polyline([(x * self.cell_size + half, y * self.cell_size + half) for x, y in path],
+                          parent="agent_paths", color=self.agent_path_color,
+                          thickness=max(self.line_thickness, self.cell_size / 10))
+
+    def draw_path_overlay(self):
+        # the path is a single polyline through the cell centers so drawing it never touches the cell items,
+        # agent routes get one each in their own node below it
+        if dpg.does_item_exist("path_line"):
+            dpg.delete_item("path_line")
+        if dpg.does_item_exist("agent_paths"):
+            dpg.delete_item("agent_paths")
+        if not dpg.does_item_exist("grid_node"):
+            return
+        if self.agent_paths:
+            dpg.add_draw_node(tag="agent_paths", parent="grid_node")
+            for path in self.agent_paths:
+                self.draw_agent_path(path)
+        if not self.path_points:
+            return
+        half = self.cell_size / 2
+        dpg.draw_polyline([(x * self.cell_size + half, y * self.cell_size + half) for x, y in self.path_points],
+                          tag="path_line", parent="grid_node", color=self.path_color,
+                          thickness=max(self.line_thickness * 2, self.cell_size / 6))
+
+    def update_grid_position(self):
+        main_menu_bar_h = dpg.get_item_height("main_menu_bar")
+        content_w, content_h = dpg.get_item_width("main_window"), dpg.get_item_height(
+            "main_window") - main_menu_bar_h
+        if self.grid_centered:
+            center_x = (content_w - self.width) // 2
+            center_y = (content_h - self.height) // 2
+
+            if center_x >= 0 and center_y >= 0:
+                dpg.set_item_pos("grid_wrapper", (center_x, center_y + main_menu_bar_h))
+            elif center_x >= 0 and not center_y >= 0:
+                dpg.set_item_pos("grid_wrapper", (center_x, self.grid_original_pos[1]))
+            elif not center_x >= 0 and center_y >= 0:
+                dpg.set_item_pos("grid_wrapper", (self.grid_original_pos[0], center_y + main_menu_bar_h))
+            else:
+                dpg.set_item_pos("grid_wrapper", self.grid_original_pos)
+        else:
+            dpg.set_item_pos("grid_wrapper", self.grid_original_pos)
+
+    def close_advanced_window(self, canceled: bool):
+        dpg.configure_item("advanced_grid_settings", show=False)
+
+        if not canceled:
+            self.update_grid(grid_size=dpg.get_value("grid_size"),
+                             cell_size=dpg.get_value("cell_size"),
+                             line_thickness=dpg.get_value("line_thickness"),
+                             default_cell_color=dpg.get_value("cell_color"),
+                             line_cell_color=dpg.get_value("line_color"),
+                             impassable_color=dpg.get_value("impassable_color"),
+                             grid_centered=dpg.get_value("center_grid"))
+        else:
+            dpg.set_value("grid_size", (self.cols, self.rows))
+            dpg.set_value("cell_size", self.cell_size)
+            dpg.set_value("line_thickness", self.line_thickness)
+            dpg.set_value("cell_color", self.default_cell_color)
+            dpg.set_value("line_color", self.line_cell_color)
+            dpg.set_value("impassable_color", self.impassable_color)
             dpg.set_value("center_grid", self.grid_centered)
\ No newline at end of file
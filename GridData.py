@@ -0,0 +1,215 @@
+import numpy as np
+
+from RegionIndex import RegionIndex
+
+
+class Cell:
+    __slots__ = ("data", "x", "y")
+
+    # A Cell is only a view into GridData, so creating one is cheap and it always reflects the current grid state
+    def __init__(self, data, x: int, y: int):
+        self.data = data
+        self.x = x
+        self.y = y
+
+    @property
+    def passable(self):
+        return bool(self.data.passable[self.y, self.x])
+
+    @passable.setter
+    def passable(self, value: bool):
+        self.data.set_passable(self.x, self.y, value)
+
+    @property
+    def is_start(self):
+        return self.data.start == (self.x, self.y)
+
+    @is_start.setter
+    def is_start(self, value: bool):
+        if value:
+            self.data.set_start((self.x, self.y))
+        elif self.is_start:
+            self.data.set_start(None)
+
+    @property
+    def is_goal(self):
+        return self.data.goal == (self.x, self.y)
+
+    @is_goal.setter
+    def is_goal(self, value: bool):
+        if value:
+            self.data.set_goal((self.x, self.y))
+        elif self.is_goal:
+            self.data.set_goal(None)
+
+    def __eq__(self, other):
+        return isinstance(other, Cell) and other.data is self.data and (other.x, other.y) == (self.x, self.y)
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return f"Cell({self.x}, {self.y})"
+
+
+class GridData:
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        # row-major plane indexed [y, x], 1 = passable, 0 = blocked
+        self.passable = np.ones((rows, cols), dtype=np.uint8)
+        # terrain cost of entering each cell, 1 is plain ground and 255 the most expensive; a move costs its
+        # length times this, so weighted maps stay at one extra byte per cell
+        self.cost = np.ones((rows, cols), dtype=np.uint8)
+        # cells costing more than plain ground, kept up to date by every cost edit so weighted is O(1)
+        self.weighted_cells = 0
+        self.start = None
+        self.goal = None
+        # bumped on every change so anything derived from the grid (paths, caches...) can tell when it is stale
+        self.version = 0
+        # connected regions, built on first use and then kept up to date cell by cell
+        self.regions = RegionIndex(rows, cols)
+
+    def reset(self, rows: int = None, cols: int = None):
+        self.rows = rows if rows is not None else self.rows
+        self.cols = cols if cols is not None else self.cols
+        self.passable = np.ones((self.rows, self.cols), dtype=np.uint8)
+        self.cost = np.ones((self.rows, self.cols), dtype=np.uint8)
+        self.weighted_cells = 0
+        self.start = None
+        self.goal = None
+        self.version += 1
+        self.regions.invalidate(self.rows, self.cols)
+
+    def resize(self, rows: int, cols: int):
+        # keeps the overlapping part of the plane, new cells start walkable and endpoints left outside are dropped
+        plane = np.ones((rows, cols), dtype=np.uint8)
+        cost = np.ones((rows, cols), dtype=np.uint8)
+        keep_rows, keep_cols = min(rows, self.rows), min(cols, self.cols)
+        plane[:keep_rows, :keep_cols] = self.passable[:keep_rows, :keep_cols]
+        cost[:keep_rows, :keep_cols] = self.cost[:keep_rows, :keep_cols]
+        self.rows, self.cols = rows, cols
+        self.passable = plane
+        self.cost = cost
+        self.weighted_cells = int(np.count_nonzero(cost > 1))
+        self.start = self.start if self.start is not None and self.in_bounds(*self.start) else None
+        self.goal = self.goal if self.goal is not None and self.in_bounds(*self.goal) else None
+        self.version += 1
+        self.regions.invalidate(rows, cols)
+
+    def assign(self, passable: np.ndarray, start=None, goal=None, cost: np.ndarray = None):
+        # swaps in a whole new plane (loaded or generated map), keeping this object so views stay attached
+        self.rows, self.cols = passable.shape
+        self.passable = np.ascontiguousarray(passable != 0, dtype=np.uint8)
+        self.cost = (np.maximum(cost, 1).astype(np.uint8) if cost is not None
+                     else np.ones((self.rows, self.cols), dtype=np.uint8))
+        self.weighted_cells = int(np.count_nonzero(self.cost > 1))
+        self.regions.invalidate(self.rows, self.cols)
+        self.start = None
+        self.goal = None
+        if start is not None:
+            self.set_start(start)
+        if goal is not None:
+            self.set_goal(goal)
+        self.version += 1
+
+    def in_bounds(self, x: int, y: int):
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def cell(self, x: int, y: int):
+        if self.in_bounds(x, y):
+            return Cell(self, x, y)
+        return None
+
+    def set_passable(self, x: int, y: int, value: bool):
+        value = 1 if value else 0
+        if self.passable[y, x] == value:
+            return False
+        self.passable[y, x] = value
+        self.version += 1
+        self.regions.update(np.array([x]), np.array([y]), self.passable)
+        return True
+
+    def set_passable_many(self, xs: np.ndarray, ys: np.ndarray, value: bool):
+        # batched edit, start and goal are never blocked; returns the cells that actually changed
+        value = 1 if value else 0
+        keep = self.passable[ys, xs] != value
+        for pos in (self.start, self.goal):
+            if pos is not None:
+                keep &= (xs != pos[0]) | (ys != pos[1])
+        xs, ys = xs[keep], ys[keep]
+        if len(xs):
+            self.passable[ys, xs] = value
+            self.version += 1
+            self.regions.update(xs, ys, self.passable)
+        return xs, ys
+
+    def set_cost_many(self, xs: np.ndarray, ys: np.ndarray, value: int):
+        # batched terrain edit, returns the cells whose cost actually changed
+        value = min(max(int(value), 1), 255)
+        keep = self.cost[ys, xs] != value
+        xs, ys = xs[keep], ys[keep]
+        if len(xs):
+            if value > 1:
+                self.weighted_cells += int(np.count_nonzero(self.cost[ys, xs] == 1))
+            else:
+                self.weighted_cells -= len(xs)
+            self.cost[ys, xs] = value
+            self.version += 1
+        return xs, ys
+
+    @property
+    def weighted(self):
+        return self.weighted_cells > 0
+
+    def set_start(self, pos):
+        self.start = tuple(pos) if pos is not None else None
+        self.open_endpoint(self.start)
+        self.version += 1
+
+    def set_goal(self, pos):
+        self.goal = tuple(pos) if pos is not None else None
+        self.open_endpoint(self.goal)
+        self.version += 1
+
+    def open_endpoint(self, pos):
+        # start and goal are always walkable
+        if pos is not None and not self.passable[pos[1], pos[0]]:
+            self.passable[pos[1], pos[0]] = 1
+            self.regions.update(np.array([pos[0]]), np.array([pos[1]]), self.passable)
+
+    def clear(self):
+        self.passable.fill(1)
+        self.cost.fill(1)
+        self.weighted_cells = 0
+        self.version += 1
+        self.regions.invalidate()
+
+    def invert(self):
+        np.bitwise_xor(self.passable, 1, out=self.passable)
+        # start and goal always stay walkable
+        for pos in (self.start, self.goal):
+            if pos is not None:
+                self.passable[pos[1], pos[0]] = 1
+        self.version += 1
+        self.regions.invalidate()
+
+    def connected(self, a, b):
+        # O(1) reachability once the regions are built, diagonal moves never connect what 4-moves can't
+        if not (self.passable[a[1], a[0]] and self.passable[b[1], b[0]]):
+            return False
+        self.regions.sync(self.passable)
+        return self.regions.region(*a) == self.regions.region(*b)
+
+    def region_mask(self, pos):
+        # every cell reachable from pos, as a (rows, cols) bool mask
+        if not self.passable[pos[1], pos[0]]:
+            return np.zeros((self.rows, self.cols), dtype=bool)
+        self.regions.sync(self.passable)
+        return self.regions.region_mask(self.regions.region(*pos))
+
+    def count_passable(self):
+        return int(np.count_nonzero(self.passable))
+
+    def count_impassable(self):
+        return self.passable.size - self.count_passable()
@@ -0,0 +1,87 @@
+import numpy as np
+
+# upper bound on texels in the grid texture, past that every cell gets a single texel
+MAX_TEXELS = 4_000_000
+
+PASSABLE, IMPASSABLE, START, GOAL = range(4)
+
+
+def terrain_ramp(low_color, high_color):
+    # color for every terrain cost 0-255 in dpg's 0-255 range, on a log scale so the cheap costs people paint
+    # most (2-10) are still told apart; costs 0 and 1 are plain ground and never looked up
+    t = np.log(np.maximum(np.arange(256), 1)) / np.log(255)
+    low, high = np.array(low_color, dtype=np.float32), np.array(high_color, dtype=np.float32)
+    return (low + t[:, None] * (high - low)).astype(np.float32)
+
+
+def get_texel_scale(rows: int, cols: int, cell_size: int):
+    return int(max(1, min(cell_size, (MAX_TEXELS / (rows * cols)) ** 0.5)))
+
+
+class GridTexture:
+    # The whole grid as one RGBA float buffer (what dpg raw textures take), with each cell scaled up to
+    # texel_scale x texel_scale texels so linear filtering only softens the cell edges a little
+    def __init__(self, rows: int, cols: int, cell_size: int):
+        self.rows = rows
+        self.cols = cols
+        self.texel_scale = get_texel_scale(rows, cols, cell_size)
+        self.width = cols * self.texel_scale
+        self.height = rows * self.texel_scale
+        self.buffer = np.zeros((self.height, self.width, 4), dtype=np.float32)
+        self.palette = np.zeros((4, 4), dtype=np.float32)
+        self.ramp = np.zeros((256, 4), dtype=np.float32)
+
+    def matches(self, rows: int, cols: int, cell_size: int):
+        return (rows, cols) == (self.rows, self.cols) and self.texel_scale == get_texel_scale(rows, cols, cell_size)
+
+    def set_palette(self, passable_color, impassable_color, start_color, goal_color):
+        # dpg colors are 0-255, texture colors are 0-1
+        self.palette[:] = np.array([passable_color, impassable_color, start_color, goal_color],
+                                   dtype=np.float32) / 255.0
+
+    def set_ramp(self, ramp: np.ndarray):
+        self.ramp[:] = ramp / 255.0
+
+    def colors_for(self, passable: np.ndarray, cost: np.ndarray = None):
+        colors = self.palette[np.where(passable != 0, PASSABLE, IMPASSABLE)]
+        if cost is not None:
+            terrain = (passable != 0) & (cost > 1)
+            colors[terrain] = self.ramp[cost[terrain]]
+        return colors
+
+    def fill_from(self, passable: np.ndarray, start=None, goal=None, cost: np.ndarray = None):
+        colors = self.colors_for(passable, cost)
+        if start is not None:
+            colors[start[1], start[0]] = self.palette[START]
+        if goal is not None:
+            colors[goal[1], goal[0]] = self.palette[GOAL]
+        self.fill_colors(colors)
+
+    def fill_colors(self, colors: np.ndarray):
+        # colors is a (rows, cols, 4) array in 0-1, written as one vectorized upscale
+        k = self.texel_scale
+        if k == 1:
+            self.buffer[...] = colors
+        else:
+            self.buffer.reshape(self.rows, k, self.cols, k, 4)[...] = colors[:, None, :, None, :]
+
+    def write_cell(self, x: int, y: int, color):
+        k = self.texel_scale
+        self.buffer[y * k:(y + 1) * k, x * k:(x + 1) * k] = np.asarray(color, dtype=np.float32) / 255.0
+
+    def write_cells(self, xs: np.ndarray, ys: np.ndarray, passable: np.ndarray, cost: np.ndarray = None):
+        # batched version of write_cell for passable/impassable cells, with their terrain if a cost is given
+        k = self.texel_scale
+        colors = self.colors_for(passable, cost)
+        self.buffer.reshape(self.rows, k, self.cols, k, 4)[ys, :, xs, :] = colors[:, None, None, :]
+
+    def paint_cells(self, xs: np.ndarray, ys: np.ndarray, color):
+        # one color for every cell, or an (n, 4) array with a color per cell
+        k = self.texel_scale
+        color = np.asarray(color, dtype=np.float32) / 255.0
+        if color.ndim == 2:
+            color = color[:, None, None, :]
+        self.buffer.reshape(self.rows, k, self.cols, k, 4)[ys, :, xs, :] = color
+
+    def flat(self):
+        return self.buffer.ravel()
@@ -0,0 +1,320 @@
+import heapq
+import math
+import time
+
+import numpy as np
+
+from SearchEngine import CANCEL_MASK, SQRT2, CancelToken, SearchResult, get_heuristic
+
+CLUSTER_SIZE = 16
+# border openings at least this long get an entrance at both ends instead of a single one in the middle
+ENTRANCE_SPLIT = 6
+# how many cluster blocks are relaxed together, bounds the memory of one batch
+BATCH_SIZE = 2048
+
+# (dx, dy, cost), straight moves first so the 4-connected set is a prefix
+STEPS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+         (1, 1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (-1, -1, SQRT2)]
+
+
+def _shift(d: int, n: int):
+    # (source, target) slices along one axis for a step of d
+    if d > 0:
+        return slice(0, n - d), slice(d, n)
+    if d < 0:
+        return slice(-d, n), slice(0, n + d)
+    return slice(0, n), slice(0, n)
+
+
+def cluster_distances(walk: np.ndarray, seeds: np.ndarray, diagonal: bool):
+    # Shortest distances inside a stack of cluster blocks (K, size, size), one source cell per block.
+    # Bellman-Ford sweeps over the whole stack at once, the blocks are small so this converges in a few
+    # dozen sweeps and beats running a Python Dijkstra from every entrance. float32 is plenty for distances
+    # this short and halves the memory traffic
+    k, size, _ = walk.shape
+    result = np.full(walk.shape, np.inf, dtype=np.float32)
+    result.reshape(k, -1)[np.arange(k), seeds] = 0.0
+    steps = []
+    for dx, dy, cost in STEPS[:8 if diagonal else 4]:
+        sy, ty = _shift(dy, size)
+        sx, tx = _shift(dx, size)
+        allowed = walk[:, sy, sx] & walk[:, ty, tx]
+        if dx and dy:
+            # no corner cutting, both side cells have to be walkable too
+            allowed &= walk[:, sy, tx] & walk[:, ty, sx]
+        cost = np.where(allowed, cost, np.inf).astype(np.float32)
+        steps.append(((slice(None), sy, sx), (slice(None), ty, tx), cost))
+
+    active = np.arange(k)
+    dist = result.copy()
+    while len(active):
+        before = dist.copy()
+        for source, target, cost in steps:
+            view = dist[target]
+            np.minimum(view, dist[source] + cost, out=view)
+        changed = (before != dist).reshape(len(active), -1).any(axis=1)
+        if changed.all():
+            continue
+        result[active] = dist
+        # blocks that settled are dropped once they make up half the batch, copying them out isn't free
+        if not changed.any() or changed.sum() * 2 < len(active):
+            active = active[changed]
+            dist = dist[changed]
+            steps = [(source, target, cost[changed]) for source, target, cost in steps]
+    return result
+
+
+class ClusterGraph:
+    # HPA* abstraction: the grid is cut into square clusters, every opening along a cluster border gets an
+    # entrance pair and the entrances of a cluster are linked by their exact distance inside it. Edits only
+    # rebuild the clusters (and borders) they touch
+    def __init__(self, passable: np.ndarray, diagonal: bool = True, cluster_size: int = CLUSTER_SIZE,
+                 cancel: CancelToken = None):
+        self.rows, self.cols = passable.shape
+        self.diagonal = diagonal
+        self.size = cluster_size
+        self.crows = -(-self.rows // cluster_size)
+        self.ccols = -(-self.cols // cluster_size)
+        # padded with walls up to whole clusters, blocks is a (crows, ccols, size, size) view into it
+        self.plane = np.zeros((self.crows * cluster_size, self.ccols * cluster_size), dtype=bool)
+        self.plane[:self.rows, :self.cols] = passable != 0
+        self.blocks = self.plane.reshape(self.crows, cluster_size, self.ccols, cluster_size).transpose(0, 2, 1, 3)
+
+        # abstract nodes are flat cell ids (y * cols + x)
+        self.borders = {}
+        self.crossings = {}
+        self.entrances = {}
+        self.edges = {}
+
+        clusters = [(cx, cy) for cy in range(self.crows) for cx in range(self.ccols)]
+        borders = [((cx, cy), (cx + 1, cy)) for cx, cy in clusters if cx + 1 < self.ccols]
+        borders += [((cx, cy), (cx, cy + 1)) for cx, cy in clusters if cy + 1 < self.crows]
+        self.rebuild(borders, clusters, cancel)
+
+    def matches(self, passable: np.ndarray, diagonal: bool):
+        return passable.shape == (self.rows, self.cols) and diagonal == self.diagonal
+
+    def cluster_of(self, node: int):
+        y, x = divmod(node, self.cols)
+        return x // self.size, y // self.size
+
+    def border_entrances(self, a, b):
+        # entrance pairs (node in a, node in b) along the border between two neighbouring clusters
+        s = self.size
+        if b[0] != a[0]:
+            x = b[0] * s - 1
+            lo, hi = a[1] * s, min((a[1] + 1) * s, self.rows)
+            is_open = self.plane[lo:hi, x] & self.plane[lo:hi, x + 1]
+            pair = lambda i: ((lo + i) * self.cols + x, (lo + i) * self.cols + x + 1)
+        else:
+            y = b[1] * s - 1
+            lo, hi = a[0] * s, min((a[0] + 1) * s, self.cols)
+            is_open = self.plane[y, lo:hi] & self.plane[y + 1, lo:hi]
+            pair = lambda i: (y * self.cols + lo + i, (y + 1) * self.cols + lo + i)
+
+        edges = np.diff(np.concatenate(([0], is_open.view(np.int8), [0])))
+        pairs = []
+        for first, end in zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()):
+            if end - first >= ENTRANCE_SPLIT:
+                pairs += [pair(first), pair(end - 1)]
+            else:
+                pairs.append(pair(first + (end - first - 1) // 2))
+        return pairs
+
+    def rebuild(self, borders, clusters, cancel: CancelToken = None):
+        # only a fresh build may be cancelled, it is thrown away then; a patch from sync always runs to the end
+        clusters = set(clusters)
+        for a, b in borders:
+            old = self.borders.get((a, b), [])
+            new = self.border_entrances(a, b)
+            if new == old:
+                continue
+            for p, q in old:
+                self.crossings[p].discard(q)
+                self.crossings[q].discard(p)
+            for p, q in new:
+                self.crossings.setdefault(p, set()).add(q)
+                self.crossings.setdefault(q, set()).add(p)
+            self.borders[(a, b)] = new
+            # the entrances on either side moved, so both clusters need their distances again
+            clusters.update((a, b))
+
+        rows = []
+        for c in clusters:
+            cx, cy = c
+            nodes = set()
+            for key, side in ((((cx - 1, cy), c), 1), ((c, (cx + 1, cy)), 0), (((cx, cy - 1), c), 1),
+                              ((c, (cx, cy + 1)), 0)):
+                nodes.update(pair[side] for pair in self.borders.get(key, ()))
+            self.entrances[c] = sorted(nodes)
+            self.edges[c] = {node: {} for node in self.entrances[c]}
+            rows += [(c, node) for node in self.entrances[c]]
+
+        local = {c: [self.local(node) for node in self.entrances[c]] for c in clusters}
+        for i in range(0, len(rows), BATCH_SIZE):
+            if cancel is not None:
+                cancel.check()
+            batch = rows[i:i + BATCH_SIZE]
+            dist = self.distances([c for c, _ in batch], [node for _, node in batch])
+            for (c, node), field in zip(batch, dist.reshape(len(batch), -1)):
+                links = self.edges[c][node]
+                for other, d in zip(self.entrances[c], field[local[c]].tolist()):
+                    if other != node and d < math.inf:
+                        links[other] = d
+        self.crossings = {node: partners for node, partners in self.crossings.items() if partners}
+        return len(clusters)
+
+    def sync(self, passable: np.ndarray):
+        # diffs against the last seen plane and rebuilds only the clusters and borders holding changed cells
+        changed = np.argwhere((passable != 0) != self.plane[:self.rows, :self.cols])
+        if not len(changed):
+            return 0
+        s = self.size
+        clusters, borders = set(), set()
+        for y, x in changed.tolist():
+            self.plane[y, x] = passable[y, x] != 0
+            c = (x // s, y // s)
+            clusters.add(c)
+            if x % s == 0 and c[0] > 0:
+                borders.add(((c[0] - 1, c[1]), c))
+            if x % s == s - 1 and c[0] + 1 < self.ccols:
+                borders.add((c, (c[0] + 1, c[1])))
+            if y % s == 0 and c[1] > 0:
+                borders.add(((c[0], c[1] - 1), c))
+            if y % s == s - 1 and c[1] + 1 < self.crows:
+                borders.add((c, (c[0], c[1] + 1)))
+        return self.rebuild(borders, clusters)
+
+    def local(self, node: int):
+        y, x = divmod(node, self.cols)
+        return (y % self.size) * self.size + x % self.size
+
+    def distances(self, clusters, sources):
+        walk = np.stack([self.blocks[cy, cx] for cx, cy in clusters])
+        seeds = np.array([self.local(node) for node in sources], dtype=np.intp)
+        return cluster_distances(walk, seeds, self.diagonal)
+
+    def refine(self, a: int, field: np.ndarray):
+        # the cells from a to the source of field inside a's cluster, always stepping down the distance field
+        c = self.cluster_of(a)
+        s = self.size
+        ox, oy = c[0] * s, c[1] * s
+        walk = self.blocks[c[1], c[0]].tolist()
+        field = field.tolist()
+        y, x = divmod(a, self.cols)
+        x, y = x - ox, y - oy
+        path = []
+        while field[y][x] > 0:
+            best, best_xy = math.inf, None
+            for dx, dy, cost in STEPS[:8 if self.diagonal else 4]:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < s and 0 <= ny < s and walk[ny][nx]):
+                    continue
+                if dx and dy and not (walk[y][nx] and walk[ny][x]):
+                    continue
+                if cost + field[ny][nx] < best:
+                    best, best_xy = cost + field[ny][nx], (nx, ny)
+            x, y = best_xy
+            path.append((x + ox, y + oy))
+        return path
+
+    def search(self, start, goal, heuristic: str = None, cancel: CancelToken = None):
+        t0 = time.perf_counter()
+        cols = self.cols
+        s = start[1] * cols + start[0]
+        t = goal[1] * cols + goal[0]
+        if not self.plane[start[1], start[0]] or not self.plane[goal[1], goal[0]]:
+            return SearchResult(elapsed=time.perf_counter() - t0)
+        if s == t:
+            return SearchResult([tuple(start)], 0.0, 1, 1, time.perf_counter() - t0)
+
+        # start and goal are linked into the abstract graph just for this query, as nodes -1 and -2
+        cs, cg = self.cluster_of(s), self.cluster_of(t)
+        fields = self.distances([cs, cg], [s, t]).reshape(2, -1)
+        start_links = {n: float(fields[0][self.local(n)]) for n in self.entrances[cs]}
+        if cs == cg:
+            start_links[-2] = float(fields[0][self.local(t)])
+        goal_links = {n: float(fields[1][self.local(n)]) for n in self.entrances[cg]}
+        position = {-1: s, -2: t}
+
+        h = get_heuristic(heuristic, self.diagonal)
+        gy, gx = divmod(t, cols)
+        g_score = {-1: 0.0}
+        parent = {-1: None}
+        closed = set()
+        open_heap = [(h(abs(start[0] - gx), abs(start[1] - gy)), -0.0, -1)]
+        expanded = 0
+        peak_open = 1
+
+        while open_heap:
+            node = heapq.heappop(open_heap)[2]
+            if node in closed:
+                continue
+            closed.add(node)
+            expanded += 1
+            g = g_score[node]
+            if node == -2:
+                # the abstract edge costs are float32, the real length is summed from the refined cells
+                path = self.refine_path(parent, position)
+                return SearchResult(path, path_cost(path), expanded, peak_open, time.perf_counter() - t0)
+            if cancel is not None and not expanded & CANCEL_MASK:
+                cancel.check()
+
+            if node == -1:
+                links = start_links.items()
+            else:
+                links = list(self.edges[self.cluster_of(node)][node].items())
+                links += [(partner, 1.0) for partner in self.crossings.get(node, ())]
+                if node in goal_links:
+                    links.append((-2, goal_links[node]))
+            for nb, step in links:
+                new_g = g + step
+                if nb in closed or new_g >= g_score.get(nb, math.inf):
+                    continue
+                g_score[nb] = new_g
+                parent[nb] = node
+                ny, nx = divmod(position.get(nb, nb), cols)
+                heapq.heappush(open_heap, (new_g + h(abs(nx - gx), abs(ny - gy)), -new_g, nb))
+            if len(open_heap) > peak_open:
+                peak_open = len(open_heap)
+
+        return SearchResult(None, math.inf, expanded, peak_open, time.perf_counter() - t0)
+
+    def refine_path(self, parent, position):
+        abstract = []
+        node = -2
+        while node is not None:
+            abstract.append(position.get(node, node))
+            node = parent[node]
+        abstract.reverse()
+
+        # only the segments on the abstract path get turned back into cells, their distance fields in one batch
+        segments = [(a, b) for a, b in zip(abstract, abstract[1:]) if a != b]
+        inside = [(a, b) for a, b in segments if self.cluster_of(a) == self.cluster_of(b)]
+        fields = {}
+        if inside:
+            fields = dict(zip(inside, self.distances([self.cluster_of(b) for _, b in inside], [b for _, b in inside])))
+        path = [divmod(abstract[0], self.cols)[::-1]]
+        for a, b in segments:
+            if (a, b) in fields:
+                path += self.refine(a, fields[(a, b)])
+            else:
+                path.append(divmod(b, self.cols)[::-1])
+        return path
+
+
+def path_cost(path):
+    steps = np.abs(np.diff(np.array(path), axis=0))
+    diagonal = int(np.count_nonzero(steps.min(axis=1))) if len(steps) else 0
+    return (len(steps) - diagonal) + diagonal * SQRT2
+
+
+def hpa_star(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+             cancel: CancelToken = None, graph: ClusterGraph = None):
+    # near-optimal: paths go through the entrances, so they can be slightly longer than A*'s
+    t0 = time.perf_counter()
+    if graph is None or not graph.matches(passable, diagonal):
+        graph = ClusterGraph(passable, diagonal, cancel=cancel)
+    result = graph.search(start, goal, heuristic, cancel)
+    result.elapsed = time.perf_counter() - t0
+    return result
@@ -0,0 +1,157 @@
+import heapq
+import math
+import time
+
+import numpy as np
+
+from SearchEngine import CANCEL_MASK, CancelToken, FlatGrid, SearchResult, get_heuristic
+
+
+class LPAStar:
+    # Lifelong Planning A*: keeps g/rhs values between searches, so after a few cells are toggled only the
+    # part of the search tree those cells touch gets repaired instead of searching again from scratch
+    def __init__(self, passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None):
+        self.plane = passable.copy()
+        self.grid = FlatGrid(passable)
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self.diagonal = diagonal
+        self.heuristic = heuristic
+        self.moves = self.grid.neighbours(diagonal)
+
+        self.s = self.grid.node_id(*start)
+        self.t = self.grid.node_id(*goal)
+        h = get_heuristic(heuristic, diagonal)
+        gy, gx = divmod(self.t, self.grid.width)
+        width = self.grid.width
+        self.h = lambda node: h(abs(node % width - gx), abs(node // width - gy))
+
+        self.g = [math.inf] * self.grid.size
+        self.rhs = [math.inf] * self.grid.size
+        self.open_heap = []
+        self.queued = {}
+
+        self.rhs[self.s] = 0.0
+        self.push(self.s)
+
+    def matches(self, passable: np.ndarray, start, goal, diagonal: bool, heuristic: str):
+        return (passable.shape == self.plane.shape and tuple(start) == self.start and tuple(goal) == self.goal
+                and diagonal == self.diagonal and heuristic == self.heuristic)
+
+    def key(self, node):
+        k = min(self.g[node], self.rhs[node])
+        # rounded so float noise in the octile sums can't make a node look one ulp worse than the goal
+        return round(k + self.h(node), 9), k
+
+    def push(self, node):
+        key = self.key(node)
+        self.queued[node] = key
+        heapq.heappush(self.open_heap, (key, node))
+
+    def cost(self, a, b, step, side_a, side_b):
+        cells = self.grid.cells
+        if not cells[a] or not cells[b]:
+            return math.inf
+        if side_a and not (cells[a + side_a] and cells[a + side_b]):
+            return math.inf
+        return step
+
+    def update_vertex(self, node):
+        cells = self.grid.cells
+        if node != self.s:
+            best = math.inf
+            if cells[node]:
+                g = self.g
+                for offset, step, side_a, side_b in self.moves:
+                    # edges are symmetric, so walking the successor list backwards gives the predecessors
+                    pred = node - offset
+                    if g[pred] + step < best and self.cost(pred, node, step, side_a, side_b) < math.inf:
+                        best = g[pred] + step
+            self.rhs[node] = best
+        self.queued.pop(node, None)
+        if self.g[node] != self.rhs[node]:
+            self.push(node)
+
+    def sync(self, passable: np.ndarray):
+        # every toggled cell changes the cost of the edges around it, so it and its neighbours are re-evaluated
+        changed = np.argwhere(passable != self.plane)
+        if not len(changed):
+            return 0
+        self.plane[...] = passable
+        cells = self.grid.cells
+        affected = set()
+        for y, x in changed.tolist():
+            node = self.grid.node_id(x, y)
+            cells[node] = 1 if passable[y, x] else 0
+            affected.add(node)
+            for offset, _, _, _ in self.moves:
+                affected.add(node + offset)
+        for node in affected:
+            if 0 < node < self.grid.size:
+                self.update_vertex(node)
+        return len(changed)
+
+    def compute(self, cancel: CancelToken = None):
+        # safe to cancel: an interrupted repair leaves the queue consistent and the next compute picks it up
+        t0 = time.perf_counter()
+        g, rhs = self.g, self.rhs
+        t = self.t
+        expanded = 0
+        peak_open = len(self.queued)
+
+        while self.open_heap:
+            key, node = self.open_heap[0]
+            if self.queued.get(node) != key:
+                heapq.heappop(self.open_heap)
+                continue
+            if not (key < self.key(t) or rhs[t] != g[t]):
+                break
+            heapq.heappop(self.open_heap)
+            del self.queued[node]
+            expanded += 1
+            if cancel is not None and not expanded & CANCEL_MASK:
+                cancel.check()
+
+            if g[node] > rhs[node]:
+                g[node] = rhs[node]
+            else:
+                g[node] = math.inf
+                self.update_vertex(node)
+            for offset, _, _, _ in self.moves:
+                nb = node + offset
+                if 0 < nb < self.grid.size:
+                    self.update_vertex(nb)
+            if len(self.queued) > peak_open:
+                peak_open = len(self.queued)
+
+        if g[t] == math.inf:
+            return SearchResult(None, math.inf, expanded, peak_open, time.perf_counter() - t0)
+        return SearchResult(self.extract_path(), g[t], expanded, peak_open, time.perf_counter() - t0)
+
+    def extract_path(self):
+        g = self.g
+        node = self.t
+        path = [self.grid.node_xy(node)]
+        while node != self.s:
+            best, best_pred = math.inf, -1
+            for offset, step, side_a, side_b in self.moves:
+                pred = node - offset
+                candidate = g[pred] + self.cost(pred, node, step, side_a, side_b)
+                if candidate < best:
+                    best, best_pred = candidate, pred
+            node = best_pred
+            path.append(self.grid.node_xy(node))
+        path.reverse()
+        return path
+
+
+def lpa_star(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+             cancel: CancelToken = None):
+    t0 = time.perf_counter()
+    grid = FlatGrid(passable)
+    s, t = grid.node_id(*start), grid.node_id(*goal)
+    if not grid.cells[s] or not grid.cells[t]:
+        return SearchResult(elapsed=time.perf_counter() - t0)
+    result = LPAStar(passable, start, goal, diagonal, heuristic).compute(cancel)
+    result.elapsed = time.perf_counter() - t0
+    return result
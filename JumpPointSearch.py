@@ -0,0 +1,282 @@
+import heapq
+import math
+import time
+
+import numpy as np
+
+from SearchEngine import CANCEL_MASK, CancelToken, FlatGrid, SearchResult, astar, get_heuristic, octile
+
+# straight jumps check this many cells one by one before scanning the rest of the line, most jumps in cluttered
+# maps end sooner than a line scan pays off
+SHORT_JUMP = 8
+
+
+class JumpTable:
+    # JPS+ style precomputation: for every cell and each straight direction, how many steps until the next
+    # jump point and how many steps until the next wall. Built with NumPy from the padded passability plane,
+    # so it's cheap to throw away and rebuild whenever the grid changes
+    def __init__(self, passable: np.ndarray, cancel: CancelToken = None):
+        self.grid = FlatGrid(passable)
+        padded = np.frombuffer(bytes(self.grid.cells), dtype=np.uint8).reshape(self.grid.rows + 2, self.grid.width)
+        walkable = padded != 0
+        w = self.grid.width
+
+        # keyed by the flat id offset of the direction, values are flat lists indexed by node id
+        self.wall = {}
+        self.jump = {}
+        for offset, view, restore in ((1, walkable, lambda a: a), (-1, walkable[:, ::-1], lambda a: a[:, ::-1]),
+                                      (w, walkable.T, lambda a: a.T),
+                                      (-w, walkable.T[:, ::-1], lambda a: a[:, ::-1].T)):
+            # cancelled between the four passes, a half built table is never handed out
+            if cancel is not None:
+                cancel.check()
+            wall, jump = (restore(a) for a in _east_distances(view))
+            self.wall[offset] = wall.ravel().tolist()
+            self.jump[offset] = jump.ravel().tolist()
+
+
+def _east_distances(walkable: np.ndarray):
+    rows, cols = walkable.shape
+    idx = np.broadcast_to(np.arange(cols), (rows, cols))
+    big = cols * 2
+
+    # a cell is a jump point when entered moving east if it has a forced neighbour above or below
+    forced = np.zeros_like(walkable)
+    forced[1:-1, 1:] = walkable[1:-1, 1:] & (
+        (walkable[:-2, 1:] & ~walkable[:-2, :-1]) | (walkable[2:, 1:] & ~walkable[2:, :-1]))
+
+    def next_index(mask):
+        # for every column, the first column strictly to the right where mask is set
+        marked = np.where(mask, idx, big)
+        nearest = np.minimum.accumulate(marked[:, ::-1], axis=1)[:, ::-1]
+        result = np.full((rows, cols), big)
+        result[:, :-1] = nearest[:, 1:]
+        return result
+
+    next_wall = next_index(~walkable)
+    next_jump = next_index(forced)
+    wall = next_wall - idx
+    jump = np.where(next_jump < next_wall, next_jump - idx, 0)
+    return wall, jump
+
+
+def _line_stops(line, side_a, side_b):
+    # The cells of one row or column a straight jump along it stops at, walls and cells with a forced neighbour,
+    # for moving forwards (up the index) and backwards. A neighbour is forced when the cell beside it that the
+    # jump just passed is a wall
+    forwards, backwards = ~line, ~line
+    forwards[1:] |= line[1:] & ((side_a[1:] & ~side_a[:-1]) | (side_b[1:] & ~side_b[:-1]))
+    backwards[:-1] |= line[:-1] & ((side_a[:-1] & ~side_a[1:]) | (side_b[:-1] & ~side_b[1:]))
+    return forwards, backwards
+
+
+def _scan_straight(grid: FlatGrid, t):
+    # Straight jumps as whole-line scans: past the first SHORT_JUMP cells, argmax finds the first stop in a row or
+    # column mask, which is built the first time the search scans that line
+    cells = grid.cells
+    width = grid.width
+    walkable = np.frombuffer(cells, dtype=np.uint8).reshape(grid.rows + 2, width) != 0
+    columns = walkable.T.copy()
+    row_stops, column_stops = {}, {}
+    t_row, t_col = divmod(t, width)
+
+    def straight(node, d):
+        side_a, side_b = (width, -width) if d == 1 or d == -1 else (1, -1)
+        for _ in range(SHORT_JUMP):
+            node += d
+            if not cells[node]:
+                return -1
+            if node == t:
+                return node
+            if (cells[node + side_a] and not cells[node + side_a - d]) or \
+                    (cells[node + side_b] and not cells[node + side_b - d]):
+                return node
+        row, col = divmod(node, width)
+        if d == 1 or d == -1:
+            stops = row_stops.get(row)
+            if stops is None:
+                stops = row_stops[row] = _line_stops(walkable[row], walkable[row - 1], walkable[row + 1])
+            at, goal, walls = col, t_col if row == t_row else -1, walkable[row]
+        else:
+            stops = column_stops.get(col)
+            if stops is None:
+                stops = column_stops[col] = _line_stops(columns[col], columns[col - 1], columns[col + 1])
+            at, goal, walls = row, t_row if col == t_col else -1, columns[col]
+        # the padding walls every line in, so there always is a stop
+        if d > 0:
+            stop = at + 1 + int(stops[0][at + 1:].argmax())
+            if at < goal <= stop:
+                return t
+        else:
+            stop = at - 1 - int(stops[1][at - 1::-1].argmax())
+            if stop <= goal < at:
+                return t
+        if not walls[stop]:
+            return -1
+        return node + abs(stop - at) * d
+    return straight
+
+
+def _table_straight(table, t):
+    width = table.grid.width
+    t_row, t_col = divmod(t, width)
+
+    def straight(node, d):
+        row, col = divmod(node, width)
+        # steps along d until the goal, if the goal sits on this ray
+        if d == 1 or d == -1:
+            steps = (t_col - col) * d if row == t_row else 0
+        else:
+            steps = (t_row - row) * (1 if d > 0 else -1) if col == t_col else 0
+        jump = table.jump[d][node]
+        if 0 < steps < table.wall[d][node] and (not jump or steps <= jump):
+            return t
+        return node + jump * d if jump else -1
+    return straight
+
+
+def _jump_diagonal(cells, t, straight, node, dx, dyw):
+    while True:
+        # diagonal moves may not cut corners
+        if not (cells[node + dx] and cells[node + dyw]):
+            return -1
+        node += dx + dyw
+        if not cells[node]:
+            return -1
+        if node == t or straight(node, dx) != -1 or straight(node, dyw) != -1:
+            return node
+
+
+def _search(grid: FlatGrid, start, goal, heuristic, make_straight, t0, cancel: CancelToken = None):
+    cells = grid.cells
+    width = grid.width
+    h = get_heuristic(heuristic, True)
+
+    s = grid.node_id(*start)
+    t = grid.node_id(*goal)
+    if not cells[s] or not cells[t]:
+        return SearchResult(elapsed=time.perf_counter() - t0)
+
+    straight = make_straight(t)
+    gy, gx = divmod(t, width)
+    g_score = {s: 0.0}
+    parent = {s: -1}
+    closed = set()
+    sy, sx = divmod(s, width)
+    open_heap = [(h(abs(sx - gx), abs(sy - gy)), -0.0, s)]
+    expanded = 0
+    peak_open = 1
+
+    while open_heap:
+        node = heapq.heappop(open_heap)[2]
+        if node in closed:
+            continue
+        closed.add(node)
+        expanded += 1
+        g = g_score[node]
+        if node == t:
+            return SearchResult(_expand_path(grid, parent, t), g, expanded, peak_open, time.perf_counter() - t0)
+        if cancel is not None and not expanded & CANCEL_MASK:
+            cancel.check()
+
+        ny, nx = divmod(node, width)
+        p = parent[node]
+        if p == -1:
+            directions = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+        else:
+            py, px = divmod(p, width)
+            directions = _pruned_directions(cells, width, node, (nx > px) - (nx < px), (ny > py) - (ny < py))
+
+        for dx, dy in directions:
+            if dx and dy:
+                jp = _jump_diagonal(cells, t, straight, node, dx, dy * width)
+            else:
+                jp = straight(node, dx + dy * width)
+            if jp == -1 or jp in closed:
+                continue
+            jy, jx = divmod(jp, width)
+            new_g = g + octile(abs(jx - nx), abs(jy - ny))
+            if new_g < g_score.get(jp, math.inf):
+                g_score[jp] = new_g
+                parent[jp] = node
+                heapq.heappush(open_heap, (new_g + h(abs(jx - gx), abs(jy - gy)), -new_g, jp))
+        if len(open_heap) > peak_open:
+            peak_open = len(open_heap)
+
+    return SearchResult(None, math.inf, expanded, peak_open, time.perf_counter() - t0)
+
+
+def _pruned_directions(cells, width, node, dx, dy):
+    directions = []
+    if dx and dy:
+        vertical = cells[node + dy * width]
+        horizontal = cells[node + dx]
+        if vertical:
+            directions.append((0, dy))
+        if horizontal:
+            directions.append((dx, 0))
+        if vertical and horizontal:
+            directions.append((dx, dy))
+    elif dx:
+        up, down = cells[node - width], cells[node + width]
+        if cells[node + dx]:
+            directions.append((dx, 0))
+            if up:
+                directions.append((dx, -1))
+            if down:
+                directions.append((dx, 1))
+        if up:
+            directions.append((0, -1))
+        if down:
+            directions.append((0, 1))
+    else:
+        left, right = cells[node - 1], cells[node + 1]
+        if cells[node + dy * width]:
+            directions.append((0, dy))
+            if left:
+                directions.append((-1, dy))
+            if right:
+                directions.append((1, dy))
+        if left:
+            directions.append((-1, 0))
+        if right:
+            directions.append((1, 0))
+    return directions
+
+
+def _expand_path(grid: FlatGrid, parent, goal: int):
+    jump_points = []
+    node = goal
+    while node != -1:
+        jump_points.append(grid.node_xy(node))
+        node = parent[node]
+    jump_points.reverse()
+
+    path = [jump_points[0]]
+    for (x0, y0), (x1, y1) in zip(jump_points, jump_points[1:]):
+        dx, dy = (x1 > x0) - (x1 < x0), (y1 > y0) - (y1 < y0)
+        x, y = x0, y0
+        while (x, y) != (x1, y1):
+            x, y = x + dx, y + dy
+            path.append((x, y))
+    return path
+
+
+def jps(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+        cancel: CancelToken = None):
+    # the pruning rules here are for 8-connected grids, with 4-connectivity plain A* is used instead
+    if not diagonal:
+        return astar(passable, start, goal, diagonal=False, heuristic=heuristic, cancel=cancel)
+    t0 = time.perf_counter()
+    grid = FlatGrid(passable)
+    return _search(grid, start, goal, heuristic, lambda t: _scan_straight(grid, t), t0, cancel)
+
+
+def jps_plus(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+             cancel: CancelToken = None, table: JumpTable = None):
+    if not diagonal:
+        return astar(passable, start, goal, diagonal=False, heuristic=heuristic, cancel=cancel)
+    t0 = time.perf_counter()
+    if table is None:
+        table = JumpTable(passable, cancel)
+    return _search(table.grid, start, goal, heuristic, lambda t: _table_straight(table, t), t0, cancel)
@@ -0,0 +1,157 @@
+import numpy as np
+
+from RegionIndex import label_components
+
+# Seeded map generators, each takes (rows, cols, seed=None, **options) and returns a (rows, cols) uint8 plane with
+# 1 = passable like GridData.passable. Everything is whole-array work, a 4000 x 4000 map takes about a second
+
+
+def noise_map(rows: int, cols: int, seed: int = None, density: float = 0.3):
+    # every cell is a wall with probability density
+    rng = np.random.default_rng(seed)
+    return (rng.random((rows, cols), dtype=np.float32) >= density).astype(np.uint8)
+
+
+def maze_map(rows: int, cols: int, seed: int = None):
+    # Perfect maze (exactly one route between any two cells). Maze cells sit on odd coordinates and the walls
+    # between them are knocked out along the minimum spanning tree of random edge weights, which is what randomized
+    # Kruskal builds. The tree comes from Borůvka rounds: every component takes its cheapest edge out and follows
+    # it to the component at the other end, so a round is a few array passes over the edges still between them
+    plane = np.zeros((rows, cols), dtype=np.uint8)
+    maze_rows, maze_cols = (rows - 1) // 2, (cols - 1) // 2
+    count = maze_rows * maze_cols
+    if count < 2:
+        plane[1:2 * maze_rows:2, 1:2 * maze_cols:2] = 1
+        return plane
+    ids = np.arange(count, dtype=np.int32).reshape(maze_rows, maze_cols)
+    # edges to the right neighbour first, then the ones to the neighbour below
+    u = np.concatenate((ids[:, :-1].ravel(), ids[:-1, :].ravel()))
+    v = np.concatenate((ids[:, 1:].ravel(), ids[1:, :].ravel()))
+    across = maze_rows * (maze_cols - 1)
+    # random weights with the edge number in the low bits: distinct, so the tree is unique, and the number is
+    # read straight off a component's cheapest weight
+    bits = len(u).bit_length()
+    mask = (1 << bits) - 1
+    key = np.random.default_rng(seed).integers(0, 1 << (62 - bits), size=len(u)) << bits
+    key |= np.arange(len(u))
+    tree = np.zeros(len(u), dtype=bool)
+
+    # the first round reads every cell's four edges off the grid instead of scattering over the edge list
+    none = np.iinfo(np.int64).max
+    cheapest = np.full((maze_rows, maze_cols), none)
+    right, down = key[:across].reshape(maze_rows, maze_cols - 1), key[across:].reshape(maze_rows - 1, maze_cols)
+    for side, edges in ((np.s_[:, :-1], right), (np.s_[:, 1:], right), (np.s_[:-1], down), (np.s_[1:], down)):
+        np.minimum(cheapest[side], edges, out=cheapest[side])
+    edge = cheapest.ravel() & mask
+    tree[edge] = True
+    nodes = np.arange(count, dtype=np.int32)
+    follow = u[edge] + v[edge] - nodes
+    cu, cv = u, v
+    while True:
+        # two components that took the same edge point at each other, the smaller one becomes the root; pointer
+        # jumping then takes every component to its root
+        follow = np.where((follow[follow] == nodes) & (nodes < follow), nodes, follow)
+        while True:
+            jumped = follow[follow]
+            if np.array_equal(jumped, follow):
+                break
+            follow = jumped
+        roots = follow == nodes
+        merged = (np.cumsum(roots, dtype=np.int32) - 1)[follow]
+        cu, cv = merged[cu], merged[cv]
+        crossing = np.flatnonzero(cu != cv)
+        if not len(crossing):
+            break
+        cu, cv, key = cu[crossing], cv[crossing], key[crossing]
+        count = int(np.count_nonzero(roots))
+        cheapest = np.full(count, none)
+        np.minimum.at(cheapest, cu, key)
+        np.minimum.at(cheapest, cv, key)
+        from_u = np.flatnonzero(cheapest[cu] == key)
+        from_v = np.flatnonzero(cheapest[cv] == key)
+        tree[key[from_u] & mask] = True
+        tree[key[from_v] & mask] = True
+        nodes = np.arange(count, dtype=np.int32)
+        follow = nodes.copy()
+        follow[cu[from_u]] = cv[from_u]
+        follow[cv[from_v]] = cu[from_v]
+
+    plane[1:2 * maze_rows:2, 1:2 * maze_cols:2] = 1
+    # the wall between two neighbouring maze cells sits halfway between them
+    plane[1:2 * maze_rows:2, 2:2 * maze_cols - 1:2] = tree[:across].reshape(maze_rows, maze_cols - 1)
+    plane[2:2 * maze_rows - 1:2, 1:2 * maze_cols:2] = tree[across:].reshape(maze_rows - 1, maze_cols)
+    return plane
+
+
+def paint_rects(rows: int, cols: int, y0, y1, x0, x1):
+    # union of many [y0, y1) x [x0, x1) rectangles as a bool mask, from a 2D difference array and two prefix sums
+    diff = np.zeros((rows + 1, cols + 1), dtype=np.int32)
+    np.add.at(diff, (y0, x0), 1)
+    np.add.at(diff, (y0, x1), -1)
+    np.add.at(diff, (y1, x0), -1)
+    np.add.at(diff, (y1, x1), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:rows, :cols] > 0
+
+
+def dungeon_map(rows: int, cols: int, seed: int = None, rooms: int = None, room_size=(4, 12)):
+    # Rectangular rooms joined by L-shaped corridors. The rooms are visited in a snake order over bands of rows
+    # and every room is joined to the next, so the whole dungeon is one region; rooms may overlap into halls
+    plane = np.zeros((rows, cols), dtype=np.uint8)
+    if rows < 5 or cols < 5:
+        return plane
+    rng = np.random.default_rng(seed)
+    low, high = room_size
+    high = max(min(high, rows - 2, cols - 2), 1)
+    low = min(low, high)
+    rooms = rooms or max(rows * cols // 250, 2)
+    heights = rng.integers(low, high + 1, size=rooms)
+    widths = rng.integers(low, high + 1, size=rooms)
+    y0 = 1 + (rng.random(rooms) * (rows - 1 - heights)).astype(np.intp)
+    x0 = 1 + (rng.random(rooms) * (cols - 1 - widths)).astype(np.intp)
+    y1, x1 = np.minimum(y0 + heights, rows - 1), np.minimum(x0 + widths, cols - 1)
+
+    cy, cx = (y0 + y1) // 2, (x0 + x1) // 2
+    band = cy // (2 * high)
+    order = np.lexsort((np.where(band % 2, -cx, cx), band))
+    cy, cx = cy[order], cx[order]
+    ya, xa, yb, xb = cy[:-1], cx[:-1], cy[1:], cx[1:]
+    # half the corridors go across first and then down, the other half the other way round
+    across_first = rng.random(len(ya)) < 0.5
+    corner_y, corner_x = np.where(across_first, ya, yb), np.where(across_first, xb, xa)
+    # each leg is a one cell wide rectangle between its ends, inclusive, so the legs get one more row and column
+    leg = np.repeat([0, 1, 1], (rooms, len(ya), len(ya)))
+    ry0 = np.concatenate((y0, np.minimum(ya, corner_y), np.minimum(corner_y, yb)))
+    ry1 = np.concatenate((y1, np.maximum(ya, corner_y), np.maximum(corner_y, yb))) + leg
+    rx0 = np.concatenate((x0, np.minimum(xa, corner_x), np.minimum(corner_x, xb)))
+    rx1 = np.concatenate((x1, np.maximum(xa, corner_x), np.maximum(corner_x, xb))) + leg
+    plane[paint_rects(rows, cols, ry0, ry1, rx0, rx1)] = 1
+    return plane
+
+
+def cave_map(rows: int, cols: int, seed: int = None, fill: float = 0.45, steps: int = 4):
+    # Cellular automaton caves: random walls at fill, then a few smoothing passes where a cell turns to wall with
+    # 5 or more wall neighbours and stays one with 4. The border counts as wall, and only the biggest cave is
+    # kept open so every open cell can reach every other
+    rng = np.random.default_rng(seed)
+    wall = rng.random((rows, cols), dtype=np.float32) < fill
+    padded = np.ones((rows + 2, cols + 2), dtype=np.uint8)
+    for _ in range(steps):
+        padded[1:-1, 1:-1] = wall
+        # 3 x 3 box sums as a row pass and a column pass, minus the cell itself
+        across = padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]
+        count = across[:-2] + across[1:-1] + across[2:] - padded[1:-1, 1:-1]
+        wall = (count >= 5) | (wall & (count >= 4))
+    plane = (~wall).astype(np.uint8)
+    if not plane.any():
+        return plane
+    labels = label_components(plane)
+    sizes = np.bincount(labels[labels >= 0])
+    return (labels == int(sizes.argmax())).reshape(rows, cols).astype(np.uint8)
+
+
+GENERATORS = {
+    "Noise": noise_map,
+    "Maze": maze_map,
+    "Dungeon": dungeon_map,
+    "Caves": cave_map,
+}
@@ -0,0 +1,147 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from GridData import GridData
+
+# Minotaur binary map: a 32 byte header followed by the passability plane packed 8 cells to a byte, row-major,
+# then the terrain cost plane at one byte per cell if the map has one.
+# Header: magic, format version, flags, cols, rows, start x/y, goal x/y (-1 when unset)
+MAGIC = b"MINO"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIIiiii")
+FLAG_COST_PLANE = 1
+
+# Moving AI terrain: only these are walkable for a ground unit, '@', 'O', 'T' and 'W' are blocked
+MOVING_AI_PASSABLE = b".GS"
+
+
+class MapFormatError(ValueError):
+    pass
+
+
+class Scenario:
+    def __init__(self, bucket: int, map_name: str, width: int, height: int, start, goal, optimal_length: float):
+        self.bucket = bucket
+        self.map_name = map_name
+        self.width = width
+        self.height = height
+        self.start = start
+        self.goal = goal
+        self.optimal_length = optimal_length
+
+    def __repr__(self):
+        return f"Scenario({self.map_name}, {self.start} -> {self.goal}, {self.optimal_length:.3f})"
+
+
+def save_map(path: str, data: GridData):
+    start = data.start if data.start is not None else (-1, -1)
+    goal = data.goal if data.goal is not None else (-1, -1)
+    # unweighted maps are written exactly as before, so older readers still open them
+    flags = FLAG_COST_PLANE if data.weighted else 0
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, data.cols, data.rows, *start, *goal))
+        f.write(np.packbits(data.passable.ravel() != 0, bitorder="little").tobytes())
+        if flags & FLAG_COST_PLANE:
+            f.write(np.ascontiguousarray(data.cost, dtype=np.uint8).tobytes())
+
+
+def load_map(path: str):
+    # the file is memory-mapped and unpacked in one vectorized call, no per-cell parsing
+    with open(path, "rb") as f:
+        # an empty file can't be mapped at all
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise MapFormatError(f"{path}: file too short for a map header")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            passable, cost, start, goal = read_map(path, mm)
+    data = GridData(*passable.shape)
+    data.assign(passable, start, goal, cost)
+    return data
+
+
+def read_map(path: str, mm):
+    # (passable, cost or None, start or None, goal or None) from a mapped file at least a header long
+    magic, version, flags, cols, rows, sx, sy, gx, gy = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise MapFormatError(f"{path}: not a Minotaur map")
+    if version != FORMAT_VERSION:
+        raise MapFormatError(f"{path}: unsupported map format version {version}")
+    if rows < 1 or cols < 1:
+        raise MapFormatError(f"{path}: empty {cols}x{rows} map")
+    endpoints = []
+    for name, x, y in (("start", sx, sy), ("goal", gx, gy)):
+        if (x, y) == (-1, -1):
+            endpoints.append(None)
+        elif 0 <= x < cols and 0 <= y < rows:
+            endpoints.append((x, y))
+        else:
+            raise MapFormatError(f"{path}: {name} ({x}, {y}) lies outside the {cols}x{rows} map")
+    packed_size = (rows * cols + 7) // 8
+    if len(mm) < HEADER.size + packed_size:
+        raise MapFormatError(f"{path}: truncated passability data")
+    packed = np.frombuffer(mm, dtype=np.uint8, count=packed_size, offset=HEADER.size)
+    passable = np.unpackbits(packed, count=rows * cols, bitorder="little").reshape(rows, cols)
+    # drop the view into the mapping before it gets closed
+    del packed
+    cost = None
+    if flags & FLAG_COST_PLANE:
+        if len(mm) < HEADER.size + packed_size + rows * cols:
+            raise MapFormatError(f"{path}: truncated terrain cost data")
+        cost = np.frombuffer(mm, dtype=np.uint8, count=rows * cols, offset=HEADER.size + packed_size)
+        cost = cost.reshape(rows, cols).copy()
+    return passable, cost, endpoints[0], endpoints[1]
+
+
+def load_moving_ai_map(path: str):
+    with open(path, "rb") as f:
+        lines = f.read().splitlines()
+
+    header = {}
+    row = 0
+    for row, line in enumerate(lines):
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == b"map":
+            break
+        if len(parts) == 2:
+            header[parts[0].decode()] = parts[1].decode()
+    else:
+        raise MapFormatError(f"{path}: missing 'map' line")
+
+    try:
+        rows, cols = int(header["height"]), int(header["width"])
+    except (KeyError, ValueError):
+        raise MapFormatError(f"{path}: missing or invalid width/height")
+    if rows < 1 or cols < 1:
+        raise MapFormatError(f"{path}: empty {cols}x{rows} map")
+    body = lines[row + 1:row + 1 + rows]
+    if len(body) != rows or any(len(line) < cols for line in body):
+        raise MapFormatError(f"{path}: map body doesn't match {cols}x{rows}")
+
+    tiles = np.frombuffer(b"".join(line[:cols] for line in body), dtype=np.uint8).reshape(rows, cols)
+    passable = np.isin(tiles, np.frombuffer(MOVING_AI_PASSABLE, dtype=np.uint8)).astype(np.uint8)
+    data = GridData(rows, cols)
+    data.assign(passable)
+    return data
+
+
+def load_moving_ai_scenarios(path: str):
+    scenarios = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 9 or parts[0] == "version":
+                continue
+            bucket, map_name = int(parts[0]), parts[1]
+            width, height, sx, sy, gx, gy = (int(p) for p in parts[2:8])
+            scenarios.append(Scenario(bucket, map_name, width, height, (sx, sy), (gx, gy), float(parts[8])))
+    return scenarios
+
+
+def load_any_map(path: str):
+    if path.lower().endswith(".map"):
+        return load_moving_ai_map(path)
+    return load_map(path)
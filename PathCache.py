@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from Algorithms import ANY_ANGLE
+from AnyAngle import trace_segments
+from SearchEngine import SQRT2, SearchResult
+
+
+def cache_key(start, goal, algorithm: str, diagonal: bool, heuristic: str):
+    return tuple(start), tuple(goal), algorithm, diagonal, heuristic
+
+
+class CacheEntry:
+    def __init__(self, result: SearchResult, start, goal, diagonal: bool, cols: int, any_angle: bool = False):
+        self.result = result
+        self.start = start
+        self.goal = goal
+        self.diagonal = diagonal
+        self.any_angle = any_angle
+        # flat ids of every cell the path relies on: every cell its segments touch, which for grid steps are the
+        # cells it visits and the side cells of its diagonal steps
+        self.footprint = np.empty(0, dtype=np.intp)
+        if result.found and len(result.path) > 1:
+            xy = np.array(result.path, dtype=np.intp)
+            _, xs, ys = trace_segments(xy[:-1, 0], xy[:-1, 1], xy[1:, 0], xy[1:, 1])
+            self.footprint = np.unique(ys * cols + xs)
+        elif result.found:
+            self.footprint = np.array([start[1] * cols + start[0]], dtype=np.intp)
+
+    def survives(self, blocked: np.ndarray, opened_xs: np.ndarray, opened_ys: np.ndarray):
+        # a cached path stays valid while nothing it relies on got blocked (or dearer) and no opened (or cheaper)
+        # cell could shorten it; terrain costs are at least 1, so the octile bound still holds
+        if not self.result.found:
+            return not len(opened_xs)
+        if len(blocked) and np.isin(blocked, self.footprint).any():
+            return False
+        if not len(opened_xs):
+            return True
+        if self.any_angle:
+            # Theta* paths are not shortest paths, an opened cell can change which parents a search settles on
+            # and so the path it returns even where no bound says a shorter one exists; drop them
+            return False
+        dx0, dy0 = np.abs(opened_xs - self.start[0]), np.abs(opened_ys - self.start[1])
+        dx1, dy1 = np.abs(opened_xs - self.goal[0]), np.abs(opened_ys - self.goal[1])
+        if self.diagonal:
+            bound = (np.maximum(dx0, dy0) + (SQRT2 - 1) * np.minimum(dx0, dy0) +
+                     np.maximum(dx1, dy1) + (SQRT2 - 1) * np.minimum(dx1, dy1))
+            # an opened cell also unlocks diagonal steps between its orthogonal neighbours, one step either side
+            bound -= 2
+        else:
+            bound = dx0 + dy0 + dx1 + dy1
+        return bool(bound.min() >= self.result.cost - 1e-9)
+
+
+class PathCache:
+    # LRU cache of search results keyed by (start, goal, algorithm, options). Entries are tagged with the grid
+    # version they were last checked against; when the grid moves on, only the entries an edit can affect are
+    # dropped, the rest carry over to the new version
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.plane = None
+        self.cost = None
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.plane = None
+        self.cost = None
+        self.version = None
+
+    def sync(self, passable: np.ndarray, version: int, cost: np.ndarray = None):
+        if version == self.version:
+            return
+        cost = cost if cost is not None else np.ones_like(passable)
+        if self.plane is None or self.plane.shape != passable.shape:
+            self.invalidated += len(self.entries)
+            self.entries.clear()
+        else:
+            # a cell that got dearer is handled like a blocked one, a cheaper one like an opened one
+            worse = (self.plane > passable) | (cost > self.cost)
+            better = (self.plane < passable) | (cost < self.cost)
+            if worse.any() or better.any():
+                blocked = np.flatnonzero(worse)
+                ys, xs = np.nonzero(better)
+                stale = [key for key, entry in self.entries.items() if not entry.survives(blocked, xs, ys)]
+                for key in stale:
+                    del self.entries[key]
+                self.invalidated += len(stale)
+        self.plane = passable.copy()
+        self.cost = cost.copy()
+        self.version = version
+
+    def get(self, key, passable: np.ndarray, version: int, cost: np.ndarray = None):
+        t0 = time.perf_counter()
+        self.sync(passable, version, cost)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        result = entry.result
+        return SearchResult(result.path, result.cost, 0, 0, time.perf_counter() - t0)
+
+    def put(self, key, result: SearchResult, version: int):
+        # results from an older snapshot can't be checked against the edits since, so they're not kept
+        if version != self.version:
+            return False
+        start, goal, algorithm, diagonal, _ = key
+        self.entries[key] = CacheEntry(result, start, goal, diagonal, self.plane.shape[1], algorithm in ANY_ANGLE)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return True
@@ -1,6 +1,81 @@
+import time
+
 import dearpygui.dearpygui as dpg
+import numpy as np
+
+from Grid import Grid
+from Algorithms import ALGORITHMS, STEPPERS, engine_for
+from AnyAngle import segment_lengths, smooth_path
+from BatchPlanner import BatchPlanner
+from FlowField import FlowField
+from HierarchicalPathfinder import ClusterGraph
+from IncrementalPlanner import LPAStar
+from JumpPointSearch import JumpTable
+from PathCache import PathCache, cache_key
+from Profiler import PROFILER
+from SearchEngine import SearchResult
+from SearchWorker import SearchWorker
+
+
+class EngineState:
+    # What the engines keep between searches on one map: the incremental planner, the JPS+ jump table, the HPA*
+    # cluster graph and the last flow field. A background search borrows the manager's instance and the manager
+    # only takes it back once the worker has stopped, so just one thread ever touches it
+    def __init__(self):
+        self.planner = None
+        self.jump_table = None
+        self.jump_table_version = None
+        self.cluster_graph = None
+        self.flow = None
+        self.flow_version = None
+
+    def search(self, algorithm: str, passable, start, goal, version, diagonal: bool, heuristic, cancel=None,
+               cost=None):
+        # cost is the terrain plane, None on maps where every cell costs 1
+        if algorithm == "LPA*":
+            return self.replan(passable, start, goal, diagonal, heuristic, cancel)
+        options = {"cost": cost} if cost is not None else {}
+        if algorithm == "JPS+":
+            options["table"] = self.get_jump_table(passable, version, cancel)
+        elif algorithm == "HPA*":
+            options["graph"] = self.get_cluster_graph(passable, diagonal, cancel)
+        elif algorithm == "Flow Field":
+            options["field"] = self.get_flow_field(passable, goal, version, diagonal, cancel, cost)
+        return ALGORITHMS[algorithm](passable, start, goal, diagonal=diagonal, heuristic=heuristic, cancel=cancel,
+                                     **options)
+
+    def replan(self, passable, start, goal, diagonal: bool, heuristic, cancel=None):
+        # the incremental planner survives between searches, painted cells are fed in as edge cost changes
+        if self.planner is None or not self.planner.matches(passable, start, goal, diagonal, heuristic):
+            self.planner = LPAStar(passable, start, goal, diagonal, heuristic)
+        else:
+            self.planner.sync(passable)
+        return self.planner.compute(cancel)
+
+    def get_jump_table(self, passable, version, cancel=None):
+        # any cell edit bumps the grid version, which throws away the precomputed jump distances
+        if self.jump_table is None or self.jump_table_version != version:
+            self.jump_table = JumpTable(passable, cancel)
+            self.jump_table_version = version
+        return self.jump_table
+
+    def get_cluster_graph(self, passable, diagonal: bool, cancel=None):
+        # unlike the jump table the HPA* graph is patched, edits only rebuild the clusters they touched
+        if self.cluster_graph is None or not self.cluster_graph.matches(passable, diagonal):
+            self.cluster_graph = ClusterGraph(passable, diagonal, cancel=cancel)
+        else:
+            self.cluster_graph.sync(passable)
+        return self.cluster_graph
 
-from Grid import Grid, get_cell_tag
+    def get_flow_field(self, passable, goal, version, diagonal: bool, cancel=None, cost=None):
+        # one field per goal and grid state; moving the start (which bumps the version) keeps it, since the
+        # planes it was built from are compared before throwing it away
+        if self.flow is None or not (self.flow_version == version and self.flow.goal == tuple(goal)
+                                     and self.flow.diagonal == diagonal):
+            if self.flow is None or not self.flow.matches(passable, goal, diagonal, cost):
+                self.flow = FlowField(passable, goal, diagonal, cancel, cost)
+            self.flow_version = version
+        return self.flow
 
 
 class PathfindingManager:
@@ -10,36 +85,66 @@ class PathfindingManager:
         self.setting_goal = False
         self.last_highlighted_cell = None
 
-        self.start_color = (79, 225, 46, 255)
-        self.goal_color = (255, 0, 0, 255)
-
         self.start = None
         self.goal = None
         self.path = None
+        self.stats = None
+        self.path_version = None
+
+        self.algorithm = "A*"
+        self.diagonal = True
+        self.heuristic = None
+
+        # lent to the background worker while it searches, the GUI thread works on a fresh one meanwhile
+        self.engines = EngineState()
+        self.lent_engines = None
+
+        # finished searches by (start, goal, algorithm, options), edits only drop the entries they affect
+        self.cache = PathCache()
+        self.cache_hit = False
+        self.background_key = None
+
+        # with background on, searches run on the worker thread and only the finished result comes back
+        self.background = False
+        self.worker = SearchWorker()
+
+        # batches of start/goal pairs go to a pool of worker processes, started on first use
+        self.batch = None
+        self.agent_run = None
+        self.agent_found = 0
+
+        # animated search state, step_speed is the most expansions per frame (None skips the animation)
+        self.stepper = None
+        self.step_paused = False
+        self.step_speed = 25
+        self.step_budget = 0.004
+        self.step_version = None
+        self.step_count = 0
+        self.step_elapsed = 0.0
+        self.visualized = []
 
     def set_start_cell(self, x: int, y: int):
         new_start = self.grid.get_cell_from_pos(x, y)
         if new_start is None: return False
         if self.start is not None:
+            self.clear_path()
             self.start.is_start = False
-            dpg.configure_item(item=get_cell_tag(self.start.x, self.start.y),
-                               fill=self.grid.default_cell_color)
+            self.grid.set_cell_fill(self.start.x, self.start.y, self.grid.default_cell_color)
         dpg.hide_item("pathfinding_registry")
         self.setting_start = False
         if new_start.is_start == False and new_start.is_goal == False:
             self.start = new_start
             new_start.is_start = True
             new_start.passable = True
-            dpg.configure_item(item=get_cell_tag(new_start.x, new_start.y),
-                               color=self.grid.line_cell_color,
-                               thickness=self.grid.line_thickness,
-                               fill=self.start_color)
+            self.grid.set_cell_outline(new_start.x, new_start.y)
+            self.grid.set_cell_fill(new_start.x, new_start.y, self.grid.start_color)
+            # with a flow field for the goal, routing from the new start is just a walk down the field
+            if self.algorithm == "Flow Field" and self.goal is not None:
+                self.find_path()
             return True
 
         if self.last_highlighted_cell:
-            dpg.configure_item(item=get_cell_tag(self.last_highlighted_cell.x, self.last_highlighted_cell.y),
-                               color=self.grid.line_cell_color,
-                               thickness=self.grid.line_thickness)
+            self.grid.set_cell_outline(self.last_highlighted_cell.x, self.last_highlighted_cell.y)
             self.last_highlighted_cell = None
         return False
 
@@ -47,28 +152,422 @@ class PathfindingManager:
         new_goal = self.grid.get_cell_from_pos(x, y)
         if new_goal is None: return False
         if self.goal is not None:
+            self.clear_path()
             self.goal.is_goal = False
-            dpg.configure_item(item=get_cell_tag(self.goal.x, self.goal.y),
-                               fill=self.grid.default_cell_color)
+            self.grid.set_cell_fill(self.goal.x, self.goal.y, self.grid.default_cell_color)
         dpg.hide_item("pathfinding_registry")
         self.setting_goal = False
         if new_goal.is_start == False and new_goal.is_goal == False:
             self.goal = new_goal
             new_goal.is_goal = True
             new_goal.passable = True
-            dpg.configure_item(item=get_cell_tag(new_goal.x, new_goal.y),
-                               color=self.grid.line_cell_color,
-                               thickness=self.grid.line_thickness,
-                               fill=self.goal_color)
+            self.grid.set_cell_outline(new_goal.x, new_goal.y)
+            self.grid.set_cell_fill(new_goal.x, new_goal.y, self.grid.goal_color)
             return True
 
         if self.last_highlighted_cell:
-            dpg.configure_item(item=get_cell_tag(self.last_highlighted_cell.x, self.last_highlighted_cell.y),
-                               color=self.grid.line_cell_color,
-                               thickness=self.grid.line_thickness)
+            self.grid.set_cell_outline(self.last_highlighted_cell.x, self.last_highlighted_cell.y)
             self.last_highlighted_cell = None
         return False
 
+    def engine_for(self, weighted: bool):
+        return engine_for(self.algorithm, weighted)
+
+    def search(self, passable, start, goal, version, cost=None):
+        return self.engines.search(self.engine_for(cost is not None), passable, start, goal, version, self.diagonal,
+                                   self.heuristic, cost=cost)
+
+    def terrain(self):
+        data = self.grid.data
+        return data.cost if data.weighted else None
+
+    def sync_endpoints(self):
+        # picks start/goal back up from the grid after it was replaced wholesale (e.g. a loaded map)
+        self.cancel_background()
+        self.clear_path()
+        self.engines.planner = None
+        data = self.grid.data
+        self.start = data.cell(*data.start) if data.start is not None else None
+        self.goal = data.cell(*data.goal) if data.goal is not None else None
+
+    def run_search(self):
+        if self.start is None or self.goal is None:
+            return None
+        data = self.grid.data
+        start, goal = (self.start.x, self.start.y), (self.goal.x, self.goal.y)
+        key = cache_key(start, goal, self.algorithm, self.diagonal, self.heuristic)
+        result = self.cache.get(key, data.passable, data.version, data.cost)
+        self.cache_hit = result is not None
+        if result is None:
+            result = (self.check_reachable(start, goal) or
+                      self.search(data.passable, start, goal, data.version, cost=self.terrain()))
+            self.cache.put(key, result, data.version)
+        PROFILER.record_search(self.algorithm, result, self.cache_hit)
+        self.path = result.path
+        self.stats = result
+        self.path_version = self.grid.data.version
+        return result
+
+    def check_reachable(self, start, goal):
+        # a goal walled off from the start would make the search flood the whole region, the region index
+        # answers that without searching
+        t0 = time.perf_counter()
+        if self.grid.data.connected(start, goal):
+            return None
+        return SearchResult(elapsed=time.perf_counter() - t0)
+
+    def start_background_search(self):
+        # the worker gets its own snapshot of the grid, so painting can carry on while it searches
+        if self.start is None or self.goal is None:
+            self.cancel_background()
+            return False
+        passable = self.grid.data.passable.copy()
+        cost = self.terrain()
+        cost = cost.copy() if cost is not None else None
+        version = self.grid.data.version
+        start, goal = (self.start.x, self.start.y), (self.goal.x, self.goal.y)
+        self.background_key = cache_key(start, goal, self.algorithm, self.diagonal, self.heuristic)
+        cached = self.cache.get(self.background_key, passable, version, self.grid.data.cost)
+        if cached is not None:
+            self.cancel_background()
+            self.cache_hit = True
+            self.apply_result(cached, version)
+            return True
+        unreachable = self.check_reachable(start, goal)
+        if unreachable is not None:
+            self.cancel_background()
+            self.cache_hit = False
+            self.cache.put(self.background_key, unreachable, version)
+            self.apply_result(unreachable, version)
+            return True
+        # the worker gets the engine state and a copy of the settings, nothing it touches is shared with the GUI
+        self.cancel_background()
+        engines = self.lent_engines = self.engines
+        self.engines = EngineState()
+        algorithm, diagonal, heuristic = self.engine_for(cost is not None), self.diagonal, self.heuristic
+        self.worker.submit(lambda cancel: engines.search(algorithm, passable, start, goal, version, diagonal,
+                                                         heuristic, cancel, cost), version)
+        if dpg.does_item_exist("search_stats"):
+            dpg.set_value("search_stats", "Searching...")
+        return True
+
+    def poll_background_search(self):
+        if not self.worker.busy:
+            return
+        if self.worker.version != self.grid.data.version:
+            # a cell was painted or start/goal moved, the running search is stale
+            self.start_background_search()
+            return
+        finished = self.worker.poll()
+        if not self.worker.busy:
+            self.reclaim_engines()
+        if finished is None:
+            return
+        version, result = finished
+        self.cache.put(self.background_key, result, version)
+        self.cache_hit = False
+        self.apply_result(result, version)
+
+    def apply_result(self, result, version):
+        PROFILER.record_search(self.algorithm, result, self.cache_hit)
+        self.path = result.path
+        self.stats = result
+        self.path_version = version
+        self.grid.draw_path(self.path)
+        self.show_stats()
+
+    def cancel_background(self):
+        # waits for a running search to stop, after that its engine state is safe to take back
+        self.worker.cancel()
+        self.reclaim_engines()
+
+    def reclaim_engines(self):
+        if self.lent_engines is not None:
+            self.engines, self.lent_engines = self.lent_engines, None
+
+    def set_background(self, background: bool):
+        self.background = background
+        if not background:
+            self.cancel_background()
+
+    def on_grid_edited(self):
+        # keeps a shown path in step with the painted walls, only the incremental planner is cheap enough for that
+        if self.path_version is None or self.path_version == self.grid.data.version:
+            return
+        if self.algorithm == "LPA*":
+            self.find_path()
+        else:
+            self.clear_path()
+
+    def get_flow_field(self):
+        data = self.grid.data
+        return self.engines.get_flow_field(data.passable, (self.goal.x, self.goal.y), data.version, self.diagonal,
+                                           cost=self.terrain())
+
+    def find_path(self):
+        self.clear_search_overlay()
+        if self.background:
+            return self.start_background_search()
+        result = self.run_search()
+        if result is None:
+            return False
+        self.grid.draw_path(self.path)
+        self.show_stats()
+        return result.found
+
+    def smooth_path(self):
+        # string pulls the shown path into straight segments; terrain costs don't run along straight lines, so
+        # paths on weighted maps stay on the grid
+        data = self.grid.data
+        if not self.path or self.path_version != data.version or data.weighted:
+            return False
+        t0 = time.perf_counter()
+        self.path = smooth_path(data.passable, self.path)
+        stats = self.stats
+        self.stats = SearchResult(self.path, float(segment_lengths(self.path).sum()), stats.nodes_expanded,
+                                  stats.peak_open, stats.elapsed + time.perf_counter() - t0)
+        self.cache_hit = False
+        self.grid.draw_path(self.path)
+        self.show_stats()
+        return True
+
+    def stop_search(self):
+        self.cancel_background()
+        self.clear_agents()
+        self.clear_path()
+
+    def get_batch_planner(self):
+        # the workers see the map through shared memory, which is only refreshed when the grid version moved on
+        if self.batch is None:
+            self.batch = BatchPlanner()
+        data = self.grid.data
+        self.batch.sync(data.passable, data.version, self.terrain())
+        return self.batch
+
+    def plan_batch(self, pairs):
+        # routes every (start, goal) pair on the current map with the selected algorithm and options, the paths
+        # are drawn as the workers hand them back (see poll_agents)
+        self.clear_agents()
+        if not pairs:
+            return None
+        self.agent_run = self.get_batch_planner().submit(pairs, self.algorithm, self.diagonal, self.heuristic)
+        self.agent_found = 0
+        return self.agent_run
+
+    def plan_random_agents(self, count: int, seed: int = None):
+        # agents start on random passable cells; with a goal set they all head for it (a crowd), otherwise each
+        # gets a random goal of its own
+        data = self.grid.data
+        ys, xs = np.nonzero(data.passable)
+        if len(xs) < 2:
+            return None
+        rng = np.random.default_rng(seed)
+        picks = rng.integers(0, len(xs), size=(count, 2))
+        goal = (self.goal.x, self.goal.y) if self.goal is not None else None
+        pairs = [((int(xs[a]), int(ys[a])), goal or (int(xs[b]), int(ys[b]))) for a, b in picks]
+        return self.plan_batch(pairs)
+
+    def poll_agents(self):
+        run = self.agent_run
+        if run is None:
+            return
+        for _, result in run.poll():
+            PROFILER.record_search(self.algorithm, result)
+            if result.found:
+                self.agent_found += 1
+                self.grid.add_agent_path(result.path)
+        if run.finished:
+            self.agent_run = None
+        if dpg.does_item_exist("search_stats"):
+            dpg.set_value("search_stats", f"Agents {run.done}/{run.total} | found {self.agent_found} | "
+                                          f"{run.elapsed * 1000:.0f} ms | {run.throughput:.0f} paths/s | "
+                                          f"{self.batch.workers} workers")
+
+    def clear_agents(self):
+        if self.agent_run is not None:
+            self.agent_run.cancel()
+            self.agent_run = None
+        self.grid.clear_agent_paths()
+
+    def shutdown(self):
+        self.worker.shutdown()
+        if self.batch is not None:
+            self.batch.close()
+
+    def clear_path(self):
+        self.clear_search_overlay()
+        self.path = None
+        self.stats = None
+        self.path_version = None
+        self.grid.clear_path()
+        self.show_stats()
+
+    def animate_search(self):
+        self.clear_path()
+        if self.start is None or self.goal is None:
+            return
+        stepper = STEPPERS.get(self.algorithm)
+        cost = self.terrain()
+        if self.step_speed is None or stepper is None or self.engine_for(cost is not None) != self.algorithm:
+            self.find_path()
+            return
+        options = {"cost": cost} if cost is not None else {}
+        self.step_version = self.grid.data.version
+        self.step_count = 0
+        self.step_elapsed = 0.0
+        self.step_paused = False
+        self.stepper = stepper(self.grid.data.passable, (self.start.x, self.start.y), (self.goal.x, self.goal.y),
+                               diagonal=self.diagonal, heuristic=self.heuristic, **options)
+
+    def on_frame(self):
+        self.poll_background_search()
+        self.poll_agents()
+        if self.stepper is not None and not self.step_paused:
+            self.advance_search(self.step_speed)
+
+    def advance_search(self, max_steps: int):
+        # runs the search generator until the frame budget or step count is used up, then paints only the delta
+        if self.stepper is None:
+            return
+        if self.step_version != self.grid.data.version:
+            self.clear_search_overlay()
+            return
+        t0 = time.perf_counter()
+        deadline = t0 + self.step_budget
+        opened, closed = [], []
+        result = None
+        for _ in range(max_steps):
+            try:
+                cell, new_cells = next(self.stepper)
+            except StopIteration as stop:
+                result = stop.value
+                break
+            closed.append(cell)
+            opened.extend(new_cells)
+            if time.perf_counter() >= deadline:
+                break
+        self.step_elapsed += time.perf_counter() - t0
+        self.step_count += len(closed)
+
+        self.paint_search_cells(opened, self.grid.open_color)
+        self.paint_search_cells(closed, self.grid.closed_color)
+        if result is None:
+            if dpg.does_item_exist("search_stats"):
+                dpg.set_value("search_stats", f"Searching | expanded {self.step_count}")
+            return
+
+        self.stepper = None
+        # the generator's own clock also counts the frames in between, only the time spent searching is reported
+        result.elapsed = self.step_elapsed
+        self.cache_hit = False
+        PROFILER.record_search(self.algorithm, result)
+        self.path = result.path
+        self.stats = result
+        self.path_version = self.grid.data.version
+        self.grid.draw_path(self.path)
+        self.show_stats()
+
+    def paint_search_cells(self, cells, color):
+        if not len(cells):
+            return
+        xs, ys = np.array(cells, dtype=np.intp).T
+        keep = np.ones(len(xs), dtype=bool)
+        for cell in (self.start, self.goal):
+            if cell is not None:
+                keep &= (xs != cell.x) | (ys != cell.y)
+        xs, ys = xs[keep], ys[keep]
+        self.grid.paint_cells(xs, ys, color)
+        self.visualized.append((xs, ys))
+
+    def clear_search_overlay(self):
+        self.stepper = None
+        if not self.visualized:
+            return
+        xs = np.concatenate([v[0] for v in self.visualized])
+        ys = np.concatenate([v[1] for v in self.visualized])
+        self.visualized = []
+        # a resize may have happened since the cells were painted
+        inside = (xs < self.grid.cols) & (ys < self.grid.rows)
+        if dpg.does_item_exist("grid_wrapper"):
+            self.grid.set_cell_fills(xs[inside], ys[inside])
+
+    def shade_goal_region(self):
+        # tints every cell the goal can be reached from, cleared together with the search overlay
+        if self.goal is None:
+            return
+        self.clear_search_overlay()
+        ys, xs = np.nonzero(self.grid.data.region_mask((self.goal.x, self.goal.y)))
+        self.paint_search_cells(np.stack((xs, ys), axis=1), self.grid.region_color)
+
+    def show_distance_heatmap(self):
+        # colors every cell that can reach the goal by its distance to it, from the goal's flow field
+        if self.goal is None:
+            return
+        self.clear_search_overlay()
+        distances = self.get_flow_field().distances()
+        ys, xs = np.nonzero(np.isfinite(distances))
+        if not len(xs):
+            return
+        d = distances[ys, xs]
+        t = (d / max(float(d.max()), 1.0))[:, None]
+        near, far = (np.array(color, dtype=np.float32) for color in self.grid.heat_colors)
+        keep = np.ones(len(xs), dtype=bool)
+        for cell in (self.start, self.goal):
+            if cell is not None:
+                keep &= (xs != cell.x) | (ys != cell.y)
+        xs, ys, colors = xs[keep], ys[keep], (near + t * (far - near))[keep]
+        self.grid.paint_cells(xs, ys, colors)
+        self.visualized.append((xs, ys))
+
+    def toggle_pause(self):
+        self.step_paused = not self.step_paused
+
+    def step_search(self):
+        self.step_paused = True
+        self.advance_search(1)
+
+    def set_step_speed(self, speed):
+        self.step_speed = speed
+
+    def set_step_budget(self, budget_ms: float):
+        self.step_budget = budget_ms / 1000
+
+    def show_stats(self):
+        if not dpg.does_item_exist("search_stats"):
+            return
+        if self.stats is None:
+            dpg.set_value("search_stats", "")
+            return
+        cache = f" | cache {self.cache.hits}/{self.cache.hits + self.cache.misses} hits"
+        engine = self.engine_for(self.grid.data.weighted)
+        if engine != self.algorithm:
+            cache += f" | terrain: {engine}"
+        if self.cache_hit:
+            found = f"Length {self.stats.cost:.2f}" if self.stats.found else "No path"
+            dpg.set_value("search_stats", f"{found} | cached | {self.stats.elapsed * 1e6:.0f} us{cache}")
+        elif not self.stats.found:
+            dpg.set_value("search_stats", f"No path | expanded {self.stats.nodes_expanded} | "
+                                          f"{self.stats.elapsed * 1000:.2f} ms{cache}")
+        else:
+            dpg.set_value("search_stats", f"Length {self.stats.cost:.2f} | expanded {self.stats.nodes_expanded} | "
+                                          f"peak open {self.stats.peak_open} | "
+                                          f"{self.stats.elapsed * 1000:.2f} ms{cache}")
+
+    def set_algorithm(self, algorithm: str):
+        self.algorithm = algorithm
+        if self.path_version is not None:
+            self.find_path()
+
+    def set_diagonal(self, diagonal: bool):
+        self.diagonal = diagonal
+        if self.path_version is not None:
+            self.find_path()
+
+    def set_heuristic(self, heuristic):
+        self.heuristic = heuristic
+        if self.path_version is not None:
+            self.find_path()
+
     def on_setting_start(self):
         self.setting_start = True
         self.setting_goal = False
@@ -88,18 +587,12 @@ class PathfindingManager:
                 hovered_cell = self.grid.get_cell_from_pos(x, y)
                 if self.last_highlighted_cell != hovered_cell:
                     if self.last_highlighted_cell is not None:
-                        dpg.configure_item(
-                            item=get_cell_tag(self.last_highlighted_cell.x, self.last_highlighted_cell.y),
-                            color=self.grid.line_cell_color,
-                            thickness=self.grid.line_thickness)
+                        self.grid.set_cell_outline(self.last_highlighted_cell.x, self.last_highlighted_cell.y)
                         self.last_highlighted_cell = None
                     if hovered_cell:
                         self.last_highlighted_cell = hovered_cell
-                        dpg.configure_item(item=get_cell_tag(hovered_cell.x, hovered_cell.y),
-                                           color=self.start_color if self.setting_start else self.goal_color,
-                                           thickness=self.grid.border_thickness)
+                        outline = self.grid.start_color if self.setting_start else self.grid.goal_color
+                        self.grid.set_cell_outline(hovered_cell.x, hovered_cell.y, outline, self.grid.border_thickness)
             elif self.last_highlighted_cell:
-                dpg.configure_item(item=get_cell_tag(self.last_highlighted_cell.x, self.last_highlighted_cell.y),
-                                   color=self.grid.line_cell_color,
-                                   thickness=self.grid.line_thickness)
+                self.grid.set_cell_outline(self.last_highlighted_cell.x, self.last_highlighted_cell.y)
                 self.last_highlighted_cell = None
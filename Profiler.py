@@ -0,0 +1,202 @@
+import csv
+import inspect
+import json
+import threading
+import time
+from collections import deque
+
+import dearpygui.dearpygui as dpg
+
+# dearpygui calls that get counted while profiling, the ones the grid and the search overlay lean on
+GUI_CALLS = ("configure_item", "set_value", "get_value", "set_item_pos", "delete_item", "does_item_exist",
+             "get_item_state", "get_drawing_mouse_pos", "show_item", "hide_item", "draw_rectangle", "draw_line",
+             "draw_polyline", "draw_image")
+# the trace file keeps this many of the most recent handler calls and searches
+TRACE_LIMIT = 20_000
+# seconds between overlay refreshes
+OVERLAY_INTERVAL = 0.5
+TRACE_FIELDS = ("kind", "name", "time", "duration_ms", "gui_calls", "found", "cost", "nodes_expanded", "peak_open",
+                "cached")
+
+
+class HandlerStats:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.gui_calls = {}
+
+    def as_dict(self):
+        return {"calls": self.calls, "total_ms": self.total * 1000,
+                "mean_ms": self.total * 1000 / max(self.calls, 1), "worst_ms": self.worst * 1000,
+                "gui_calls": dict(self.gui_calls)}
+
+
+class SearchStats:
+    def __init__(self):
+        self.searches = 0
+        self.cached = 0
+        self.found = 0
+        self.total = 0.0
+        self.nodes_expanded = 0
+        self.peak_open = 0
+
+    def as_dict(self):
+        searched = max(self.searches - self.cached, 1)
+        return {"searches": self.searches, "cached": self.cached, "found": self.found,
+                "mean_ms": self.total * 1000 / max(self.searches, 1),
+                "mean_expanded": self.nodes_expanded / searched, "peak_open": self.peak_open}
+
+
+class Profiler:
+    # Opt-in timing of the GUI handlers, the dearpygui calls they make and the searches they run. Disabled, a
+    # wrapped handler costs one flag check and dearpygui is left untouched; enabling swaps counting wrappers
+    # for the calls in GUI_CALLS into the dpg module, and disabling puts the originals back
+    def __init__(self):
+        self.enabled = False
+        self.handlers = {}
+        self.searches = {}
+        self.events = deque(maxlen=TRACE_LIMIT)
+        self.originals = {}
+        # the handler being timed is tracked per thread, searches also run on the background worker
+        self.local = threading.local()
+        self.started = time.perf_counter()
+        self.overlay_time = 0.0
+
+    def enable(self, enabled: bool):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            for name in GUI_CALLS:
+                self.originals[name] = getattr(dpg, name)
+                setattr(dpg, name, self.counted(name, self.originals[name]))
+        else:
+            for name, call in self.originals.items():
+                setattr(dpg, name, call)
+            self.originals.clear()
+
+    def reset(self):
+        self.handlers.clear()
+        self.searches.clear()
+        self.events.clear()
+        self.started = time.perf_counter()
+
+    def counted(self, name: str, call):
+        def gui_call(*args, **kwargs):
+            local = self.local
+            handler = getattr(local, "handler", None) or "other"
+            stats = self.handlers.get(handler) or self.handlers.setdefault(handler, HandlerStats())
+            stats.gui_calls[name] = stats.gui_calls.get(name, 0) + 1
+            local.gui_count = getattr(local, "gui_count", 0) + 1
+            return call(*args, **kwargs)
+        return gui_call
+
+    def run(self, name: str, callback, args=()):
+        if not self.enabled:
+            return callback(*args)
+        local = self.local
+        outer, outer_count = getattr(local, "handler", None), getattr(local, "gui_count", 0)
+        local.handler, local.gui_count = name, 0
+        t0 = time.perf_counter()
+        try:
+            return callback(*args)
+        finally:
+            elapsed = time.perf_counter() - t0
+            stats = self.handlers.get(name) or self.handlers.setdefault(name, HandlerStats())
+            stats.calls += 1
+            stats.total += elapsed
+            stats.worst = max(stats.worst, elapsed)
+            self.events.append({"kind": "handler", "name": name, "time": t0 - self.started,
+                                "duration_ms": elapsed * 1000, "gui_calls": local.gui_count})
+            local.handler, local.gui_count = outer, outer_count + local.gui_count
+
+    def profiled(self, name: str, callback):
+        # dearpygui passes as many of (sender, app_data, user_data) as the callback's code takes, so the wrapper
+        # has to take exactly as many as the callback it times
+        code = getattr(callback, "__code__", None)
+        count = 3 if code is None else min(code.co_argcount - inspect.ismethod(callback), 3)
+        run = self.run
+        return (lambda: run(name, callback),
+                lambda s: run(name, callback, (s,)),
+                lambda s, a: run(name, callback, (s, a)),
+                lambda s, a, u: run(name, callback, (s, a, u)))[max(count, 0)]
+
+    def instrument_callbacks(self):
+        # wraps the callback of every item built so far, named after its menu path, tag or type
+        for item in dpg.get_all_items():
+            callback = dpg.get_item_callback(item)
+            if callback is None:
+                continue
+            name = dpg.get_item_label(item) or dpg.get_item_alias(item) or dpg.get_item_type(item).split("::")[-1]
+            parent = dpg.get_item_parent(item)
+            if parent and dpg.get_item_label(parent):
+                name = f"{dpg.get_item_label(parent)}/{name}"
+            dpg.set_item_callback(item, self.profiled(name, callback))
+
+    def record_search(self, algorithm: str, result, cached: bool = False):
+        if not self.enabled or result is None:
+            return
+        stats = self.searches.get(algorithm) or self.searches.setdefault(algorithm, SearchStats())
+        stats.searches += 1
+        stats.cached += cached
+        stats.found += result.found
+        stats.total += result.elapsed
+        if not cached:
+            stats.nodes_expanded += result.nodes_expanded
+            stats.peak_open = max(stats.peak_open, result.peak_open)
+        self.events.append({"kind": "search", "name": algorithm, "time": time.perf_counter() - self.started,
+                            "duration_ms": result.elapsed * 1000, "found": result.found,
+                            "cost": result.cost if result.found else None, "nodes_expanded": result.nodes_expanded,
+                            "peak_open": result.peak_open, "cached": cached})
+
+    def report(self):
+        return {"handlers": {name: stats.as_dict() for name, stats in self.handlers.items()},
+                "searches": {name: stats.as_dict() for name, stats in self.searches.items()},
+                "events": list(self.events)}
+
+    def save(self, path: str):
+        # .csv gets the event trace one row per handler call or search, anything else the full JSON report
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=TRACE_FIELDS)
+                writer.writeheader()
+                writer.writerows(list(self.events))
+        else:
+            with open(path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+
+    def format_overlay(self):
+        lines = [f"{'Handler':<28}{'Calls':>7}{'Mean ms':>10}{'Worst ms':>10}{'GUI/call':>10}"]
+        ranked = sorted(self.handlers.items(), key=lambda item: item[1].total, reverse=True)
+        for name, stats in ranked:
+            gui = sum(stats.gui_calls.values())
+            lines.append(f"{name[:27]:<28}{stats.calls:>7}{stats.total * 1000 / max(stats.calls, 1):>10.3f}"
+                         f"{stats.worst * 1000:>10.3f}{gui / max(stats.calls, 1):>10.1f}")
+            top = sorted(stats.gui_calls.items(), key=lambda item: item[1], reverse=True)[:3]
+            if top:
+                lines.append("    " + ", ".join(f"{call} {count}" for call, count in top))
+        if self.searches:
+            lines.append("")
+            lines.append(f"{'Algorithm':<28}{'Runs':>7}{'Mean ms':>10}{'Expanded':>10}{'Cached':>10}")
+            for name, stats in self.searches.items():
+                summary = stats.as_dict()
+                lines.append(f"{name:<28}{stats.searches:>7}{summary['mean_ms']:>10.3f}"
+                             f"{summary['mean_expanded']:>10.0f}{stats.cached:>10}")
+        return "\n".join(lines)
+
+    def update_overlay(self):
+        # called once per frame, refreshes the overlay text now and then while it is shown
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if now - self.overlay_time < OVERLAY_INTERVAL:
+            return
+        self.overlay_time = now
+        # the overlay's own dearpygui calls go around the counters
+        get = self.originals.get
+        if get("does_item_exist", dpg.does_item_exist)("profiler_text"):
+            get("set_value", dpg.set_value)("profiler_text", self.format_overlay())
+
+
+PROFILER = Profiler()
@@ -0,0 +1,213 @@
+from collections import deque
+
+import numpy as np
+
+# edits bigger than this are cheaper to handle with one vectorized relabel than cell by cell
+BATCH_RELABEL_LIMIT = 256
+# a split that has to walk more cells than this falls back to the vectorized relabel as well
+SPLIT_WALK_LIMIT = 20_000
+
+# the 8 cells around a cell in ring order, consecutive ones are 4-adjacent to each other
+RING = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+
+
+def label_components(passable: np.ndarray):
+    # 4-connected labeling without scipy: every horizontal run gets an id, runs touching vertically are
+    # merged by hooking roots onto the smaller root and pointer jumping until nothing changes.
+    # 4-connectivity is also what decides reachability with diagonal moves, since those may not cut corners
+    rows, cols = passable.shape
+    walk = passable != 0
+    starts = walk.copy()
+    starts[:, 1:] &= ~walk[:, :-1]
+    if not starts.any():
+        # no passable cell, so no runs to hook together
+        return np.full(rows * cols, -1, dtype=np.int64)
+    run_id = np.cumsum(starts.ravel()).reshape(rows, cols) - 1
+    parent = np.arange(int(np.count_nonzero(starts)))
+
+    # (upper run, lower run) pairs come out sorted in scan order, so dropping repeats is a plain diff
+    both = walk[:-1] & walk[1:]
+    upper, lower = run_id[:-1][both], run_id[1:][both]
+    keep = np.ones(len(upper), dtype=bool)
+    keep[1:] = (np.diff(upper) != 0) | (np.diff(lower) != 0)
+    upper, lower = upper[keep], lower[keep]
+    while len(upper):
+        a, b = parent[upper], parent[lower]
+        differ = a != b
+        if not differ.any():
+            break
+        upper, lower = upper[differ], lower[differ]
+        a, b = a[differ], b[differ]
+        # roots only ever hook onto smaller roots, so no cycles can form
+        np.minimum.at(parent, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    return np.where(walk, parent[run_id], -1).astype(np.int64).ravel()
+
+
+class RegionIndex:
+    # Connected components of the passable cells. Opening a cell unions it with its neighbours, blocking one
+    # only relabels the piece that got cut off (if any), found by flooding out from its neighbours in
+    # lockstep so the smallest piece finishes first
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.labels = None
+        self.parent = []
+
+    @property
+    def stale(self):
+        return self.labels is None
+
+    def invalidate(self, rows: int = None, cols: int = None):
+        self.rows = rows if rows is not None else self.rows
+        self.cols = cols if cols is not None else self.cols
+        self.labels = None
+        self.parent = []
+
+    def sync(self, passable: np.ndarray):
+        # labeling is lazy, nothing is tracked until the first query
+        if self.labels is None:
+            self.labels = label_components(passable)
+            self.parent = list(range(int(self.labels.max()) + 1 if len(self.labels) else 0))
+
+    def find(self, label: int):
+        parent = self.parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    def region(self, x: int, y: int):
+        label = int(self.labels[y * self.cols + x])
+        return self.find(label) if label >= 0 else -1
+
+    def region_mask(self, region: int):
+        raw = np.unique(self.labels[self.labels >= 0])
+        members = [label for label in raw.tolist() if self.find(label) == region]
+        return np.isin(self.labels, members).reshape(self.rows, self.cols)
+
+    def neighbours(self, node: int):
+        y, x = divmod(node, self.cols)
+        if x > 0:
+            yield node - 1
+        if x < self.cols - 1:
+            yield node + 1
+        if y > 0:
+            yield node - self.cols
+        if y < self.rows - 1:
+            yield node + self.cols
+
+    def update(self, xs: np.ndarray, ys: np.ndarray, passable: np.ndarray):
+        # xs/ys are cells whose passability just changed, passable is the plane after the edit
+        if self.labels is None or not len(xs):
+            return
+        if len(xs) > BATCH_RELABEL_LIMIT:
+            self.invalidate()
+            self.sync(passable)
+            return
+        nodes = (ys * self.cols + xs).tolist()
+        flat = passable.ravel()
+        opened = [node for node in nodes if flat[node]]
+        blocked = [node for node in nodes if not flat[node]]
+
+        # the edit is replayed one cell at a time: cells blocked later in the batch still count as open, otherwise
+        # a cut made by several cells together would never show up as a split of any single one of them
+        pending = set(blocked)
+        is_open = lambda node: flat[node] or node in pending
+        for node in opened:
+            self.labels[node] = len(self.parent)
+            self.parent.append(len(self.parent))
+            for nb in self.neighbours(node):
+                if is_open(nb) and self.labels[nb] >= 0:
+                    self.union(int(self.labels[node]), int(self.labels[nb]))
+        for node in blocked:
+            pending.discard(node)
+            self.labels[node] = -1
+            if not self.split(node, is_open):
+                self.invalidate()
+                self.sync(passable)
+                return
+
+    def locally_connected(self, node: int, is_open):
+        # the open 4-neighbours are still connected if they all sit on one open arc of the surrounding ring
+        y, x = divmod(node, self.cols)
+        ring = [0 <= x + dx < self.cols and 0 <= y + dy < self.rows and bool(is_open((y + dy) * self.cols + x + dx))
+                for dx, dy in RING]
+        if all(ring):
+            return True
+        # rotate so the ring starts on a closed cell, then count open arcs holding a 4-neighbour
+        first = ring.index(False)
+        ring = ring[first:] + ring[:first]
+        orthogonal = [(i - first) % 8 for i in (0, 2, 4, 6)]
+        arcs = 0
+        in_arc = has_neighbour = False
+        for i, is_open in enumerate(ring + [False]):
+            if is_open:
+                in_arc = True
+                has_neighbour |= i in orthogonal
+            elif in_arc:
+                arcs += has_neighbour
+                in_arc = has_neighbour = False
+        return arcs <= 1
+
+    def split(self, node: int, is_open):
+        # returns False when the split is too big to walk and a full relabel should be done instead
+        seeds = [nb for nb in self.neighbours(node) if is_open(nb)]
+        if len(seeds) < 2 or self.locally_connected(node, is_open):
+            return True
+
+        # one flood per neighbour, advanced one cell at a time each; floods that meet are merged
+        count = len(seeds)
+        owner = {seed: i for i, seed in enumerate(seeds)}
+        group = list(range(count))
+        finished = [False] * count
+        frontiers = [deque([seed]) for seed in seeds]
+        visited = [[seed] for seed in seeds]
+        walked = 0
+
+        def root(i):
+            while group[i] != i:
+                i = group[i]
+            return i
+
+        while True:
+            live = {root(i) for i in range(count) if not finished[i]}
+            if len(live) <= 1:
+                return True
+            for i, frontier in enumerate(frontiers):
+                if not frontier:
+                    continue
+                current = frontier.popleft()
+                walked += 1
+                for nb in self.neighbours(current):
+                    if not is_open(nb):
+                        continue
+                    other = owner.get(nb)
+                    if other is None:
+                        owner[nb] = i
+                        visited[i].append(nb)
+                        frontier.append(nb)
+                    elif root(other) != root(i):
+                        group[root(other)] = root(i)
+            if walked > SPLIT_WALK_LIMIT:
+                return False
+
+            # a group whose floods all ran dry is a piece of its own, all but the last one get a fresh label
+            for g in {root(i) for i in range(count) if not finished[i]}:
+                members = [i for i in range(count) if not finished[i] and root(i) == g]
+                if len(live) > 1 and not any(frontiers[i] for i in members):
+                    label = len(self.parent)
+                    self.parent.append(label)
+                    for i in members:
+                        self.labels[visited[i]] = label
+                        finished[i] = True
+                    live.discard(g)
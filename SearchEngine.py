@@ -0,0 +1,234 @@
+import heapq
+import math
+import time
+
+import numpy as np
+
+SQRT2 = math.sqrt(2)
+# engines poll their cancel token once per this many expansions, a power of two so the test is a mask
+CANCEL_INTERVAL = 1024
+CANCEL_MASK = CANCEL_INTERVAL - 1
+
+
+class SearchResult:
+    def __init__(self, path=None, cost=math.inf, nodes_expanded=0, peak_open=0, elapsed=0.0):
+        # path is a list of (x, y) tuples from start to goal, or None when the goal can't be reached
+        self.path = path
+        self.cost = cost
+        self.nodes_expanded = nodes_expanded
+        self.peak_open = peak_open
+        self.elapsed = elapsed
+
+    @property
+    def found(self):
+        return self.path is not None
+
+    def __repr__(self):
+        return (f"SearchResult(found={self.found}, cost={self.cost:.3f}, nodes_expanded={self.nodes_expanded}, "
+                f"peak_open={self.peak_open}, elapsed={self.elapsed * 1000:.2f}ms)")
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    # shared between the GUI and a worker thread, engines poll it every CANCEL_INTERVAL expansions
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        if self.cancelled:
+            raise SearchCancelled()
+
+
+class FlatGrid:
+    # The passability plane flattened into a bytearray with a one cell blocked border around it,
+    # so node ids are plain ints and neighbour lookups never need a bounds check
+    def __init__(self, passable: np.ndarray, cost: np.ndarray = None):
+        self.rows, self.cols = passable.shape
+        self.width = self.cols + 2
+        padded = np.zeros((self.rows + 2, self.width), dtype=np.uint8)
+        padded[1:-1, 1:-1] = passable != 0
+        self.cells = bytearray(padded.tobytes())
+        self.size = len(self.cells)
+        # terrain cost of entering each cell (1-255) laid out like cells; without a cost plane the cells
+        # themselves are the weights, every passable cell costs 1
+        self.weights = self.cells
+        self.max_weight = 1
+        if cost is not None:
+            padded[1:-1, 1:-1] = np.where(passable != 0, np.maximum(cost, 1), 0)
+            self.weights = bytearray(padded.tobytes())
+            self.max_weight = max(int(padded.max()), 1)
+
+    def node_id(self, x: int, y: int):
+        return (y + 1) * self.width + x + 1
+
+    def node_xy(self, node: int):
+        y, x = divmod(node, self.width)
+        return x - 1, y - 1
+
+    def neighbours(self, diagonal: bool):
+        # (offset, cost, first orthogonal offset, second orthogonal offset) - diagonals may not cut corners
+        w = self.width
+        moves = [(1, 1.0, 0, 0), (-1, 1.0, 0, 0), (w, 1.0, 0, 0), (-w, 1.0, 0, 0)]
+        if diagonal:
+            moves += [(w + 1, SQRT2, 1, w), (w - 1, SQRT2, -1, w), (-w + 1, SQRT2, 1, -w), (-w - 1, SQRT2, -1, -w)]
+        return moves
+
+    def build_path(self, parent, goal: int):
+        path = []
+        node = goal
+        while node != -1:
+            path.append(self.node_xy(node))
+            node = parent[node]
+        path.reverse()
+        return path
+
+
+def octile(dx, dy):
+    return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+
+
+def manhattan(dx, dy):
+    return dx + dy
+
+
+def euclidean(dx, dy):
+    return math.hypot(dx, dy)
+
+
+HEURISTICS = {
+    "octile": octile,
+    "manhattan": manhattan,
+    "euclidean": euclidean,
+}
+
+
+def get_heuristic(name, diagonal: bool):
+    if name is None:
+        name = "octile" if diagonal else "manhattan"
+    if name not in HEURISTICS:
+        raise ValueError(f"Unknown heuristic '{name}', expected one of {list(HEURISTICS)}")
+    return HEURISTICS[name]
+
+
+def astar(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+          cancel: CancelToken = None, cost: np.ndarray = None):
+    # cost is an optional terrain plane, a move costs its length times the cost of the cell it enters
+    t0 = time.perf_counter()
+    grid = FlatGrid(passable, cost)
+    cells = grid.cells
+    weights = grid.weights
+    width = grid.width
+    h = get_heuristic(heuristic, diagonal)
+    moves = grid.neighbours(diagonal)
+
+    s = grid.node_id(*start)
+    t = grid.node_id(*goal)
+    if not cells[s] or not cells[t]:
+        return SearchResult(elapsed=time.perf_counter() - t0)
+
+    gy, gx = divmod(t, width)
+    g_score = [math.inf] * grid.size
+    parent = [-1] * grid.size
+    closed = bytearray(grid.size)
+
+    g_score[s] = 0.0
+    sy, sx = divmod(s, width)
+    open_heap = [(h(abs(sx - gx), abs(sy - gy)), -0.0, s)]
+    expanded = 0
+    peak_open = 1
+
+    while open_heap:
+        node = heapq.heappop(open_heap)[2]
+        if closed[node]:
+            continue
+        closed[node] = 1
+        g = g_score[node]
+        expanded += 1
+        if node == t:
+            return SearchResult(grid.build_path(parent, t), g, expanded, peak_open, time.perf_counter() - t0)
+        if cancel is not None and not expanded & CANCEL_MASK:
+            cancel.check()
+
+        for offset, step, side_a, side_b in moves:
+            nb = node + offset
+            if not cells[nb] or closed[nb]:
+                continue
+            if side_a and not (cells[node + side_a] and cells[node + side_b]):
+                continue
+            new_g = g + step * weights[nb]
+            if new_g < g_score[nb]:
+                g_score[nb] = new_g
+                parent[nb] = node
+                ny, nx = divmod(nb, width)
+                # ties on f are broken towards the larger g, which keeps the search heading for the goal
+                heapq.heappush(open_heap, (new_g + h(abs(nx - gx), abs(ny - gy)), -new_g, nb))
+        if len(open_heap) > peak_open:
+            peak_open = len(open_heap)
+
+    return SearchResult(None, math.inf, expanded, peak_open, time.perf_counter() - t0)
+
+
+def astar_steps(passable: np.ndarray, start, goal, diagonal: bool = True, heuristic: str = None,
+                cost: np.ndarray = None):
+    # Same search as astar, but as a resumable generator: every expansion yields the closed cell and the
+    # cells it opened, and the finished SearchResult comes back as the generator's return value
+    t0 = time.perf_counter()
+    grid = FlatGrid(passable, cost)
+    cells = grid.cells
+    weights = grid.weights
+    width = grid.width
+    node_xy = grid.node_xy
+    h = get_heuristic(heuristic, diagonal)
+    moves = grid.neighbours(diagonal)
+
+    s = grid.node_id(*start)
+    t = grid.node_id(*goal)
+    if not cells[s] or not cells[t]:
+        return SearchResult(elapsed=time.perf_counter() - t0)
+
+    gy, gx = divmod(t, width)
+    g_score = [math.inf] * grid.size
+    parent = [-1] * grid.size
+    closed = bytearray(grid.size)
+
+    g_score[s] = 0.0
+    sy, sx = divmod(s, width)
+    open_heap = [(h(abs(sx - gx), abs(sy - gy)), -0.0, s)]
+    expanded = 0
+    peak_open = 1
+
+    while open_heap:
+        node = heapq.heappop(open_heap)[2]
+        if closed[node]:
+            continue
+        closed[node] = 1
+        g = g_score[node]
+        expanded += 1
+        if node == t:
+            return SearchResult(grid.build_path(parent, t), g, expanded, peak_open, time.perf_counter() - t0)
+
+        opened = []
+        for offset, step, side_a, side_b in moves:
+            nb = node + offset
+            if not cells[nb] or closed[nb]:
+                continue
+            if side_a and not (cells[node + side_a] and cells[node + side_b]):
+                continue
+            new_g = g + step * weights[nb]
+            if new_g < g_score[nb]:
+                g_score[nb] = new_g
+                parent[nb] = node
+                ny, nx = divmod(nb, width)
+                heapq.heappush(open_heap, (new_g + h(abs(nx - gx), abs(ny - gy)), -new_g, nb))
+                opened.append(node_xy(nb))
+        if len(open_heap) > peak_open:
+            peak_open = len(open_heap)
+        yield node_xy(node), opened
+
+    return SearchResult(None, math.inf, expanded, peak_open, time.perf_counter() - t0)
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from SearchEngine import CancelToken, SearchCancelled
+
+
+class SearchWorker:
+    # Runs one search at a time off the GUI thread. Submitting a new search cancels the one in flight and waits
+    # for it to stop, so two jobs never run at once; finished results are only picked up by poll, which the GUI
+    # calls from its frame loop
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search_worker")
+        self.future = None
+        self.token = None
+        self.version = None
+
+    @property
+    def busy(self):
+        return self.future is not None
+
+    def submit(self, job, version):
+        # job is called with a CancelToken and returns a SearchResult
+        self.cancel()
+        self.token = CancelToken()
+        self.version = version
+        self.future = self.executor.submit(self.run, job, self.token)
+
+    @staticmethod
+    def run(job, token: CancelToken):
+        try:
+            return job(token)
+        except SearchCancelled:
+            return None
+
+    def cancel(self):
+        # the engines check the token every SearchEngine.CANCEL_INTERVAL expansions (and between the passes of
+        # the table and cluster builds), so the wait is short
+        if self.token is not None:
+            self.token.cancel()
+        if self.future is not None:
+            wait([self.future])
+        self.future = None
+        self.token = None
+        self.version = None
+
+    def poll(self):
+        # (version, result) once the search is done, None while it's still running or if it was cancelled
+        if self.future is None or not self.future.done():
+            return None
+        future, version = self.future, self.version
+        self.future = None
+        self.token = None
+        self.version = None
+        result = future.result()
+        if result is None:
+            return None
+        return version, result
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
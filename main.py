@@ -1,7 +1,14 @@
+import time
+
 import dearpygui.dearpygui as dpg
 
+from Algorithms import ALGORITHMS
+from Brush import BRUSH_TOOLS
 from Grid import Grid
+from MapGenerators import GENERATORS
+from MapIO import MapFormatError, load_any_map, save_map
 from PathfindingManager import PathfindingManager
+from Profiler import PROFILER
 
 #DEARPYGUI SPECIFIC
 WINDOW_NAME = "Minotaur Engine"
@@ -19,9 +26,22 @@ MIN_CELL_SIZE = 5
 MAX_CELL_SIZE = 100
 MIN_LINE_THICKNESS = 1.0
 MAX_LINE_THICKNESS = 5.0
+BRUSH_SIZES = (1, 3, 5, 9)
+# what the terrain brush paints, cost is the multiplier on moving into the cell (None paints walls)
+TERRAIN_TYPES = {"Walls": None, "Plain (1)": 1, "Grass (2)": 2, "Sand (3)": 3, "Mud (5)": 5, "Water (10)": 10,
+                 "Swamp (25)": 25}
+# (cols, rows) of generated maps, None generates at the current grid size
+GENERATOR_SIZES = {"Current Grid": None, "256 x 256": (256, 256), "1024 x 1024": (1024, 1024),
+                   "4000 x 4000": (4000, 4000)}
+
+# ANIMATION SPECIFIC (expansions per frame, None runs the search without animating)
+STEP_SPEEDS = {"Slow": 1, "Normal": 25, "Fast": 250, "Full Speed": None}
+STEP_BUDGETS_MS = (2, 4, 8, 16)
 
 # PATHFINDING SPECIFIC
 PATHFINDING_MANAGER = PathfindingManager(GRID)
+# agents per batch, routed across worker processes (to the goal when one is set)
+AGENT_COUNTS = (100, 500, 2000)
 
 
 # list of global values tied in the DearPyGui Value Registry that we can you so synchronize all values in the fields on the visual side
@@ -58,130 +78,292 @@ def on_click(type_of_click: str):
     else:
         GRID.handle_grid_click(type_of_click)
 
-# Initialize the viewport to start adding windows and content
-dpg.create_context()
-dpg.create_viewport(title=WINDOW_NAME, width=WINDOW_SIZE[0], height=WINDOW_SIZE[1], small_icon=ICO_PATH,
-                    large_icon=ICO_PATH)
-
-# Create a font registry
-with dpg.font_registry():
-    default_font = dpg.add_font(REG_FONT_PATH, 14)
-
-dpg.bind_font(default_font)
-
-with dpg.theme() as main_window_theme:
-    with dpg.theme_component(dpg.mvAll):
-        dpg.add_theme_style(dpg.mvStyleVar_WindowPadding, MAIN_WINDOW_PADDING, MAIN_WINDOW_PADDING,
-                            category=dpg.mvThemeCat_Core)
-
-# Create a Value Registry to hold the INITIAL_GLOBAL_VALUES_LIST variables
-with dpg.value_registry():
-    for key, item in INITIAL_GLOBAL_VALUES_LIST.items():
-        if type(item) == tuple:
-            if type(item[0]) == int:
-                dpg.add_int4_value(tag=key, default_value=item)
-            elif type(item[0]) == float:
-                dpg.add_color_value(tag=key, default_value=item)
-        elif type(item) == int:
-            dpg.add_int_value(tag=key, default_value=item)
-        elif type(item) == float:
-            dpg.add_float_value(tag=key, default_value=item)
-        elif type(item) == bool:
-            dpg.add_bool_value(tag=key, default_value=item)
-
-# The main window where everything will be based
-with dpg.window(tag="main_window", menubar=False, no_collapse=True, no_close=True, no_scrollbar=True, no_scroll_with_mouse=True):
-    with dpg.handler_registry():
-        dpg.add_mouse_down_handler(button=dpg.mvMouseButton_Left, callback=lambda e: on_click("left"))
-        dpg.add_mouse_release_handler(button=dpg.mvMouseButton_Left, callback=GRID.reset_drag_state)
-        dpg.add_mouse_down_handler(button=dpg.mvMouseButton_Right, callback=lambda e: on_click("right"))
-        dpg.add_mouse_release_handler(button=dpg.mvMouseButton_Right, callback=GRID.reset_drag_state)
-    with dpg.handler_registry(tag="pathfinding_registry", show=False):
-        dpg.add_mouse_move_handler(callback=PATHFINDING_MANAGER.mouse_visual_movement)
-
-    with dpg.menu_bar(tag="main_menu_bar"):
-        with dpg.menu(label = "Grid"):
-            dpg.add_menu_item(label="Clear Grid", callback=lambda e: GRID.update_grid(clear=True))
-            with dpg.menu(label = "Grid Size"):
-                dpg.add_menu_item(label="10 x 10", callback=lambda e: GRID.update_grid(grid_size=(10, 10)))
-                dpg.add_menu_item(label="15 x 15", callback=lambda e: GRID.update_grid(grid_size=(15, 15)))
-                dpg.add_menu_item(label="25 x 25", callback=lambda e: GRID.update_grid(grid_size=(25, 25)))
-                dpg.add_menu_item(label="50 x 50", callback=lambda e: GRID.update_grid(grid_size=(50, 50)))
-            with dpg.menu(label = "Cell Size"):
-                dpg.add_menu_item(label="25", callback=lambda e: GRID.update_grid(cell_size=25))
-                dpg.add_menu_item(label="30", callback=lambda e: GRID.update_grid(cell_size=30))
-                dpg.add_menu_item(label="35", callback=lambda e: GRID.update_grid(cell_size=35))
-                dpg.add_menu_item(label="40", callback=lambda e: GRID.update_grid(cell_size=40))
-                dpg.add_menu_item(label="45", callback=lambda e: GRID.update_grid(cell_size=45))
-                dpg.add_menu_item(label="50", callback=lambda e: GRID.update_grid(cell_size=50))
-            with dpg.menu(label="Line Thickness"):
-                dpg.add_menu_item(label="1", callback=lambda e: GRID.update_grid(line_thickness=1))
-                dpg.add_menu_item(label="2", callback=lambda e: GRID.update_grid(line_thickness=2))
-                dpg.add_menu_item(label="3", callback=lambda e: GRID.update_grid(line_thickness=3))
-                dpg.add_menu_item(label="4", callback=lambda e: GRID.update_grid(line_thickness=4))
-                dpg.add_menu_item(label="5", callback=lambda e: GRID.update_grid(line_thickness=5))
-
-            dpg.add_menu_item(label = "Advanced...", callback=lambda e: show_modal("advanced_grid_settings"))
-        with dpg.menu(label = "Pathfinding"):
-            dpg.add_menu_item(label="Set Start Cell", callback=PATHFINDING_MANAGER.on_setting_start)
-            dpg.add_menu_item(label="Set End Cell", callback=PATHFINDING_MANAGER.on_setting_goal)
-
-# The Advanced Grid Settings window where you can go more in-depth with customizing the grid
-with dpg.window(label="Advanced Grid Settings", modal=True, show=False, no_resize=True, tag="advanced_grid_settings", no_close=True):
-    with dpg.table(header_row=False):
-        dpg.add_table_column(width_fixed=True)
-        dpg.add_table_column()
-
-        with dpg.table_row():
-            dpg.add_text("Cell Size:")
-            dpg.add_drag_int(width=-1, min_value=MIN_CELL_SIZE, max_value=MAX_CELL_SIZE,
-                             clamped=True, label="", source="cell_size", speed=0.1)
-
-        with dpg.table_row():
-            dpg.add_text("Grid Size:")
-            dpg.add_drag_intx(label="", size=2, width=-1, source="grid_size",
-                              min_value=MIN_GRID_AXIS_SIZE, max_value=MAX_GRID_AXIS_SIZE, clamped = True, speed=0.1)
-
-        with dpg.table_row():
-            dpg.add_text("Line Thickness:")
-            dpg.add_drag_float(width=-1, min_value=MIN_LINE_THICKNESS, max_value=MAX_LINE_THICKNESS,
-                               clamped=True, label="", source="line_thickness", speed=0.01)
-
-        with dpg.table_row():
-            dpg.add_text("Cell Color:")
-            dpg.add_color_edit(label="", width=-1, no_drag_drop=True, source="cell_color")
-
-        with dpg.table_row():
-            dpg.add_text("Line Color:")
-            dpg.add_color_edit(label="", width=-1, no_drag_drop=True, source="line_color")
-
-        with dpg.table_row():
-            dpg.add_text("Block Color:")
-            dpg.add_color_edit(label="", width=-1, no_drag_drop=True, source="impassable_color")
-
-        with dpg.table_row():
-            dpg.add_text("Center Grid:")
-            dpg.add_checkbox(label="", source="center_grid")
-
-    # dpg.add_separator()
-
-    with dpg.group(horizontal=True):
-        dpg.add_button(label="Cancel", width=130, callback=lambda e: GRID.close_advanced_window(True))
-        dpg.add_button(label="Apply", width=130, callback=lambda e: GRID.close_advanced_window(False))
-
-    # dpg.add_separator()
-
-# Set the primary window (ties it to the viewport) to the main window
-dpg.set_primary_window("main_window", True)
-dpg.set_viewport_resize_callback(GRID.update_grid_position)
-dpg.bind_item_theme("main_window", main_window_theme)
-
-# THE 4 LINES BELOW MUST BE RUN FOR THE APPLICATION TO BE DISPLAYED!
-dpg.setup_dearpygui()
-dpg.show_viewport()
-
-# Display the current grid
-GRID.display_grid()
-
-dpg.start_dearpygui()
-dpg.destroy_context()
\ No newline at end of file
+
+def on_map_file_selected(sender, app_data, user_data):
+    path = app_data["file_path_name"]
+    try:
+        if user_data == "save":
+            save_map(path, GRID.data)
+        else:
+            GRID.load_data(load_any_map(path))
+            PATHFINDING_MANAGER.sync_endpoints()
+    except (OSError, MapFormatError) as e:
+        dpg.set_value("search_stats", f"Map {user_data} failed: {e}")
+
+
+def apply_grid_change(change):
+    # a shrink can drop the start or goal, so the pathfinding side re-reads them whenever the size changed
+    size = (GRID.cols, GRID.rows)
+    change()
+    if (GRID.cols, GRID.rows) != size:
+        PATHFINDING_MANAGER.sync_endpoints()
+
+
+def generate_map(generator: str):
+    t0 = time.perf_counter()
+    seed = GRID.generate(generator)
+    PATHFINDING_MANAGER.sync_endpoints()
+    dpg.set_value("search_stats", f"{generator} {GRID.cols} x {GRID.rows}, seed {seed} | "
+                                  f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+def on_trace_file_selected(sender, app_data):
+    try:
+        PROFILER.save(app_data["file_path_name"])
+    except OSError as e:
+        dpg.set_value("search_stats", f"Saving the trace failed: {e}")
+
+
+def set_profiling(enabled: bool):
+    PROFILER.enable(enabled)
+    dpg.configure_item("profiler_window", show=enabled)
+
+
+def on_frame():
+    # everything painted since the last frame is applied here in one batch
+    if GRID.flush_brush():
+        PATHFINDING_MANAGER.on_grid_edited()
+    PATHFINDING_MANAGER.on_frame()
+    GRID.upload_texture()
+
+# the editor only starts when run as a script: batch workers are spawned processes that import this module
+# as __mp_main__, and must not open a viewport of their own
+if __name__ == "__main__":
+    # Initialize the viewport to start adding windows and content
+    dpg.create_context()
+    dpg.create_viewport(title=WINDOW_NAME, width=WINDOW_SIZE[0], height=WINDOW_SIZE[1], small_icon=ICO_PATH,
+                        large_icon=ICO_PATH)
+
+    # Create a font registry
+    with dpg.font_registry():
+        default_font = dpg.add_font(REG_FONT_PATH, 14)
+
+    dpg.bind_font(default_font)
+
+    with dpg.theme() as main_window_theme:
+        with dpg.theme_component(dpg.mvAll):
+            dpg.add_theme_style(dpg.mvStyleVar_WindowPadding, MAIN_WINDOW_PADDING, MAIN_WINDOW_PADDING,
+                                category=dpg.mvThemeCat_Core)
+
+    # Create a Value Registry to hold the INITIAL_GLOBAL_VALUES_LIST variables
+    with dpg.value_registry():
+        for key, item in INITIAL_GLOBAL_VALUES_LIST.items():
+            if type(item) == tuple:
+                if type(item[0]) == int:
+                    dpg.add_int4_value(tag=key, default_value=item)
+                elif type(item[0]) == float:
+                    dpg.add_color_value(tag=key, default_value=item)
+            elif type(item) == int:
+                dpg.add_int_value(tag=key, default_value=item)
+            elif type(item) == float:
+                dpg.add_float_value(tag=key, default_value=item)
+            elif type(item) == bool:
+                dpg.add_bool_value(tag=key, default_value=item)
+
+    # The main window where everything will be based
+    with dpg.window(tag="main_window", menubar=False, no_collapse=True, no_close=True, no_scrollbar=True, no_scroll_with_mouse=True):
+        with dpg.handler_registry():
+            dpg.add_mouse_down_handler(button=dpg.mvMouseButton_Left, callback=lambda e: on_click("left"),
+                                       tag="left_mouse_down")
+            dpg.add_mouse_release_handler(button=dpg.mvMouseButton_Left, callback=GRID.reset_drag_state,
+                                          tag="left_mouse_release")
+            dpg.add_mouse_down_handler(button=dpg.mvMouseButton_Right, callback=lambda e: on_click("right"),
+                                       tag="right_mouse_down")
+            dpg.add_mouse_release_handler(button=dpg.mvMouseButton_Right, callback=GRID.reset_drag_state,
+                                          tag="right_mouse_release")
+        with dpg.handler_registry(tag="pathfinding_registry", show=False):
+            dpg.add_mouse_move_handler(callback=PATHFINDING_MANAGER.mouse_visual_movement, tag="mouse_visual_movement")
+
+        with dpg.menu_bar(tag="main_menu_bar"):
+            with dpg.menu(label = "Grid"):
+                dpg.add_menu_item(label="Clear Grid", callback=lambda e: GRID.update_grid(clear=True))
+                dpg.add_menu_item(label="Save Map...", callback=lambda e: dpg.show_item("save_map_dialog"))
+                dpg.add_menu_item(label="Load Map...", callback=lambda e: dpg.show_item("load_map_dialog"))
+                with dpg.menu(label="Generate"):
+                    for generator in GENERATORS:
+                        dpg.add_menu_item(label=generator, user_data=generator,
+                                          callback=lambda s, a, u: generate_map(u))
+                    dpg.add_separator()
+                    with dpg.menu(label="Map Size"):
+                        for label, size in GENERATOR_SIZES.items():
+                            dpg.add_menu_item(label=label, user_data=size,
+                                              callback=lambda s, a, u: GRID.set_generator_size(u))
+                with dpg.menu(label = "Grid Size"):
+                    for size in (10, 15, 25, 50):
+                        dpg.add_menu_item(label=f"{size} x {size}", user_data=(size, size),
+                                          callback=lambda s, a, u: apply_grid_change(
+                                              lambda: GRID.update_grid(grid_size=u)))
+                with dpg.menu(label = "Cell Size"):
+                    dpg.add_menu_item(label="25", callback=lambda e: GRID.update_grid(cell_size=25))
+                    dpg.add_menu_item(label="30", callback=lambda e: GRID.update_grid(cell_size=30))
+                    dpg.add_menu_item(label="35", callback=lambda e: GRID.update_grid(cell_size=35))
+                    dpg.add_menu_item(label="40", callback=lambda e: GRID.update_grid(cell_size=40))
+                    dpg.add_menu_item(label="45", callback=lambda e: GRID.update_grid(cell_size=45))
+                    dpg.add_menu_item(label="50", callback=lambda e: GRID.update_grid(cell_size=50))
+                with dpg.menu(label="Line Thickness"):
+                    dpg.add_menu_item(label="1", callback=lambda e: GRID.update_grid(line_thickness=1))
+                    dpg.add_menu_item(label="2", callback=lambda e: GRID.update_grid(line_thickness=2))
+                    dpg.add_menu_item(label="3", callback=lambda e: GRID.update_grid(line_thickness=3))
+                    dpg.add_menu_item(label="4", callback=lambda e: GRID.update_grid(line_thickness=4))
+                    dpg.add_menu_item(label="5", callback=lambda e: GRID.update_grid(line_thickness=5))
+
+                with dpg.menu(label="Brush"):
+                    for tool in BRUSH_TOOLS:
+                        dpg.add_menu_item(label=tool.capitalize(), user_data=tool,
+                                          callback=lambda s, a, u: GRID.set_brush(tool=u))
+                    dpg.add_separator()
+                    for size in BRUSH_SIZES:
+                        dpg.add_menu_item(label=f"Size {size}", user_data=size,
+                                          callback=lambda s, a, u: GRID.set_brush(size=u))
+                with dpg.menu(label="Terrain"):
+                    for label, cost in TERRAIN_TYPES.items():
+                        dpg.add_menu_item(label=label, user_data=cost, callback=lambda s, a, u: GRID.set_terrain(u))
+                with dpg.menu(label="Render Mode"):
+                    dpg.add_menu_item(label="Cell Items", callback=lambda e: GRID.set_render_mode("items"))
+                    dpg.add_menu_item(label="Texture", callback=lambda e: GRID.set_render_mode("texture"))
+                    dpg.add_menu_item(label="Texture Grid Lines", check=True, default_value=GRID.show_grid_lines,
+                                      callback=lambda s, a: GRID.set_grid_lines(a))
+
+                dpg.add_menu_item(label = "Advanced...", callback=lambda e: show_modal("advanced_grid_settings"))
+            with dpg.menu(label = "Pathfinding"):
+                dpg.add_menu_item(label="Set Start Cell", callback=PATHFINDING_MANAGER.on_setting_start)
+                dpg.add_menu_item(label="Set End Cell", callback=PATHFINDING_MANAGER.on_setting_goal)
+                dpg.add_separator()
+                dpg.add_menu_item(label="Find Path", callback=PATHFINDING_MANAGER.find_path)
+                dpg.add_menu_item(label="Smooth Path", callback=PATHFINDING_MANAGER.smooth_path)
+                dpg.add_menu_item(label="Clear Path", callback=PATHFINDING_MANAGER.stop_search)
+                dpg.add_menu_item(label="Shade Goal Region", callback=PATHFINDING_MANAGER.shade_goal_region)
+                dpg.add_menu_item(label="Show Distance Heatmap", callback=PATHFINDING_MANAGER.show_distance_heatmap)
+                with dpg.menu(label="Batch Agents"):
+                    for count in AGENT_COUNTS:
+                        dpg.add_menu_item(label=f"Plan {count} Agents", user_data=count,
+                                          callback=lambda s, a, u: PATHFINDING_MANAGER.plan_random_agents(u))
+                    dpg.add_menu_item(label="Clear Agents", callback=PATHFINDING_MANAGER.clear_agents)
+                dpg.add_menu_item(label="Search In Background", check=True,
+                                  default_value=PATHFINDING_MANAGER.background,
+                                  callback=lambda s, a: PATHFINDING_MANAGER.set_background(a))
+                with dpg.menu(label="Animate"):
+                    dpg.add_menu_item(label="Start", callback=PATHFINDING_MANAGER.animate_search)
+                    dpg.add_menu_item(label="Pause / Resume", callback=PATHFINDING_MANAGER.toggle_pause)
+                    dpg.add_menu_item(label="Step", callback=PATHFINDING_MANAGER.step_search)
+                    with dpg.menu(label="Speed"):
+                        for label, speed in STEP_SPEEDS.items():
+                            dpg.add_menu_item(label=label, user_data=speed,
+                                              callback=lambda s, a, u: PATHFINDING_MANAGER.set_step_speed(u))
+                    with dpg.menu(label="Frame Budget"):
+                        for budget in STEP_BUDGETS_MS:
+                            dpg.add_menu_item(label=f"{budget} ms", user_data=budget,
+                                              callback=lambda s, a, u: PATHFINDING_MANAGER.set_step_budget(u))
+                dpg.add_separator()
+                with dpg.menu(label="Algorithm"):
+                    for algorithm in ALGORITHMS:
+                        dpg.add_menu_item(label=algorithm, user_data=algorithm,
+                                          callback=lambda s, a, u: PATHFINDING_MANAGER.set_algorithm(u))
+                dpg.add_menu_item(label="Allow Diagonal Moves", check=True, default_value=PATHFINDING_MANAGER.diagonal,
+                                  callback=lambda s, a: PATHFINDING_MANAGER.set_diagonal(a))
+                with dpg.menu(label="Heuristic"):
+                    dpg.add_menu_item(label="Auto", callback=lambda e: PATHFINDING_MANAGER.set_heuristic(None))
+                    dpg.add_menu_item(label="Octile", callback=lambda e: PATHFINDING_MANAGER.set_heuristic("octile"))
+                    dpg.add_menu_item(label="Manhattan",
+                                      callback=lambda e: PATHFINDING_MANAGER.set_heuristic("manhattan"))
+                    dpg.add_menu_item(label="Euclidean",
+                                      callback=lambda e: PATHFINDING_MANAGER.set_heuristic("euclidean"))
+            with dpg.menu(label="Profiler"):
+                dpg.add_menu_item(label="Enable Profiling", check=True, default_value=PROFILER.enabled,
+                                  callback=lambda s, a: set_profiling(a))
+                dpg.add_menu_item(label="Show Overlay", callback=lambda e: dpg.show_item("profiler_window"))
+                dpg.add_menu_item(label="Reset Counters", callback=PROFILER.reset)
+                dpg.add_menu_item(label="Save Trace...", callback=lambda e: dpg.show_item("save_trace_dialog"))
+            dpg.add_text(tag="search_stats", default_value="")
+
+    # The Advanced Grid Settings window where you can go more in-depth with customizing the grid
+    with dpg.window(label="Advanced Grid Settings", modal=True, show=False, no_resize=True, tag="advanced_grid_settings", no_close=True):
+        with dpg.table(header_row=False):
+            dpg.add_table_column(width_fixed=True)
+            dpg.add_table_column()
+
+            with dpg.table_row():
+                dpg.add_text("Cell Size:")
+                dpg.add_drag_int(width=-1, min_value=MIN_CELL_SIZE, max_value=MAX_CELL_SIZE,
+                                 clamped=True, label="", source="cell_size", speed=0.1)
+
+            with dpg.table_row():
+                dpg.add_text("Grid Size:")
+                dpg.add_drag_intx(label="", size=2, width=-1, source="grid_size",
+                                  min_value=MIN_GRID_AXIS_SIZE, max_value=MAX_GRID_AXIS_SIZE, clamped = True, speed=0.1)
+
+            with dpg.table_row():
+                dpg.add_text("Line Thickness:")
+                dpg.add_drag_float(width=-1, min_value=MIN_LINE_THICKNESS, max_value=MAX_LINE_THICKNESS,
+                                   clamped=True, label="", source="line_thickness", speed=0.01)
+
+            with dpg.table_row():
+                dpg.add_text("Cell Color:")
+                dpg.add_color_edit(label="", width=-1, no_drag_drop=True, source="cell_color")
+
+            with dpg.table_row():
+                dpg.add_text("Line Color:")
+                dpg.add_color_edit(label="", width=-1, no_drag_drop=True, source="line_color")
+
+            with dpg.table_row():
+                dpg.add_text("Block Color:")
+                dpg.add_color_edit(label="", width=-1, no_drag_drop=True, source="impassable_color")
+
+            with dpg.table_row():
+                dpg.add_text("Center Grid:")
+                dpg.add_checkbox(label="", source="center_grid")
+
+        # dpg.add_separator()
+
+        with dpg.group(horizontal=True):
+            dpg.add_button(label="Cancel", width=130, callback=lambda e: GRID.close_advanced_window(True))
+            dpg.add_button(label="Apply", width=130,
+                           callback=lambda e: apply_grid_change(lambda: GRID.close_advanced_window(False)))
+
+        # dpg.add_separator()
+
+    # File dialogs for the compact binary map format (.mino), loading also takes Moving AI .map files
+    with dpg.file_dialog(tag="save_map_dialog", show=False, directory_selector=False, width=600, height=400,
+                         default_filename="map", user_data="save", callback=on_map_file_selected):
+        dpg.add_file_extension(".mino")
+    with dpg.file_dialog(tag="load_map_dialog", show=False, directory_selector=False, width=600, height=400,
+                         user_data="load", callback=on_map_file_selected):
+        dpg.add_file_extension("Maps (*.mino *.map){.mino,.map}")
+        dpg.add_file_extension(".mino")
+        dpg.add_file_extension(".map")
+
+    # Profiler overlay, handler timings and GUI call counts only update while profiling is enabled
+    with dpg.window(label="Profiler", tag="profiler_window", show=False, width=480, height=360, pos=(480, 60)):
+        dpg.add_text(tag="profiler_text", default_value="")
+    with dpg.file_dialog(tag="save_trace_dialog", show=False, directory_selector=False, width=600, height=400,
+                         default_filename="trace", callback=on_trace_file_selected):
+        dpg.add_file_extension(".json")
+        dpg.add_file_extension(".csv")
+
+    # every callback registered above gets a timing wrapper, it only does work while profiling is enabled
+    PROFILER.instrument_callbacks()
+
+    # Set the primary window (ties it to the viewport) to the main window
+    dpg.set_primary_window("main_window", True)
+    dpg.set_viewport_resize_callback(PROFILER.profiled("viewport_resize", GRID.update_grid_position))
+    dpg.bind_item_theme("main_window", main_window_theme)
+
+    # callbacks are queued and run from the render loop, so they share the main thread with the per-frame work
+    # (brush flush, search steps, background results) instead of racing it on dearpygui's callback thread
+    dpg.configure_app(manual_callback_management=True)
+
+    # THE 4 LINES BELOW MUST BE RUN FOR THE APPLICATION TO BE DISPLAYED!
+    dpg.setup_dearpygui()
+    dpg.show_viewport()
+
+    # Display the current grid
+    GRID.display_grid()
+
+    # Render loop driven by hand so batched work can run once per frame
+    while dpg.is_dearpygui_running():
+        dpg.run_callbacks(dpg.get_callback_queue())
+        PROFILER.run("frame", on_frame)
+        PROFILER.run("render", dpg.render_dearpygui_frame)
+        PROFILER.update_overlay()
+    PATHFINDING_MANAGER.shutdown()
+    dpg.destroy_context()
\ No newline at end of file
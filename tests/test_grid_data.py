@@ -0,0 +1,24 @@
+import numpy as np
+
+from GridData import GridData
+
+
+def test_weighted_follows_cost_edits():
+    data = GridData(6, 6)
+    assert not data.weighted
+    xs, ys = np.array([0, 1, 2]), np.array([0, 0, 0])
+    data.set_cost_many(xs, ys, 5)
+    data.set_cost_many(xs[:2], ys[:2], 9)
+    assert data.weighted_cells == 3
+    data.set_cost_many(xs[1:], ys[1:], 1)
+    assert data.weighted_cells == 1
+    data.resize(6, 1)
+    assert data.weighted_cells == 1
+    data.set_cost_many(xs[:1], ys[:1], 1)
+    assert not data.weighted
+    cost = np.ones((4, 4), dtype=np.uint8)
+    cost[1, 2] = 7
+    data.assign(np.ones((4, 4), dtype=np.uint8), cost=cost)
+    assert data.weighted
+    data.clear()
+    assert not data.weighted
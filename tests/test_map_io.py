@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from GridData import GridData
+from MapIO import FORMAT_VERSION, HEADER, MAGIC, MapFormatError, load_map, load_moving_ai_map, save_map
+
+
+def test_round_trip(tmp_path):
+    data = GridData(5, 7)
+    passable = np.ones((5, 7), dtype=np.uint8)
+    passable[2, 1:6] = 0
+    data.assign(passable, (0, 0), (6, 4))
+    path = tmp_path / "walls.mino"
+    save_map(str(path), data)
+    loaded = load_map(str(path))
+    assert np.array_equal(loaded.passable, passable)
+    assert (loaded.start, loaded.goal) == ((0, 0), (6, 4))
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.mino"
+    path.write_bytes(b"")
+    with pytest.raises(MapFormatError):
+        load_map(str(path))
+
+
+def test_truncated_plane(tmp_path):
+    path = tmp_path / "truncated.mino"
+    path.write_bytes(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 64, 64, -1, -1, -1, -1) + bytes(10))
+    with pytest.raises(MapFormatError):
+        load_map(str(path))
+
+
+@pytest.mark.parametrize("start, goal", [((8, 0), (1, 1)), ((0, 0), (1, 4)), ((-3, 0), (1, 1))])
+def test_endpoints_out_of_range(tmp_path, start, goal):
+    path = tmp_path / "endpoints.mino"
+    path.write_bytes(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 8, 4, *start, *goal) + b"\xff" * 4)
+    with pytest.raises(MapFormatError):
+        load_map(str(path))
+
+
+def test_empty_map(tmp_path):
+    path = tmp_path / "empty.mino"
+    path.write_bytes(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0, 0, -1, -1, -1, -1))
+    with pytest.raises(MapFormatError):
+        load_map(str(path))
+
+
+def test_empty_moving_ai_map(tmp_path):
+    path = tmp_path / "empty.map"
+    path.write_text("type octile\nheight 0\nwidth 5\nmap\n")
+    with pytest.raises(MapFormatError):
+        load_moving_ai_map(str(path))
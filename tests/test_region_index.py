@@ -0,0 +1,30 @@
+import numpy as np
+
+from GridData import GridData
+from RegionIndex import label_components
+
+
+def test_all_blocked_plane():
+    labels = label_components(np.zeros((4, 6), dtype=np.uint8))
+    assert labels.shape == (24,)
+    assert (labels == -1).all()
+
+
+def test_separate_regions():
+    passable = np.ones((3, 5), dtype=np.uint8)
+    passable[:, 2] = 0
+    labels = label_components(passable).reshape(3, 5)
+    assert (labels[:, 2] == -1).all()
+    assert len(np.unique(labels[:, :2])) == 1 and len(np.unique(labels[:, 3:])) == 1
+    assert labels[0, 0] != labels[0, 4]
+
+
+def test_block_every_cell_after_labeling():
+    data = GridData(20, 20)
+    data.assign(np.ones((20, 20), dtype=np.uint8))
+    assert data.connected((0, 0), (19, 19))
+    ys, xs = np.nonzero(np.ones((20, 20)))
+    data.set_passable_many(xs, ys, False)
+    assert not data.connected((0, 0), (19, 19))
+    data.invert()
+    assert data.connected((0, 0), (19, 19))